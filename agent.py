@@ -1,7 +1,19 @@
+import contextvars
 import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 import llm_client
+import responder
+import telemetry
 import tools
-from system_prompt import get_system_prompt
+from history import compact_history
+from system_prompt import get_system_prompt, get_prompt_stats
+
+log = logging.getLogger(__name__)
+
+# --- Configuration ---
+TOOL_WORKERS = 4  # Tool calls from one LLM response that may run at once
 
 class ReservationAgent:
     
@@ -9,14 +21,20 @@ class ReservationAgent:
         # ... (init function is unchanged)
         self.tool_definitions = tools.tool_definitions
         self.tool_functions = tools.tool_functions
+        self.tool_mutation_keys = tools.tool_mutation_keys
+        self.last_tool_timings = []  # Per-call timings of the most recent tool batch
+        self.last_reply_source = None  # "llm" or "template" for the most recent turn
+        self.last_history_report = None  # Token counts from the most recent history compaction
+        self._tool_pool = None
         self.system_prompt = {
             "role": "system",
             "content": get_system_prompt()
         }
+        self.last_prompt_stats = None  # Static/dynamic token counts of the latest system prompt
 
     def get_initial_message(self):
         # ... (get_initial_message function is unchanged)
-        messages = [self.system_prompt, {"role": "user", "content": "Hello"}]
+        messages = self._refresh_system_prompt([self.system_prompt, {"role": "user", "content": "Hello"}])
         llm_response = llm_client.chat_completion(messages, self.tool_definitions)
         
         # --- Add robustness here too ---
@@ -25,13 +43,149 @@ class ReservationAgent:
         
         return llm_response.content if llm_response.content else "Hello! How can I help you with your restaurant reservation today?"
 
+    def _refresh_system_prompt(self, history: list[dict]) -> list[dict]:
+        """
+        Swaps the leading system message for one with the current date and
+        time. Only the short suffix changes, so the cached prefix still matches.
+        """
+        self.system_prompt = {"role": "system", "content": get_system_prompt()}
+        self.last_prompt_stats = get_prompt_stats()
+        if history and history[0].get("role") == "system":
+            return [self.system_prompt] + history[1:]
+        return history
+
+    def _compact(self, history: list[dict]) -> list[dict]:
+        """
+        Refreshes the system prompt and trims the history sent to the model
+        to its token budget. The caller's
+        list (the full transcript shown in the UI) is left untouched.
+        """
+        history = self._refresh_system_prompt(history)
+        compacted, report = compact_history(history)
+        self.last_history_report = report
+        if report["tokens_saved"] > 0:
+            log.info("History: %s -> %s tokens (%s saved, %s older turn(s) compacted)",
+                     report['tokens_before'], report['tokens_after'], report['tokens_saved'], report['turns_compacted'])
+        return compacted
+
+    def _call_tool(self, tool_call) -> tuple:
+        """Runs one tool call, in a "tool.call" span. Returns (result, timing)."""
+        func_name = tool_call.function.name
+        start = time.perf_counter()
+        ok = False
+        
+        with telemetry.span("tool.call", tool=func_name if func_name in self.tool_functions else "unknown") as call:
+            if func_name not in self.tool_functions:
+                log.error("LLM tried to call unknown function: %s", func_name)
+                result = json.dumps({"status": "error", "message": f"Unknown tool: {func_name}"})
+            else:
+                try:
+                    args = json.loads(tool_call.function.arguments)
+                    function_to_call = self.tool_functions[func_name]
+                    result = function_to_call(**args)
+                    ok = True
+                
+                except Exception as e:
+                    log.exception("Error executing tool %s", func_name)
+                    result = json.dumps({"status": "error", "message": str(e)})
+            
+            # Tools catch their own exceptions and return this message
+            if not ok or result.startswith("An unexpected error occurred"):
+                call.fail(result[:200])
+            call.set("tool_call_id", tool_call.id)
+            call.set("result_chars", len(result))
+        
+        timing = {
+            "tool_call_id": tool_call.id,
+            "name": func_name,
+            "started": start,
+            "seconds": time.perf_counter() - start,
+            "ok": ok
+        }
+        return result, timing
+
+    def _mutation_key(self, tool_call):
+        """
+        The (date, restaurant, slot) a mutating call touches, or None for
+        read-only calls. Mutating calls whose key can't be worked out share
+        one catch-all key, so they still run one at a time.
+        """
+        key_fn = self.tool_mutation_keys.get(tool_call.function.name)
+        if key_fn is None:
+            return None
+        try:
+            key = key_fn(json.loads(tool_call.function.arguments))
+        except Exception:
+            key = None
+        return ("mutation",) + (key if key is not None else ("unknown",))
+
+    def _execute_tool_calls(self, tool_calls) -> list[dict]:
+        """
+        Runs the requested tools and returns the "tool" result messages,
+        in the order of `tool_calls`.
+
+        Independent calls run concurrently on a small thread pool. Calls that
+        mutate the same (date, restaurant, slot) are chained into one task
+        and run in the order requested. Per-call timings are kept in
+        `self.last_tool_timings`.
+        """
+        tool_calls = list(tool_calls)
+        results = [None] * len(tool_calls)
+        timings = [None] * len(tool_calls)
+        
+        # Group calls into tasks: one per read-only call, one per mutation key
+        tasks = []
+        by_key = {}
+        for i, tool_call in enumerate(tool_calls):
+            key = self._mutation_key(tool_call)
+            if key is None:
+                tasks.append([i])
+            elif key in by_key:
+                by_key[key].append(i)
+            else:
+                by_key[key] = [i]
+                tasks.append(by_key[key])
+        
+        def run_task(indices):
+            for i in indices:
+                results[i], timings[i] = self._call_tool(tool_calls[i])
+        
+        if len(tasks) == 1:
+            run_task(tasks[0])
+        else:
+            if self._tool_pool is None:
+                self._tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+            # Each task runs in a copy of this context, so its spans nest under the turn
+            for future in [self._tool_pool.submit(contextvars.copy_context().run, run_task, task) for task in tasks]:
+                future.result()
+        
+        self.last_tool_timings = timings
+        return [
+            {"role": "tool", "tool_call_id": tool_call.id, "content": result}
+            for tool_call, result in zip(tool_calls, results)
+        ]
+
+    def _finish_turn(self, turn, new_messages: list):
+        turn.set("reply_source", self.last_reply_source)
+        turn.set("new_messages", len(new_messages))
+        if self.last_history_report:
+            turn.set("history_tokens", self.last_history_report["tokens_after"])
+
     def run(self, history: list[dict]) -> list[dict]:
         """
         Runs the main agent loop.
         Receives the full chat history and returns a list of new messages.
+        The turn is traced as an "agent.turn" span.
         """
-        
-        # 1. Call the LLM
+        with telemetry.span("agent.turn", stream=False) as turn:
+            self.last_reply_source = None
+            new_messages = self._run_turn(history)
+            self._finish_turn(turn, new_messages)
+        return new_messages
+
+    def _run_turn(self, history: list[dict]) -> list[dict]:
+        # 1. Call the LLM with the history trimmed to its token budget
+        history = self._compact(history)
         llm_response = llm_client.chat_completion(history, self.tool_definitions)
         
         new_messages = []
@@ -57,34 +211,18 @@ class ReservationAgent:
             # Add the LLM's tool call request to history
             new_messages.append(llm_response.to_dict())
             
-            tool_results = []
-            
-            # 3. Execute each tool call
-            for tool_call in llm_response.tool_calls:
-                func_name = tool_call.function.name
-                
-                if func_name not in self.tool_functions:
-                    print(f"ERROR: LLM tried to call unknown function: {func_name}")
-                    result = json.dumps({"status": "error", "message": f"Unknown tool: {func_name}"})
-                else:
-                    try:
-                        args = json.loads(tool_call.function.arguments)
-                        function_to_call = self.tool_functions[func_name]
-                        result = function_to_call(**args)
-                    
-                    except Exception as e:
-                        print(f"Error executing tool {func_name}: {e}")
-                        result = json.dumps({"status": "error", "message": str(e)})
-                
-                # 4. Append the tool's result
-                tool_results.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": result
-                })
-            
+            # 3. Execute each tool call and 4. append the tool's result
+            tool_results = self._execute_tool_calls(llm_response.tool_calls)
             new_messages.extend(tool_results)
             
+            # Fast path: predictable outcomes are phrased from a template
+            fast_reply = responder.respond(llm_response.tool_calls, tool_results, history)
+            if fast_reply:
+                self.last_reply_source = "template"
+                new_messages.append({"role": "assistant", "content": fast_reply})
+                return new_messages
+            self.last_reply_source = "llm"
+            
             # 5. Make a second LLM call (Synthesis)
             full_history_for_synthesis = history + new_messages
             
@@ -93,7 +231,7 @@ class ReservationAgent:
                 self.tool_definitions
             )
 
-            if not synthesis_response.content:
+            if not isinstance(synthesis_response, dict) and not synthesis_response.content:
                 auto_user_msg = {"role": "user", "content": "Done?"}
                 full_history_with_auto_msg = full_history_for_synthesis + [auto_user_msg]
 
@@ -115,3 +253,82 @@ class ReservationAgent:
                 new_messages.append({"role": "assistant", "content": "I've processed your request. What's next?"})
 
         return new_messages
+
+    def _stream_call(self, messages: list[dict]):
+        """
+        Streams one LLM call: yields its text deltas and returns the final
+        message (a ChatCompletionMessage or an assistant error dict).
+        """
+        final = None
+        for event in llm_client.chat_completion(messages, self.tool_definitions, stream=True):
+            if isinstance(event, str):
+                yield event
+            else:
+                final = event
+        return final
+
+    def run_stream(self, history: list[dict]):
+        """
+        Streaming version of `run`.
+        Yields text deltas (str) to show as they arrive, and every new message
+        (dict) for the history in the same order `run` returns them: the tool
+        call request, the tool results, then the final assistant message.
+        """
+        with telemetry.span("agent.turn", stream=True) as turn:
+            self.last_reply_source = None
+            new_messages = []
+            for event in self._run_stream_turn(history):
+                if isinstance(event, dict):
+                    new_messages.append(event)
+                yield event
+            self._finish_turn(turn, new_messages)
+
+    def _run_stream_turn(self, history: list[dict]):
+        # 1. Call the LLM, streaming any direct text answer
+        history = self._compact(history)
+        llm_response = yield from self._stream_call(history)
+        
+        if isinstance(llm_response, dict) and llm_response.get("role") == "assistant":
+            yield llm_response
+            return
+        
+        # 2. Case A: Simple text response (already streamed)
+        if llm_response.content:
+            yield {"role": "assistant", "content": llm_response.content}
+            return
+        if not llm_response.tool_calls:
+            return
+        
+        # Case B: Tool calls
+        tool_results = self._execute_tool_calls(llm_response.tool_calls)
+        new_messages = [llm_response.to_dict()] + tool_results
+        for message in new_messages:
+            yield message
+        
+        fast_reply = responder.respond(llm_response.tool_calls, tool_results, history)
+        if fast_reply:
+            self.last_reply_source = "template"
+            yield fast_reply
+            yield {"role": "assistant", "content": fast_reply}
+            return
+        self.last_reply_source = "llm"
+        
+        # 3. Stream the synthesis call, where the time to first token matters most
+        full_history_for_synthesis = history + new_messages
+        synthesis_response = yield from self._stream_call(full_history_for_synthesis)
+        
+        if not isinstance(synthesis_response, dict) and not synthesis_response.content:
+            auto_user_msg = {"role": "user", "content": "Done?"}
+            synthesis_response = yield from self._stream_call(full_history_for_synthesis + [auto_user_msg])
+        
+        if isinstance(synthesis_response, dict) and synthesis_response.get("role") == "assistant":
+            yield synthesis_response
+            return
+        
+        # 4. The final text response
+        if synthesis_response.content:
+            yield {"role": "assistant", "content": synthesis_response.content}
+        else:
+            fallback = "I've processed your request. What's next?"
+            yield fallback
+            yield {"role": "assistant", "content": fallback}
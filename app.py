@@ -1,7 +1,12 @@
 import streamlit as st
+import telemetry
 from agent import ReservationAgent
 from system_prompt import get_system_prompt
 
+# Both are no-ops after the first script run in this process
+telemetry.configure_logging()
+telemetry.start_metrics_server()
+
 # --- Page Configuration ---
 st.set_page_config(page_title="GoodFoods Reservations", layout="wide")
 st.title("🤖 GoodFoods AI Reservation Assistant")
@@ -62,22 +67,26 @@ if prompt := st.chat_input("What would you like to do?"):
     with st.chat_message("user"):
         st.markdown(prompt)
         
-    # 2. Call the agent to get a response
+    # 2. Call the agent and stream its reply as it is generated
     with st.chat_message("assistant"):
+        new_messages = []
+
+        def stream_reply():
+            # The agent's `run_stream` takes the *entire* history and yields
+            # text to show, plus each new message (tool calls, tool results,
+            # final answer) to keep for the history
+            for event in st.session_state.agent.run_stream(st.session_state.messages):
+                if isinstance(event, dict):
+                    new_messages.append(event)
+                else:
+                    yield event
+
         with st.spinner("Thinking..."):
-            
-            # The agent's `run` method takes the *entire* history
-            # and returns *all* new messages (tool calls, tool results, final answer)
-            new_messages = st.session_state.agent.run(st.session_state.messages)
-            
-            # 3. Add new messages to history
-            st.session_state.messages.extend(new_messages)
-            
-            # 4. Display the *last* message (the final text response)
-            # The display_chat_history() function will handle the rest on rerun,
-            # but we display the last one immediately.
-            final_response = new_messages[-1]
-            if final_response.get("content"):
-                st.markdown(final_response["content"])
-            else:
-                st.markdown("Sorry, I had trouble processing that.")
+            streamed_text = st.write_stream(stream_reply())
+
+        # 3. Add new messages to history
+        st.session_state.messages.extend(new_messages)
+        telemetry.write_metrics()  # Only if GOODFOODS_METRICS_FILE is set
+
+        if not streamed_text:
+            st.markdown("Sorry, I had trouble processing that.")
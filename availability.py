@@ -0,0 +1,228 @@
+import atexit
+import os
+import threading
+import uuid
+from pathlib import Path
+import numpy as np
+import telemetry
+
+# --- Configuration ---
+AVAILABILITY_DTYPE = np.int16  # Dtype of the matrices handed to callers
+DELTA_RECORD = np.dtype([("row", "<i4"), ("slot", "<i2"), ("change", "<i2")])  # 8 bytes per write
+MAX_OPEN_LOGS = 16  # Append descriptors kept open; the least recently written idle ones are closed past this
+
+_fdatasync = getattr(os, "fdatasync", os.fsync)  # macOS has no fdatasync
+
+class _DateDeltas:
+    """A date's summed changes, as read from its log so far."""
+
+    def __init__(self, n_slots: int):
+        self.by_slot = [{} for _ in range(n_slots)]  # slot -> {row: net change}
+        self.offset = 0   # Bytes of the log applied
+        self.fd = None    # Append descriptor, opened on the first write
+        self.writers = 0  # Writes in progress on `fd`; it is only closed at zero
+
+class AvailabilityEngine:
+    """
+    Stores table availability as a base capacity plus sparse per-cell changes.
+
+    Every (restaurant row, time slot) cell starts at `base_capacity`. Each
+    date has an append-only binary log of (row, slot, change) records, and
+    a cell's tables left is the base plus the sum of its changes. A date
+    nobody has booked has no file at all, so looking at a new date costs
+    nothing, and disk and memory grow with bookings rather than with
+    restaurants x dates.
+
+    Writes to one cell are serialized by the caller's slot lock. Records are
+    appended with O_APPEND, so writers of different cells, in any process,
+    never overwrite each other. Each process keeps the summed changes in
+    memory and reads only the records appended since it last looked.
+
+    A date's version is the size of its log: every write appends to it,
+    so it only grows, across processes and without a lock, and reading it
+    is a single stat().
+
+    At most `max_open_logs` append descriptors stay open; past that, the
+    least recently written dates with no write in progress are closed
+    (and reopened if written again). The rest are closed at exit.
+    """
+
+    def __init__(self, delta_path_fn, n_slots: int, base_capacity: int, dtype=AVAILABILITY_DTYPE,
+                 max_open_logs: int = MAX_OPEN_LOGS):
+        self.delta_path_fn = delta_path_fn
+        self.n_slots = n_slots
+        self.base_capacity = base_capacity
+        self.dtype = np.dtype(dtype)
+        self.max_open_logs = max_open_logs
+        self._lock = threading.Lock()
+        self._dates = {}      # date_str -> _DateDeltas
+        self._open_logs = {}  # date_str -> _DateDeltas with an open fd, least recently written first
+        atexit.register(self.close)
+
+    # --- File Handling ---
+
+    def exists(self, date_str: str) -> bool:
+        """Checks whether the date has been set up, in this process or on disk."""
+        return date_str in self._dates or self.delta_path_fn(date_str).exists()
+
+    def create(self, date_str: str, n_rows: int, seed: np.ndarray = None) -> bool:
+        """
+        Sets up a date. Without a `seed`, every cell is at base capacity
+        and nothing is written. With one, its differences from the base are
+        written as the date's first log records. The log is written under a
+        temporary name and linked into place, so concurrent creators never
+        both import. Returns False if the date already existed.
+        """
+        filepath = self.delta_path_fn(date_str)
+        with self._lock:
+            if date_str in self._dates or filepath.exists():
+                return False
+
+            created = True
+            if seed is not None:
+                created = self._import(filepath, np.asarray(seed)[:n_rows])
+            self._state(date_str)
+            return created
+
+    def _import(self, filepath: Path, seed: np.ndarray) -> bool:
+        rows, slots = np.nonzero(seed != self.base_capacity)
+        records = np.empty(len(rows), dtype=DELTA_RECORD)
+        records["row"] = rows
+        records["slot"] = slots
+        records["change"] = seed[rows, slots].astype(np.int64) - self.base_capacity
+
+        tmp_path = filepath.with_name(f"{filepath.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(tmp_path, filepath)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            tmp_path.unlink()
+
+    def _tail(self, date_str: str, state: _DateDeltas):
+        """Applies records appended to the date's log since the last read."""
+        filepath = self.delta_path_fn(date_str)
+        try:
+            size = os.stat(filepath).st_size
+        except FileNotFoundError:
+            return
+        # Only whole records; a write still in progress is read next time
+        end = state.offset + (size - state.offset) // DELTA_RECORD.itemsize * DELTA_RECORD.itemsize
+        if end <= state.offset:
+            return
+
+        with telemetry.span("storage.io", op="read", file="availability") as io:
+            with open(filepath, "rb") as f:
+                f.seek(state.offset)
+                records = np.frombuffer(f.read(end - state.offset), dtype=DELTA_RECORD)
+            for row, slot, change in zip(records["row"].tolist(), records["slot"].tolist(), records["change"].tolist()):
+                deltas = state.by_slot[slot]
+                deltas[row] = deltas.get(row, 0) + change
+            state.offset = end
+            io.io(len(records) * DELTA_RECORD.itemsize, len(records))
+
+    def _state(self, date_str: str) -> _DateDeltas:
+        """Returns the date's up-to-date changes. Call with self._lock held."""
+        state = self._dates.get(date_str)
+        if state is None:
+            state = self._dates[date_str] = _DateDeltas(self.n_slots)
+        self._tail(date_str, state)
+        return state
+
+    # --- Descriptors ---
+
+    def _close_idle_logs(self):
+        """Closes the least recently written idle descriptors past max_open_logs. Call with self._lock held."""
+        excess = len(self._open_logs) - self.max_open_logs
+        for date_str, state in list(self._open_logs.items()):
+            if excess <= 0:
+                break
+            if state.writers == 0:
+                os.close(state.fd)
+                state.fd = None
+                del self._open_logs[date_str]
+                excess -= 1
+
+    def close(self):
+        """Closes every append descriptor with no write in progress."""
+        with self._lock:
+            for date_str, state in list(self._open_logs.items()):
+                if state.writers == 0:
+                    os.close(state.fd)
+                    state.fd = None
+                    del self._open_logs[date_str]
+
+    # --- Versions ---
+
+    def version(self, date_str: str) -> int:
+        """Returns the date's version; it changes after every write to the date."""
+        try:
+            return os.stat(self.delta_path_fn(date_str)).st_size
+        except FileNotFoundError:
+            return 0
+
+    # --- Cell Operations ---
+
+    def get(self, date_str: str, n_rows: int, row: int, slot_idx: int) -> int:
+        """Returns the tables left for one (restaurant, slot) cell."""
+        with self._lock:
+            return self.base_capacity + self._state(date_str).by_slot[slot_idx].get(row, 0)
+
+    def add(self, date_str: str, n_rows: int, row: int, slot_idx: int, change: int):
+        """
+        Applies `change` to one cell by appending a record to the date's log.
+        The caller must hold the cell's slot lock.
+        Returns the new value, or None if it would drop below zero.
+        """
+        with self._lock:
+            state = self._state(date_str)
+            new_value = self.base_capacity + state.by_slot[slot_idx].get(row, 0) + change
+            if new_value < 0:
+                return None
+            if state.fd is None:
+                state.fd = os.open(self.delta_path_fn(date_str), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._open_logs.pop(date_str, None)
+            self._open_logs[date_str] = state
+            state.writers += 1
+            fd = state.fd
+            self._close_idle_logs()
+
+        record = np.array([(row, slot_idx, change)], dtype=DELTA_RECORD).tobytes()
+        try:
+            with telemetry.span("storage.io", op="write", file="availability") as io:
+                os.write(fd, record)
+                _fdatasync(fd)
+                io.io(len(record), 1)
+        finally:
+            with self._lock:
+                state.writers -= 1
+                self._tail(date_str, state)  # Picks up our record with any others
+                self._close_idle_logs()
+        return new_value
+
+    def _column(self, state: _DateDeltas, n_rows: int, slot_idx: int) -> np.ndarray:
+        column = np.full(n_rows, self.base_capacity, dtype=self.dtype)
+        deltas = state.by_slot[slot_idx]
+        if deltas:
+            rows = np.fromiter(deltas.keys(), dtype=np.int64, count=len(deltas))
+            changes = np.fromiter(deltas.values(), dtype=np.int64, count=len(deltas))
+            inside = rows < n_rows
+            column[rows[inside]] += changes[inside].astype(self.dtype)
+        return column
+
+    def rows_with_capacity(self, date_str: str, n_rows: int, slot_idx: int, tables_needed: int) -> np.ndarray:
+        """Returns the row indices that have at least `tables_needed` tables left."""
+        with self._lock:
+            column = self._column(self._state(date_str), n_rows, slot_idx)
+        return np.flatnonzero(column >= tables_needed)
+
+    def snapshot(self, date_str: str, n_rows: int) -> np.ndarray:
+        """Returns the date's availability as a (n_rows x slots) matrix."""
+        with self._lock:
+            state = self._state(date_str)
+            return np.stack([self._column(state, n_rows, slot_idx) for slot_idx in range(self.n_slots)], axis=1)
@@ -0,0 +1,323 @@
+"""
+Benchmarks ReservationAgent turns without calling Azure.
+
+Scripted conversations (search, book, lookup, cancel, modify) are driven
+through the agent while the Azure client's chat.completions is replaced by
+a stub that returns canned tool calls and text after a simulated delay.
+Each turn is split into LLM wait, tool execution and agent overhead
+(everything else: llm_client, history compaction, prompt refresh,
+templating, JSON handling).
+
+    python benchmarks/agent_bench.py                   # compare with baseline.json
+    python benchmarks/agent_bench.py --save-baseline   # record a new baseline
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from bench_utils import percentiles, quiet, workspace
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+import agent
+import data_manager
+import llm_cache
+import llm_client
+
+# --- Configuration ---
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_ITERATIONS = 20
+DEFAULT_WARMUP = 1  # Unrecorded passes first (catalog load, text index build, imports)
+DEFAULT_LLM_DELAY_MS = 50.0
+DEFAULT_LLM_JITTER_MS = 10.0
+DEFAULT_TOLERANCE = 0.5  # Allowed slowdown over the baseline before failing
+COMPARED_METRICS = ("tool_ms", "overhead_ms")  # LLM time is simulated, so it isn't compared
+COMPARED_PERCENTILES = ("p50",)  # Tails are dominated by disk fsync jitter; opt in with --percentiles
+NOISE_FLOOR_MS = 2.5  # Slowdowns smaller than this are never reported
+
+# --- Stub LLM ---
+
+class StubCompletions:
+    """
+    Stands in for the HTTP client's `chat.completions`, so every request
+    still goes through llm_client (admission, retries, streaming reassembly,
+    telemetry). When the last message is the user's, it answers with the
+    current turn's scripted tool calls (if any); otherwise (after tool
+    results) with a short text reply. Every request sleeps for the
+    simulated delay, which is added to `llm_seconds`.
+    """
+
+    def __init__(self, delay_ms: float, jitter_ms: float, seed: int = 0):
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+        self.turn_calls = None  # [(name, args)] for the current turn
+        self.llm_seconds = 0.0
+        self.calls = 0
+
+    def _respond(self, messages: list) -> dict:
+        last = messages[-1]
+        if last.get("role") == "user" and self.turn_calls:
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                     "function": {"name": name, "arguments": json.dumps(args)}}
+                    for name, args in self.turn_calls
+                ]
+            }
+        return {"role": "assistant", "content": "Here is what I found. Is there anything else I can help with?"}
+
+    def create(self, messages: list, stream: bool = False, **kwargs):
+        start = time.perf_counter()
+        delay = max(0.0, self.delay_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms))
+        time.sleep(delay / 1000)
+        message = self._respond(messages)
+        response = _chunks(message) if stream else _completion(message)
+        self.llm_seconds += time.perf_counter() - start
+        self.calls += 1
+        return response
+
+def _completion(message: dict) -> ChatCompletion:
+    return ChatCompletion.model_validate({
+        "id": "bench", "object": "chat.completion", "created": 0, "model": "bench",
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    })
+
+def _chunks(message: dict) -> list:
+    """The message as the service streams it: text word by word, each tool call's arguments in two pieces."""
+    deltas = [{"role": "assistant"}]
+    deltas += [{"content": word + " "} for word in (message["content"] or "").split(" ") if message["content"]]
+    for i, tool_call in enumerate(message.get("tool_calls") or []):
+        arguments = tool_call["function"]["arguments"]
+        half = len(arguments) // 2
+        deltas.append({"tool_calls": [{"index": i, "id": tool_call["id"], "type": "function",
+                                       "function": {"name": tool_call["function"]["name"], "arguments": arguments[:half]}}]})
+        deltas.append({"tool_calls": [{"index": i, "function": {"arguments": arguments[half:]}}]})
+    return [
+        ChatCompletionChunk.model_validate({
+            "id": "bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        })
+        for delta in deltas
+    ]
+
+# --- Conversations ---
+# Each turn is (user text, tool calls). Tool arguments may be callables
+# taking the conversation state, for IDs that only exist at run time.
+
+def _booking(state: dict, restaurant: dict, slot: str) -> dict:
+    return {
+        "customer_name": state["customer"], "customer_email": f"{state['customer']}@example.com",
+        "customer_phone": "9999999999", "restaurant_name": restaurant["name"],
+        "restaurant_id": int(restaurant["restaurant_id"]), "party_size": 4,
+        "date": state["date"], "time_slot": slot
+    }
+
+def build_conversations() -> dict:
+    search = [
+        ("Hi, I'd like a table tomorrow", []),
+        ("Something for 4 at 7pm", [("get_available_restaurants",
+            lambda s: {"date": s["date"], "time_slot": "7:00 PM", "party_size": 4})]),
+        ("Anything with good biryani?", [("search_restaurants_by_text",
+            lambda s: {"query": "biryani", "max_results": 5})]),
+    ]
+    book = [
+        ("Book a table for 4 tomorrow at 7pm", [("book_table",
+            lambda s: _booking(s, s["restaurant"], "07:00 PM"))]),
+    ]
+    lookup = book + [
+        ("What are my booking details?", [("get_booking_details",
+            lambda s: {"booking_id": s["booking_id"]})]),
+    ]
+    cancel = book + [
+        ("Please cancel it", [("cancel_booking",
+            lambda s: {"booking_id": s["booking_id"], "date": s["date"]})]),
+    ]
+    modify = book + [
+        ("Can you move it to 8pm?", [
+            ("book_table", lambda s: _booking(s, s["restaurant"], "08:00 PM")),
+            ("cancel_booking", lambda s: {"booking_id": s["booking_id"], "date": s["date"]}),
+        ]),
+    ]
+    return {"search": search, "book": book, "lookup": lookup, "cancel": cancel, "modify": modify}
+
+def _resolve(calls: list, state: dict) -> list:
+    return [(name, args(state) if callable(args) else args) for name, args in calls]
+
+def _remember_booking(state: dict, new_messages: list):
+    """Keeps the first booking_id a turn produced, for later turns to refer to."""
+    for message in new_messages:
+        if message.get("role") != "tool":
+            continue
+        try:
+            result = json.loads(message["content"])
+        except (TypeError, ValueError):
+            continue
+        if isinstance(result, dict) and result.get("status") == "confirmed":
+            state["booking_id"] = result["booking_id"]
+            return
+
+# --- Runner ---
+
+def run_benchmark(iterations: int, delay_ms: float, jitter_ms: float, stream: bool = False,
+                  warmup: int = DEFAULT_WARMUP) -> dict:
+    """
+    Runs every conversation `warmup` + `iterations` times and returns the
+    per-turn samples of the last `iterations` passes, by scenario.
+    """
+    stub = StubCompletions(delay_ms, jitter_ms)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=stub))
+    llm_client.get_llm_client = lambda: client
+    os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT_NAME", "bench")
+    llm_cache.set_mode("off")  # Every turn should reach the (stub) model
+    bot = agent.ReservationAgent()
+
+    date = (datetime.now() + timedelta(days=1)).strftime(data_manager.DATE_FORMAT)
+    n_restaurants = len(data_manager.get_restaurant_data())
+    conversations = build_conversations()
+    samples = {name: [] for name in conversations}
+
+    # Time tool batches as the agent runs them (wall time, so parallel calls count once)
+    tool_seconds = [0.0]
+    execute = bot._execute_tool_calls
+
+    def timed_execute(tool_calls):
+        start = time.perf_counter()
+        try:
+            return execute(tool_calls)
+        finally:
+            tool_seconds[0] += time.perf_counter() - start
+    bot._execute_tool_calls = timed_execute
+
+    for i in range(warmup + iterations):
+        for n, (name, turns) in enumerate(conversations.items()):
+            state = {
+                "date": date,
+                "customer": f"bench{i}-{name}",
+                # Spread bookings over the catalog so no slot runs out of tables
+                "restaurant": data_manager.get_restaurant((i * len(conversations) + n) % n_restaurants),
+            }
+            history = [{"role": "system", "content": bot.system_prompt["content"]}]
+            for user_text, calls in turns:
+                history.append({"role": "user", "content": user_text})
+                stub.turn_calls = _resolve(calls, state)
+                stub.llm_seconds = 0.0
+                tool_seconds[0] = 0.0
+
+                start = time.perf_counter()
+                with quiet():
+                    if stream:
+                        new_messages = [event for event in bot.run_stream(history) if isinstance(event, dict)]
+                    else:
+                        new_messages = bot.run(history)
+                total = time.perf_counter() - start
+
+                history.extend(new_messages)
+                _remember_booking(state, new_messages)
+                if i < warmup:
+                    continue
+                samples[name].append({
+                    "total_ms": total * 1000,
+                    "llm_ms": stub.llm_seconds * 1000,
+                    "tool_ms": tool_seconds[0] * 1000,
+                    "overhead_ms": (total - stub.llm_seconds - tool_seconds[0]) * 1000,
+                })
+    return samples
+
+def summarize(samples: dict) -> dict:
+    """Percentiles of each metric, per scenario and over all turns."""
+    summary = {}
+    everything = [turn for turns in samples.values() for turn in turns]
+    for name, turns in list(samples.items()) + [("all", everything)]:
+        summary[name] = {
+            metric: percentiles([turn[metric] for turn in turns])
+            for metric in ("total_ms", "llm_ms", "tool_ms", "overhead_ms")
+        }
+        summary[name]["turns"] = len(turns)
+    return summary
+
+def print_summary(summary: dict):
+    header = f"{'scenario':<10}{'turns':>6}" + "".join(
+        f"{metric[:-3] + ' p50/p95/p99 (ms)':>30}" for metric in ("total_ms", "llm_ms", "tool_ms", "overhead_ms")
+    )
+    print(header)
+    print("-" * len(header))
+    for name, stats in summary.items():
+        cells = "".join(
+            f"{stats[metric]['p50']:>10.2f}{stats[metric]['p95']:>10.2f}{stats[metric]['p99']:>10.2f}"
+            for metric in ("total_ms", "llm_ms", "tool_ms", "overhead_ms")
+        )
+        print(f"{name:<10}{stats['turns']:>6}{cells}")
+
+def compare(summary: dict, baseline: dict, tolerance: float, compared=COMPARED_PERCENTILES) -> list:
+    """
+    Returns a line for each scenario metric whose `compared` percentiles
+    are more than `tolerance` slower than the baseline. Differences under NOISE_FLOOR_MS
+    are ignored.
+    """
+    regressions = []
+    for name, stats in summary.items():
+        for metric in COMPARED_METRICS:
+            for p in compared:
+                old = baseline.get("summary", {}).get(name, {}).get(metric, {}).get(p)
+                new = stats[metric][p]
+                if old is None:
+                    continue
+                if new > old * (1 + tolerance) and new - old > NOISE_FLOOR_MS:
+                    regressions.append(f"{name} {metric} {p}: {old:.2f} -> {new:.2f} ms")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--llm-delay-ms", type=float, default=DEFAULT_LLM_DELAY_MS)
+    parser.add_argument("--llm-jitter-ms", type=float, default=DEFAULT_LLM_JITTER_MS)
+    parser.add_argument("--stream", action="store_true", help="drive run_stream instead of run")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--percentiles", nargs="+", default=list(COMPARED_PERCENTILES),
+                        choices=["p50", "p95", "p99"], help="percentiles compared with the baseline")
+    parser.add_argument("--keep-workspace", action="store_true")
+    args = parser.parse_args(argv)
+
+    with workspace(keep=args.keep_workspace):
+        samples = run_benchmark(args.iterations, args.llm_delay_ms, args.llm_jitter_ms, args.stream, args.warmup)
+    summary = summarize(samples)
+    print_summary(summary)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "iterations": args.iterations,
+                "llm_delay_ms": args.llm_delay_ms,
+                "summary": summary
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(summary, baseline, args.tolerance, args.percentiles)
+    if regressions:
+        print(f"\nRegressions against {args.baseline.name} (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions against {args.baseline.name} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+
+# --- Configuration ---
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_FILES = ("restaurantData.csv", "restaurant_ids.json")  # Copied into each workspace
+PERCENTILES = (50, 95, 99)
+
+# The app modules live at the repo root
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+@contextmanager
+def workspace(keep: bool = False):
+    """
+    Runs the block in a fresh temporary directory holding a copy of the
+    catalog, so benchmarks never touch the real trackers or bookings.
+    data_manager resolves its files relative to the working directory.
+    """
+    previous = os.getcwd()
+    path = Path(tempfile.mkdtemp(prefix="goodfoods-bench-"))
+    for name in DATA_FILES:
+        shutil.copy2(REPO_ROOT / name, path / name)
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        if keep:
+            print(f"Workspace kept at {path}")
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+
+@contextmanager
+def quiet():
+    """Silences anything written to stdout while timing."""
+    with open(os.devnull, "w") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+def percentiles(values) -> dict:
+    """Returns {"p50": ..., "p95": ..., "p99": ...} for a list of numbers (NaN when empty)."""
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return {f"p{p}": float("nan") for p in PERCENTILES}
+    return {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
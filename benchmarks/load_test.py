@@ -0,0 +1,238 @@
+"""
+Load-tests booking and cancellation against the storage backend.
+
+Hundreds of simulated customers (threads, spread over processes) call
+tools.book_table and tools.cancel_booking directly, over a mix of dates,
+slots and restaurants where popular restaurants and dinner slots see most
+of the traffic. Reports throughput, latency percentiles and lock
+contention, then checks that for every (date, restaurant, slot) the
+tables left plus the confirmed bookings' tables_reserved add up to
+BASE_TABLE_CAPACITY.
+
+    python benchmarks/load_test.py --processes 4 --threads 50 --ops 20
+    python benchmarks/load_test.py --backend sqlite
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from bench_utils import percentiles, quiet, workspace
+
+# --- Configuration ---
+DEFAULT_PROCESSES = 4
+DEFAULT_THREADS = 50   # Customers per process
+DEFAULT_OPS = 20       # Operations per customer
+DEFAULT_DAYS = 4       # Today plus the 72-hour window
+CANCEL_SHARE = 0.3     # Share of operations that cancel one of the customer's bookings
+RECANCEL_SHARE = 0.05  # Share that cancel an already cancelled booking again
+POPULARITY_SKEW = 1.1  # Zipf exponent for picking restaurants
+
+# Relative demand per slot: a lunch peak and a bigger dinner peak
+SLOT_WEIGHTS = [1, 2, 4, 4, 2, 1, 1, 2, 4, 6, 6, 4, 2]
+
+# --- Workload ---
+
+def _restaurant_weights(n: int) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** POPULARITY_SKEW
+    return weights / weights.sum()
+
+def _customer(worker_id: str, ops: int, dates: list, seed: int, results: list):
+    """One simulated customer: books, and sometimes cancels, for `ops` operations."""
+    import data_manager
+    import tools
+
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    n_restaurants = len(data_manager.get_restaurant_data())
+    popularity = _restaurant_weights(n_restaurants)  # Lower catalog rows are busier
+    confirmed, cancelled = [], []
+
+    for i in range(ops):
+        roll = rng.random()
+        if roll < RECANCEL_SHARE and cancelled:
+            op, booking_id = "cancel", rng.choice(cancelled)
+        elif roll < CANCEL_SHARE and confirmed:
+            op, booking_id = "cancel", confirmed.pop(rng.randrange(len(confirmed)))
+        else:
+            op, booking_id = "book", None
+
+        start = time.perf_counter()
+        try:
+            if op == "book":
+                restaurant = data_manager.get_restaurant(int(np_rng.choice(n_restaurants, p=popularity)))
+                result = tools.book_table(
+                    customer_name=f"Load {worker_id}", customer_email=f"load-{worker_id}@example.com",
+                    customer_phone="9999999999", restaurant_name=restaurant["name"],
+                    restaurant_id=int(restaurant["restaurant_id"]), party_size=rng.randint(1, 8),
+                    date=rng.choice(dates), time_slot=rng.choices(data_manager.TIME_SLOTS, SLOT_WEIGHTS)[0]
+                )
+            else:
+                result = tools.cancel_booking(booking_id)
+        except Exception as e:  # Tools catch their own errors; this is a harness failure
+            result = f"harness error: {e}"
+        seconds = time.perf_counter() - start
+
+        if result.startswith("{"):
+            outcome = json.loads(result)["status"]  # "confirmed" or "cancelled"
+            if outcome == "confirmed":
+                confirmed.append(json.loads(result)["booking_id"])
+            else:
+                cancelled.append(booking_id)
+        elif "Not enough tables" in result:
+            outcome = "full"
+        elif "already cancelled" in result:
+            outcome = "already_cancelled"
+        else:
+            outcome = "error"
+        results.append((op, outcome, seconds, result[:200] if outcome == "error" else None))
+
+def _run_process(process_id: int, threads: int, ops: int, dates: list, seed: int) -> dict:
+    """Runs `threads` customers in this process and returns their samples and lock stats."""
+    import data_manager
+
+    results = []
+    with quiet():
+        data_manager.get_restaurant_data()  # Load the catalog before the clock starts
+        workers = [
+            threading.Thread(target=_customer, args=(f"{process_id}-{t}", ops, dates, seed * 100003 + process_id * 1009 + t, results))
+            for t in range(threads)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    return {"results": results, "elapsed": elapsed, "locks": data_manager.get_lock_stats()}
+
+# --- Invariants ---
+
+def check_invariants(dates: list) -> list:
+    """
+    For every date, restaurant and slot: tables left + tables_reserved of
+    confirmed bookings must equal BASE_TABLE_CAPACITY.
+    Returns a description of each cell where it doesn't.
+    """
+    import data_manager
+
+    violations = []
+    for date in dates:
+        availability = data_manager.get_availability(date)
+        ids = availability["restaurant_id"].to_numpy()
+        tables_left = availability[data_manager.TIME_SLOTS].to_numpy(dtype=np.int64)
+        reserved = np.zeros_like(tables_left)
+        row_of = {restaurant_id: row for row, restaurant_id in enumerate(ids.tolist())}
+
+        bookings = data_manager.get_bookings(date)
+        confirmed = bookings[bookings["status"] == "confirmed"]
+        for restaurant_id, time_slot, tables in zip(confirmed["restaurant_id"], confirmed["time_slot"], confirmed["tables_reserved"]):
+            reserved[row_of[int(restaurant_id)], data_manager.SLOT_INDEX[time_slot]] += int(tables)
+
+        for row, slot in zip(*np.nonzero(tables_left + reserved != data_manager.BASE_TABLE_CAPACITY)):
+            violations.append(
+                f"{date} restaurant {ids[row]} {data_manager.TIME_SLOTS[slot]}: "
+                f"{tables_left[row, slot]} left + {reserved[row, slot]} reserved != {data_manager.BASE_TABLE_CAPACITY}"
+            )
+    return violations
+
+# --- Report ---
+
+def _sum_lock_stats(stats: list) -> dict:
+    total = {}
+    for entry in stats:
+        for key, value in entry.items():
+            if key == "wait_seconds_max":
+                total[key] = max(total.get(key, 0.0), value)
+            elif isinstance(value, (int, float)) and key not in ("contention_rate", "wait_seconds_avg"):
+                total[key] = total.get(key, 0) + value
+    acquisitions = total.get("acquisitions", 0)
+    total["contention_rate"] = total.get("contended", 0) / acquisitions if acquisitions else 0.0
+    total["wait_seconds_avg"] = total.get("wait_seconds_total", 0.0) / acquisitions if acquisitions else 0.0
+    return total
+
+def print_report(per_process: list, wall: float, backend: str, customers: int):
+    samples = [sample for entry in per_process for sample in entry["results"]]
+    busy = max(entry["elapsed"] for entry in per_process)  # Excludes process start-up
+    print(f"Backend: {backend}   customers: {customers}   operations: {len(samples)}   wall: {wall:.2f}s")
+    print(f"Throughput: {len(samples) / busy:.1f} ops/s (over {busy:.2f}s of load)\n")
+
+    print(f"{'operation':<10}{'outcome':<19}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    groups = {}
+    for op, outcome, seconds, _ in samples:
+        groups.setdefault((op, outcome), []).append(seconds * 1000)
+        groups.setdefault((op, "all"), []).append(seconds * 1000)
+    for (op, outcome), values in sorted(groups.items()):
+        stats = percentiles(values)
+        print(f"{op:<10}{outcome:<19}{len(values):>8}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+
+    errors = {}
+    for op, outcome, _, message in samples:
+        if message is not None:
+            errors[message] = errors.get(message, 0) + 1
+    if errors:
+        print("\nErrors (most common first):")
+        for message, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+            print(f"  {count:>5} x {message}")
+
+    locks = _sum_lock_stats([entry["locks"] for entry in per_process])
+    print("\nLock contention (all processes):")
+    for key in ("acquisitions", "contended", "contention_rate", "wait_seconds_avg", "wait_seconds_max",
+                "wait_seconds_total", "deadlock_retries"):
+        if key in locks:
+            value = locks[key]
+            print(f"  {key:<20}{value:.6f}" if isinstance(value, float) else f"  {key:<20}{value}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=DEFAULT_PROCESSES)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="customers per process")
+    parser.add_argument("--ops", type=int, default=DEFAULT_OPS, help="operations per customer")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-workspace", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Read by data_manager at import, in this process and in the spawned workers
+    os.environ["GOODFOODS_STORAGE_BACKEND"] = args.backend
+    os.environ["GOODFOODS_SQLITE_DB"] = "loadtest.db"
+
+    today = datetime.now()
+    dates = [(today + timedelta(days=d)).strftime("%d.%m.%Y") for d in range(args.days)]
+
+    with workspace(keep=args.keep_workspace):
+        import data_manager
+        with quiet():
+            for date in dates:
+                data_manager.get_availability(date)  # Create the trackers up front
+
+        start = time.perf_counter()
+        if args.processes <= 1:
+            per_process = [_run_process(0, args.threads, args.ops, dates, args.seed)]
+        else:
+            context = multiprocessing.get_context("spawn")  # No inherited locks, maps or connections
+            with context.Pool(args.processes) as pool:
+                per_process = pool.starmap(_run_process, [
+                    (p, args.threads, args.ops, dates, args.seed) for p in range(args.processes)
+                ])
+        wall = time.perf_counter() - start
+
+        print_report(per_process, wall, args.backend, args.processes * args.threads)
+        violations = check_invariants(dates)
+
+    if violations:
+        print(f"\nInvariant FAILED in {len(violations)} cell(s):")
+        for line in violations[:20]:
+            print(f"  {line}")
+        return 1
+    print("\nInvariant holds: tables left + confirmed tables_reserved == BASE_TABLE_CAPACITY everywhere.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
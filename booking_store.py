@@ -0,0 +1,405 @@
+import atexit
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+import telemetry
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# --- Configuration ---
+INT_FIELDS = ("restaurant_id", "party_size", "tables_reserved")
+
+# --- Helpers ---
+
+def _lock_file(fh):
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+def _unlock_file(fh):
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+def _file_signature(path: Path):
+    """Returns (inode, mtime_ns, size) for a file, or None if it doesn't exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def customer_key(name, email) -> tuple:
+    """Normalized (name, email) pair used by the customer index."""
+    return (str(name).strip().lower(), str(email).strip().lower())
+
+def _normalize_record(record: dict) -> dict:
+    """Restores integer fields that come back as strings from the CSV snapshot."""
+    for field in INT_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            record[field] = int(value)
+    return record
+
+class _DateState:
+    """Replayed bookings for one date plus the journal read position."""
+
+    def __init__(self, date_str: str):
+        self.date_str = date_str
+        self.records = {}          # booking_id -> record, in insertion order
+        self.snapshot_sig = None
+        self.journal_ino = None
+        self.offset = 0            # Bytes of the journal already applied
+        self.since_compaction = 0  # Journal records written since the last snapshot
+        self.fh = None             # Append handle for the journal
+        self.pending_sync = 0
+        self.last_sync = time.monotonic()
+
+class BookingJournal:
+    """
+    Stores bookings as a CSV snapshot per date plus an append-only journal.
+
+    Inserts and status changes are appended to `bookings[date].journal` as
+    one JSON line each, instead of rewriting the whole CSV. The journal is
+    fsynced in batches (every `fsync_every` records or `fsync_interval`
+    seconds). Every `compact_every` records the journal is folded into the
+    CSV snapshot, which keeps the original bookings CSV as the export format.
+    State is rebuilt on startup by replaying snapshot + journal, and readers
+    pick up records appended by other processes by tailing the journal.
+
+    Two hash indexes span every loaded date and are kept in step with each
+    applied record: booking_id -> (date, record) and normalized
+    (name, email) -> booking_ids. `dates_fn` lists the dates that have
+    booking files, so lookups can find bookings without being given a date.
+    """
+
+    def __init__(self, snapshot_path_fn, journal_path_fn, headers: list, dates_fn=None,
+                 fsync_every: int = 8, fsync_interval: float = 0.5, compact_every: int = 200):
+        self.snapshot_path_fn = snapshot_path_fn
+        self.journal_path_fn = journal_path_fn
+        self.headers = headers
+        self.dates_fn = dates_fn
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._dates = {}
+        self._by_id = {}        # booking_id -> (date_str, record)
+        self._by_customer = {}  # (name, email) -> {booking_id: None}, insertion ordered
+        atexit.register(self.flush)
+
+    # --- Indexes ---
+
+    def _index(self, state: _DateState, record: dict):
+        booking_id = record["booking_id"]
+        self._by_id[booking_id] = (state.date_str, record)
+        if record.get("customer_name") and record.get("customer_email"):
+            key = customer_key(record["customer_name"], record["customer_email"])
+            self._by_customer.setdefault(key, {})[booking_id] = None
+
+    def _unindex(self, state: _DateState, record: dict):
+        booking_id = record["booking_id"]
+        if self._by_id.get(booking_id, (None,))[0] == state.date_str:
+            del self._by_id[booking_id]
+        if record.get("customer_name") and record.get("customer_email"):
+            key = customer_key(record["customer_name"], record["customer_email"])
+            ids = self._by_customer.get(key)
+            if ids is not None:
+                ids.pop(booking_id, None)
+                if not ids:
+                    del self._by_customer[key]
+
+    # --- Replay ---
+
+    def _apply(self, state: _DateState, entry: dict):
+        """Applies one journal entry to the in-memory state and indexes."""
+        op = entry.get("op")
+        if op == "insert":
+            record = entry["record"]
+            previous = state.records.get(record["booking_id"])
+            if previous is not None:
+                self._unindex(state, previous)
+            state.records[record["booking_id"]] = record
+            self._index(state, record)
+        elif op == "status":
+            record = state.records.get(entry["booking_id"])
+            if record is not None:
+                record["status"] = entry["status"]
+                record["updated_at"] = entry["updated_at"]
+
+    def _read_snapshot(self, date_str: str) -> dict:
+        records = {}
+        snapshot_path = self.snapshot_path_fn(date_str)
+        if snapshot_path.exists():
+            with telemetry.span("storage.io", op="read", file="bookings") as io, \
+                    open(snapshot_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if row.get("booking_id"):
+                        records[row["booking_id"]] = _normalize_record(row)
+                io.io(f.buffer.tell(), len(records))
+        return records
+
+    def _tail_journal(self, date_str: str, state: _DateState):
+        """Applies journal entries written since the last read."""
+        journal_path = self.journal_path_fn(date_str)
+        try:
+            with open(journal_path, "rb") as f:
+                if state.journal_ino is not None and os.fstat(f.fileno()).st_ino != state.journal_ino:
+                    return  # Swapped out by a compaction; our offset means nothing here. _state() replays.
+                # Inode numbers are reused, so a later journal can match too;
+                # but every compaction writes a new snapshot first.
+                if _file_signature(self.snapshot_path_fn(date_str)) != state.snapshot_sig:
+                    return
+                f.seek(state.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        if not data:
+            return
+
+        # Only consume complete lines; a partially written tail is read next time
+        with telemetry.span("storage.io", op="read", file="journal") as io:
+            end = data.rfind(b"\n") + 1
+            applied = 0
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(state, json.loads(line))
+                    applied += 1
+            state.since_compaction += applied
+            state.offset += end
+            io.io(end, applied)
+
+    def _replay(self, date_str: str, state: _DateState):
+        """Rebuilds a date's state from its snapshot and journal."""
+        for _ in range(3):
+            snapshot_sig = _file_signature(self.snapshot_path_fn(date_str))
+            journal_sig = _file_signature(self.journal_path_fn(date_str))
+
+            for record in state.records.values():
+                self._unindex(state, record)
+            state.records = self._read_snapshot(date_str)
+            for record in state.records.values():
+                self._index(state, record)
+            state.offset = 0
+            state.since_compaction = 0
+            state.snapshot_sig = snapshot_sig
+            state.journal_ino = journal_sig[0] if journal_sig else None
+            self._tail_journal(date_str, state)
+
+            # A compaction that ran while we were reading means the snapshot
+            # we loaded may already be stale, so read again.
+            if _file_signature(self.snapshot_path_fn(date_str)) == snapshot_sig:
+                break
+
+    def _state(self, date_str: str) -> _DateState:
+        """Returns the up-to-date state for a date, replaying or tailing as needed."""
+        state = self._dates.get(date_str)
+        if state is None:
+            state = _DateState(date_str)
+            self._dates[date_str] = state
+            self._replay(date_str, state)
+            return state
+
+        snapshot_sig = _file_signature(self.snapshot_path_fn(date_str))
+        journal_sig = _file_signature(self.journal_path_fn(date_str))
+        journal_ino = journal_sig[0] if journal_sig else None
+
+        if snapshot_sig != state.snapshot_sig or journal_ino != state.journal_ino:
+            self._replay(date_str, state)
+        elif journal_sig and journal_sig[2] > state.offset:
+            self._tail_journal(date_str, state)
+        return state
+
+    # --- Writing ---
+
+    def _open_journal(self, date_str: str, state: _DateState):
+        if state.fh is not None:
+            state.fh.close()
+        state.fh = open(self.journal_path_fn(date_str), "ab")
+
+    def _lock_live_journal(self, date_str: str, state: _DateState) -> tuple:
+        """
+        Takes the cross-process lock on the current journal file.
+        The journal may have been swapped out by a compaction in another
+        process, so keep reopening until the locked file is the live one.
+        """
+        if state.fh is None:
+            self._open_journal(date_str, state)
+        while True:
+            _lock_file(state.fh)
+            current = _file_signature(self.journal_path_fn(date_str))
+            if current is not None and current[0] == os.fstat(state.fh.fileno()).st_ino:
+                return current
+            _unlock_file(state.fh)
+            self._open_journal(date_str, state)
+
+    def _append(self, date_str: str, entry: dict):
+        """Appends one entry to the journal and applies it locally."""
+        state = self._state(date_str)
+        line = (json.dumps(entry, default=str) + "\n").encode("utf-8")
+
+        current = self._lock_live_journal(date_str, state)
+        try:
+            # Compactions can't run while we hold the lock, so this is settled
+            if state.journal_ino != current[0] or _file_signature(self.snapshot_path_fn(date_str)) != state.snapshot_sig:
+                self._replay(date_str, state)
+            state.journal_ino = current[0]
+
+            # Catch up with anything other writers appended before ours
+            self._tail_journal(date_str, state)
+            # Bytes past the last complete line, while we hold the lock, are
+            # a line torn by a writer that died; drop them so ours starts clean
+            if os.fstat(state.fh.fileno()).st_size > state.offset:
+                log.warning("Dropping a truncated line at the end of %s", self.journal_path_fn(date_str))
+                os.ftruncate(state.fh.fileno(), state.offset)
+            with telemetry.span("storage.io", op="write", file="journal") as io:
+                state.fh.write(line)
+                state.fh.flush()
+                io.io(len(line), 1)
+        finally:
+            _unlock_file(state.fh)
+
+        self._tail_journal(date_str, state)
+        state.pending_sync += 1
+        self._maybe_sync(state)
+
+        if state.since_compaction >= self.compact_every:
+            self.compact(date_str)
+
+    def _maybe_sync(self, state: _DateState, force: bool = False):
+        """fsyncs the journal once enough records or time have accumulated."""
+        if state.fh is None or state.pending_sync == 0:
+            return
+        elapsed = time.monotonic() - state.last_sync
+        if force or state.pending_sync >= self.fsync_every or elapsed >= self.fsync_interval:
+            os.fsync(state.fh.fileno())
+            state.pending_sync = 0
+            state.last_sync = time.monotonic()
+
+    def flush(self):
+        """fsyncs every journal with unsynced records."""
+        with self._lock:
+            for state in self._dates.values():
+                self._maybe_sync(state, force=True)
+
+    # --- Compaction ---
+
+    def _write_snapshot(self, date_str: str, records: list):
+        snapshot_path = self.snapshot_path_fn(date_str)
+        tmp_path = snapshot_path.with_name(f"{snapshot_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with telemetry.span("storage.io", op="write", file="bookings") as io:
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=self.headers, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(records)
+                f.flush()
+                os.fsync(f.fileno())
+                io.io(f.tell(), len(records))
+            os.replace(tmp_path, snapshot_path)
+
+    def compact(self, date_str: str):
+        """
+        Folds the journal into the CSV snapshot and starts an empty journal.
+        The snapshot is written before the journal is replaced, so a crash
+        in between only causes idempotent records to be replayed twice.
+        """
+        with self._lock:
+            state = self._state(date_str)
+            journal_path = self.journal_path_fn(date_str)
+
+            self._lock_live_journal(date_str, state)
+            try:
+                self._replay(date_str, state)
+                self._write_snapshot(date_str, list(state.records.values()))
+
+                tmp_path = journal_path.with_name(f"{journal_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+                open(tmp_path, "wb").close()
+                os.replace(tmp_path, journal_path)
+            finally:
+                _unlock_file(state.fh)
+
+            self._open_journal(date_str, state)
+            state.pending_sync = 0
+            self._replay(date_str, state)
+
+    # --- Public API ---
+
+    def records(self, date_str: str) -> list:
+        """Returns the current bookings for a date, in insertion order."""
+        with self._lock:
+            return [dict(record) for record in self._state(date_str).records.values()]
+
+    def get(self, date_str: str, booking_id: str):
+        """Returns one booking for a date, or None."""
+        with self._lock:
+            record = self._state(date_str).records.get(booking_id)
+            return dict(record) if record is not None else None
+
+    def insert(self, date_str: str, record: dict):
+        """Journals a new booking."""
+        with self._lock:
+            self._append(date_str, {"op": "insert", "record": record})
+
+    def set_status(self, date_str: str, booking_id: str, status: str, updated_at: str) -> bool:
+        """Journals a status change. Returns False if the booking doesn't exist."""
+        with self._lock:
+            if booking_id not in self._state(date_str).records:
+                return False
+            self._append(date_str, {
+                "op": "status",
+                "booking_id": booking_id,
+                "status": status,
+                "updated_at": updated_at
+            })
+            return True
+
+    def load_all(self):
+        """Loads every date reported by `dates_fn`, refreshing ones already loaded."""
+        with self._lock:
+            dates = set(self._dates)
+            if self.dates_fn is not None:
+                dates.update(self.dates_fn())
+            for date_str in dates:
+                self._state(date_str)
+
+    def find(self, booking_id: str):
+        """
+        Looks up a booking by ID across all dates.
+        Returns (date_str, record) or None.
+        """
+        with self._lock:
+            hit = self._by_id.get(booking_id)
+            if hit is None:
+                # Possibly written by another process or on a date not loaded yet
+                self.load_all()
+                hit = self._by_id.get(booking_id)
+            else:
+                # Refresh that date so a status change elsewhere isn't missed
+                self._state(hit[0])
+                hit = self._by_id.get(booking_id)
+            if hit is None:
+                return None
+            return hit[0], dict(hit[1])
+
+    def find_by_customer(self, name: str, email: str) -> list:
+        """
+        Looks up all bookings for a customer across all dates.
+        Returns a list of (date_str, record) in booking order.
+        """
+        with self._lock:
+            self.load_all()
+            ids = self._by_customer.get(customer_key(name, email), {})
+            return [(self._by_id[b][0], dict(self._by_id[b][1])) for b in ids if b in self._by_id]
+
+    def export_csv(self, date_str: str) -> Path:
+        """Compacts the date and returns the path of the up-to-date bookings CSV."""
+        self.compact(date_str)
+        return self.snapshot_path_fn(date_str)
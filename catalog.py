@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import telemetry
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # No compiled catalog; the CSV is parsed every time
+    pa = None
+
+log = logging.getLogger(__name__)
+
+# --- Configuration ---
+ID_COLUMN = "restaurant_id"
+BRANCH_KEY = ("name", "address")  # One restaurant per (name, address) pair
+RATING_COLUMN = "rate"                       # "4.1/5" in the CSV, float in the catalog
+PRICE_COLUMN = "approx_cost(for two people)"  # "1,200" in the CSV, float in the catalog
+VOTES_COLUMN = "votes"
+TEXT_COLUMNS = ("menu_item", "reviews_list")  # Most of the file; only full-text search reads them
+COMPILED_FORMAT_VERSION = 1
+COMPILED_METADATA_KEY = b"goodfoods_catalog"
+
+# --- Cache State ---
+# The restaurant catalog is parsed once per process and kept in memory.
+# It is only re-parsed when the file's (mtime, size) signature changes.
+# The bulky text columns are kept apart and loaded on first use.
+
+_lock = threading.Lock()
+_cache = {
+    "path": None,
+    "signature": None,
+    "df": None,
+    "text": None,    # TEXT_COLUMNS by catalog row, once loaded
+    "source": None,  # "compiled" or "csv"
+    "version": 0,  # Bumped on every (re)load so dependents know to rebuild
+}
+_stats = {"hits": 0, "misses": 0, "reloads": 0, "compiled_loads": 0, "csv_loads": 0, "compiles": 0}
+
+# --- Helpers ---
+
+def _file_signature(path: Path) -> tuple:
+    """Returns the (mtime_ns, size) pair used to detect catalog changes."""
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _read_id_map(id_map_path: Path) -> dict:
+    """Reads the persisted {(name, address): restaurant_id} map, or {} if there is none."""
+    try:
+        with open(id_map_path, encoding="utf-8") as f:
+            entries = json.load(f)["restaurants"]
+    except FileNotFoundError:
+        return {}
+    return {(name, address): int(restaurant_id) for restaurant_id, name, address in entries}
+
+def _write_id_map(id_map_path: Path, ids: dict):
+    """Writes the id map atomically (temp file + rename)."""
+    entries = sorted([restaurant_id, name, address] for (name, address), restaurant_id in ids.items())
+    tmp_path = id_map_path.with_name(f"{id_map_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # One [id, name, address] entry per line keeps the file diffable
+        f.write('{"restaurants": [\n')
+        f.write(",\n".join(json.dumps(entry, ensure_ascii=False) for entry in entries))
+        f.write("\n]}\n")
+    os.replace(tmp_path, id_map_path)
+
+def _ingest(df: pd.DataFrame, id_map_path: Path) -> pd.DataFrame:
+    """
+    Dedupes branches by (name, address) and adds a stable `restaurant_id` column.
+
+    IDs come from the persisted map, so a restaurant keeps its ID as the
+    CSV is edited or reordered. New branches get the next free ID in file
+    order, which means a fresh map numbers restaurants by their catalog row.
+    """
+    df = df.drop_duplicates(subset=list(BRANCH_KEY), keep="first").reset_index(drop=True)
+    ids = _read_id_map(id_map_path)
+    next_id = max(ids.values(), default=-1) + 1
+    assigned = []
+    changed = False
+    for key in zip(df[BRANCH_KEY[0]], df[BRANCH_KEY[1]]):
+        if key not in ids:
+            ids[key] = next_id
+            next_id += 1
+            changed = True
+        assigned.append(ids[key])
+    if changed:
+        _write_id_map(id_map_path, ids)
+    df.insert(0, ID_COLUMN, assigned)
+    return df
+
+def _parse_rating(values: pd.Series) -> np.ndarray:
+    """Parses ratings like "4.1/5" or "3.9 /5" into floats (NaN for "NEW" or "-")."""
+    return pd.to_numeric(values.astype(str).str.split("/").str[0].str.strip(), errors="coerce").to_numpy(dtype=float)
+
+def _parse_price(values: pd.Series) -> np.ndarray:
+    """Parses cost strings like "1,200" into floats (NaN when missing)."""
+    return pd.to_numeric(values.astype(str).str.replace(",", ""), errors="coerce").to_numpy(dtype=float)
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts the rating, price and votes columns to numbers, in place of their strings."""
+    if RATING_COLUMN in df.columns:
+        df[RATING_COLUMN] = _parse_rating(df[RATING_COLUMN])
+    if PRICE_COLUMN in df.columns:
+        df[PRICE_COLUMN] = _parse_price(df[PRICE_COLUMN])
+    if VOTES_COLUMN in df.columns:
+        df[VOTES_COLUMN] = pd.to_numeric(df[VOTES_COLUMN], errors="coerce").fillna(0).astype(np.int64)
+    return df
+
+def _parse_csv(path: Path, signature: tuple, id_map_path) -> pd.DataFrame:
+    with telemetry.span("storage.io", op="read", file="catalog") as io:
+        df = pd.read_csv(path)
+        io.io(signature[1], len(df))
+    if id_map_path is not None:
+        df = _ingest(df, Path(id_map_path))
+    return _typed(df)
+
+def _split(df: pd.DataFrame) -> tuple:
+    """Returns (catalog without the text columns, the text columns)."""
+    text_columns = [column for column in TEXT_COLUMNS if column in df.columns]
+    return df.drop(columns=text_columns), df[text_columns]
+
+# --- Compiled Catalog ---
+# A columnar (Arrow/Feather) copy of the ingested, typed catalog. Reading
+# it skips CSV parsing, and column projection leaves the text columns on
+# disk until full-text search needs them. It records the signature of the
+# CSV it was built from and is ignored (and rebuilt) once that changes.
+
+def _write_compiled(df: pd.DataFrame, compiled_path: Path, signature: tuple):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[COMPILED_METADATA_KEY] = json.dumps({
+        "format_version": COMPILED_FORMAT_VERSION,
+        "source_signature": list(signature),
+    }).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = compiled_path.with_name(f"{compiled_path.name}.{os.getpid()}.tmp")
+    with telemetry.span("storage.io", op="write", file="catalog_compiled") as io:
+        feather.write_feather(table, tmp_path)
+        io.io(tmp_path.stat().st_size, len(df))
+    os.replace(tmp_path, compiled_path)
+
+def _read_compiled(compiled_path: Path, signature: tuple, columns=None):
+    """
+    Reads `columns` (default: all but TEXT_COLUMNS) of the compiled catalog,
+    or returns None if it is missing or was built from a different CSV.
+    """
+    if pa is None or not compiled_path.exists():
+        return None
+    with telemetry.span("storage.io", op="read", file="catalog_compiled") as io:
+        with pa.memory_map(str(compiled_path)) as source:
+            schema = pa.ipc.open_file(source).schema
+        info = json.loads((schema.metadata or {}).get(COMPILED_METADATA_KEY, b"{}"))
+        if info.get("format_version") != COMPILED_FORMAT_VERSION or tuple(info.get("source_signature", ())) != signature:
+            return None
+        if columns is None:
+            columns = [name for name in schema.names if name not in TEXT_COLUMNS]
+        table = feather.read_table(compiled_path, columns=list(columns), memory_map=True)
+        df = table.to_pandas()
+        io.io(table.nbytes, len(df))
+    return df
+
+def compile_catalog(path, id_map_path=None, compiled_path=None) -> Path:
+    """
+    Parses the CSV at `path` and writes the compiled catalog to
+    `compiled_path` (default: next to it, with a .feather suffix).
+    Returns the compiled file's path.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to compile the catalog")
+    path = Path(path)
+    compiled_path = Path(compiled_path) if compiled_path else path.with_suffix(".feather")
+    signature = _file_signature(path)
+    with _lock:
+        _write_compiled(_parse_csv(path, signature, id_map_path), compiled_path, signature)
+        _stats["compiles"] += 1
+    return compiled_path
+
+# --- Public API ---
+
+def load_catalog(path, id_map_path=None, compiled_path=None) -> pd.DataFrame:
+    """
+    Returns the restaurant catalog stored at `path`, without TEXT_COLUMNS
+    (see load_catalog_text). Rating, price and votes are numeric.
+    The catalog is loaded on first use and again only when the CSV changes
+    on disk. With `id_map_path`, branches are deduped and given stable IDs
+    (see _ingest).
+
+    With `compiled_path`, it is read from the compiled catalog there; if
+    that is missing or out of date, the CSV is parsed and it is rewritten.
+
+    The returned DataFrame is a shallow copy of the cached one: callers may
+    rename or add columns freely, but must not write into existing cells.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    path = Path(path)
+    signature = _file_signature(path)
+
+    with _lock:
+        cached = _cache["df"]
+        if cached is not None and _cache["path"] == path and _cache["signature"] == signature:
+            _stats["hits"] += 1
+        else:
+            if cached is None or _cache["path"] != path:
+                _stats["misses"] += 1
+            else:
+                _stats["reloads"] += 1
+
+            text = None
+            cached = _read_compiled(Path(compiled_path), signature) if compiled_path else None
+            if cached is not None:
+                _stats["compiled_loads"] += 1
+                _cache["source"] = "compiled"
+            else:
+                df = _parse_csv(path, signature, id_map_path)
+                _stats["csv_loads"] += 1
+                _cache["source"] = "csv"
+                if compiled_path and pa is not None:
+                    try:
+                        _write_compiled(df, Path(compiled_path), signature)
+                        _stats["compiles"] += 1
+                    except OSError:
+                        log.warning("Could not write the compiled catalog to %s", compiled_path, exc_info=True)
+                cached, text = _split(df)
+            _cache["path"] = path
+            _cache["signature"] = signature
+            _cache["df"] = cached
+            _cache["text"] = text
+            _cache["version"] += 1
+
+    return cached.copy(deep=False)
+
+def load_catalog_text(path, id_map_path=None, compiled_path=None) -> pd.DataFrame:
+    """
+    Returns TEXT_COLUMNS for every catalog row, in the same order as
+    load_catalog (which it calls first, with the same arguments).
+    Read from the compiled catalog on first use, then cached with it.
+    """
+    load_catalog(path, id_map_path, compiled_path)
+    with _lock:
+        if _cache["text"] is None:
+            text = _read_compiled(Path(compiled_path), _cache["signature"], TEXT_COLUMNS) if compiled_path else None
+            if text is None:  # Replaced since the catalog was loaded; parse the CSV
+                _, text = _split(_parse_csv(_cache["path"], _cache["signature"], id_map_path))
+            _cache["text"] = text
+        return _cache["text"].copy(deep=False)
+
+def get_catalog_version() -> int:
+    """Returns a counter that increases every time the catalog is (re)loaded."""
+    return _cache["version"]
+
+def get_catalog_signature():
+    """Returns the (mtime_ns, size) of the currently cached catalog file, or None."""
+    return _cache["signature"]
+
+def get_catalog_stats() -> dict:
+    """Returns the cache hit/miss/reload counters, and where the catalog was last loaded from."""
+    with _lock:
+        stats = dict(_stats)
+        stats["version"] = _cache["version"]
+        stats["source"] = _cache["source"]
+        stats["text_loaded"] = _cache["text"] is not None
+        return stats
+
+def clear_catalog_cache():
+    """Drops the cached catalog so the next call re-parses the file."""
+    with _lock:
+        _cache["path"] = None
+        _cache["signature"] = None
+        _cache["df"] = None
+        _cache["text"] = None
+        _cache["source"] = None
+
+if __name__ == "__main__":
+    # Build step: python catalog.py
+    import data_manager
+    path = data_manager.build_catalog()
+    print(f"Compiled catalog written to {path}")
@@ -0,0 +1,118 @@
+from pathlib import Path
+import numpy as np
+from availability import AvailabilityEngine
+from booking_store import BookingJournal
+from slot_locks import SlotLockManager
+
+class CsvStorage:
+    """
+    The default, file-based storage backend.
+
+    Availability is a base capacity plus per-date logs of changes, bookings
+    live in per-date CSV snapshots plus append-only journals, and writes to a
+    (date, restaurant, slot) cell are serialized with file record locks.
+    Restaurants are addressed by their restaurant_id (matrix row).
+    """
+
+    name = "csv"
+
+    def __init__(self, availability: AvailabilityEngine, bookings: BookingJournal, locks: SlotLockManager):
+        self.availability = availability
+        self.bookings = bookings
+        self.locks = locks
+
+    # --- Availability ---
+
+    def has_date(self, date_str: str) -> bool:
+        return self.availability.exists(date_str)
+
+    def create_date(self, date_str: str, n_rows: int, seed: np.ndarray = None) -> bool:
+        """Sets up availability for a date (see AvailabilityEngine.create). Returns False if it already existed."""
+        return self.availability.create(date_str, n_rows, seed)
+
+    def matrix(self, date_str: str, n_rows: int) -> np.ndarray:
+        """Returns a copy of the date's availability (n_rows x slots)."""
+        return self.availability.snapshot(date_str, n_rows)
+
+    def availability_version(self, date_str: str) -> int:
+        """A counter that changes whenever the date's availability does, in any process."""
+        return self.availability.version(date_str)
+
+    def get_tables(self, date_str: str, n_rows: int, row: int, slot_idx: int) -> int:
+        return self.availability.get(date_str, n_rows, row, slot_idx)
+
+    def rows_with_capacity(self, date_str: str, n_rows: int, slot_idx: int, tables_needed: int) -> np.ndarray:
+        return self.availability.rows_with_capacity(date_str, n_rows, slot_idx, tables_needed)
+
+    def add_tables(self, date_str: str, n_rows: int, row: int, slot_idx: int, change: int):
+        """Applies `change` to one cell under its lock. Returns the new value, or None if it would go negative."""
+        with self.locks.hold(date_str, row, slot_idx):
+            return self.availability.add(date_str, n_rows, row, slot_idx, change)
+
+    def hold(self, date_str: str, row: int, slot_idx: int):
+        return self.locks.hold(date_str, row, slot_idx)
+
+    def lock_stats(self) -> dict:
+        return self.locks.stats()
+
+    # --- Bookings ---
+
+    def records(self, date_str: str) -> list:
+        return self.bookings.records(date_str)
+
+    def insert_booking(self, date_str: str, record: dict, row: int = -1, slot_idx: int = -1):
+        self.bookings.insert(date_str, record)
+
+    def set_status(self, date_str: str, booking_id: str, status: str, updated_at: str) -> bool:
+        return self.bookings.set_status(date_str, booking_id, status, updated_at)
+
+    def find(self, booking_id: str):
+        return self.bookings.find(booking_id)
+
+    def find_by_customer(self, name: str, email: str) -> list:
+        return self.bookings.find_by_customer(name, email)
+
+    def export_bookings_csv(self, date_str: str, filepath: Path) -> Path:
+        """Compacts the journal; the snapshot is already the bookings CSV."""
+        return self.bookings.export_csv(date_str)
+
+    # --- Combined Operations ---
+
+    def create_booking(self, date_str: str, n_rows: int, row: int, slot_idx: int, record: dict) -> tuple:
+        """
+        Takes `record['tables_reserved']` tables and journals the booking,
+        under the cell's lock. Returns (created, tables_left).
+        If the journal write fails the tables are given back and the error re-raised.
+        """
+        tables = int(record["tables_reserved"])
+        with self.locks.hold(date_str, row, slot_idx):
+            tables_left = self.availability.add(date_str, n_rows, row, slot_idx, -tables)
+            if tables_left is None:
+                return False, self.availability.get(date_str, n_rows, row, slot_idx)
+            try:
+                self.bookings.insert(date_str, record)
+            except Exception:
+                self.availability.add(date_str, n_rows, row, slot_idx, tables)
+                raise
+            return True, tables_left
+
+    def cancel_booking(self, date_str: str, booking_id: str, n_rows: int, row: int, slot_idx: int, updated_at: str) -> str:
+        """
+        Returns a booking's tables and marks it cancelled, under the cell's lock.
+        Returns "cancelled", "already_cancelled" or "not_found".
+        """
+        with self.locks.hold(date_str, row, slot_idx):
+            record = self.bookings.get(date_str, booking_id)
+            if record is None:
+                return "not_found"
+            if str(record["status"]).lower().startswith("cancelled"):
+                return "already_cancelled"
+
+            tables = int(record["tables_reserved"])
+            self.availability.add(date_str, n_rows, row, slot_idx, tables)
+            try:
+                self.bookings.set_status(date_str, booking_id, "cancelled", updated_at)
+            except Exception:
+                self.availability.add(date_str, n_rows, row, slot_idx, -tables)
+                raise
+            return "cancelled"
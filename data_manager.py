@@ -1,11 +1,33 @@
+import logging
+import os
+import sys
 import pandas as pd
 from pathlib import Path
 import math
+import threading
 import uuid
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from contextlib import nullcontext
+import numpy as np
+import catalog
+import recommender
+import telemetry
+import text_index
+from availability import AvailabilityEngine
+from booking_store import BookingJournal
+from slot_locks import SlotLockManager
+from csv_storage import CsvStorage
+
+log = logging.getLogger(__name__)
 
 # --- Configuration ---
 RESTAURANT_DATA_FILE = 'restaurantData.csv'
+RESTAURANT_ID_FILE = 'restaurant_ids.json'  # Persisted (name, address) -> restaurant_id map
+COMPILED_CATALOG_FILE = 'restaurantData.feather'  # Columnar copy of the catalog, rebuilt when the CSV changes
+TEXT_INDEX_DIR = 'text_index'               # BM25 index over dishes, menus and reviews
+STORAGE_BACKEND = os.getenv("GOODFOODS_STORAGE_BACKEND", "csv")  # "csv" or "sqlite"
+SQLITE_DB_FILE = os.getenv("GOODFOODS_SQLITE_DB", "goodfoods.db")
 BASE_TABLE_CAPACITY = 10  # Default tables per slot for a new restaurant
 AVG_GUESTS_PER_TABLE = 4  # Assumption for calculating required tables
 
@@ -15,6 +37,25 @@ TIME_SLOTS = [
     "03:00 PM", "04:00 PM", "05:00 PM", "06:00 PM", "07:00 PM", 
     "08:00 PM", "09:00 PM", "10:00 PM"
 ]
+SLOT_INDEX = {slot: i for i, slot in enumerate(TIME_SLOTS)}
+
+DATE_FORMAT = "%d.%m.%Y"  # Dates are passed around as DD.MM.YYYY strings
+MAX_SEARCH_DAYS = 4       # Widest date range search_availability will scan
+
+# Columns of the bookings CSV (also the journal's export format)
+BOOKING_HEADERS = [
+    "booking_id", "customer_name", "customer_email", "customer_phone",
+    "restaurant_id", "restaurant_name", "restaurant_address", "party_size", "time_slot",
+    "tables_reserved", "status", "special_requests", "created_at", "updated_at"
+]
+
+# Booking journal tuning
+JOURNAL_FSYNC_EVERY = 8        # fsync after this many journal records...
+JOURNAL_FSYNC_INTERVAL = 0.5   # ...or once this many seconds have passed
+JOURNAL_COMPACT_EVERY = 200    # Fold the journal into the CSV after this many records
+
+# Entries kept by the availability search cache (0 turns it off)
+AVAILABILITY_CACHE_SIZE = int(os.getenv("GOODFOODS_AVAILABILITY_CACHE_SIZE", "256"))
 
 # --- File Path Helpers ---
 
@@ -22,92 +63,577 @@ def get_tracker_filepath(date_str: str) -> Path:
     """Gets the file path for the tracker CSV for a given date."""
     return Path(f"restaurant_booking_tracker[{date_str}].csv")
 
+def get_tracker_delta_filepath(date_str: str) -> Path:
+    """Gets the file path for the append-only log of availability changes for a given date."""
+    return Path(f"restaurant_booking_tracker[{date_str}].delta")
+
+def get_tracker_lock_filepath(date_str: str) -> Path:
+    """Gets the file path used for cross-process slot locks for a given date."""
+    return Path(f"restaurant_booking_tracker[{date_str}].lock")
+
 def get_bookings_filepath(date_str: str) -> Path:
     """Gets the file path for the bookings CSV for a given date."""
     return Path(f"bookings[{date_str}].csv")
 
+def get_bookings_journal_filepath(date_str: str) -> Path:
+    """Gets the file path for the append-only bookings journal for a given date."""
+    return Path(f"bookings[{date_str}].journal")
+
+def list_booking_dates() -> list:
+    """Lists every date that has a bookings CSV or journal on disk."""
+    dates = set()
+    for filepath in Path(".").glob("bookings*"):
+        if filepath.suffix in (".csv", ".journal") and filepath.stem.startswith("bookings["):
+            dates.add(filepath.stem[len("bookings["):-1])
+    return sorted(dates)
+
+# --- Storage Backend ---
+
+def _create_storage():
+    """Builds the storage backend selected by STORAGE_BACKEND."""
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_storage import SqliteStorage
+        return SqliteStorage(
+            db_path=SQLITE_DB_FILE,
+            headers=BOOKING_HEADERS,
+            n_slots=len(TIME_SLOTS),
+            base_capacity=BASE_TABLE_CAPACITY
+        )
+
+    if STORAGE_BACKEND != "csv":
+        raise ValueError(f"Unknown GOODFOODS_STORAGE_BACKEND '{STORAGE_BACKEND}'. Use 'csv' or 'sqlite'.")
+
+    return CsvStorage(
+        availability=AvailabilityEngine(
+            delta_path_fn=get_tracker_delta_filepath,
+            n_slots=len(TIME_SLOTS),
+            base_capacity=BASE_TABLE_CAPACITY
+        ),
+        bookings=BookingJournal(
+            snapshot_path_fn=get_bookings_filepath,
+            journal_path_fn=get_bookings_journal_filepath,
+            headers=BOOKING_HEADERS,
+            dates_fn=list_booking_dates,
+            fsync_every=JOURNAL_FSYNC_EVERY,
+            fsync_interval=JOURNAL_FSYNC_INTERVAL,
+            compact_every=JOURNAL_COMPACT_EVERY
+        ),
+        locks=SlotLockManager(
+            lock_path_fn=get_tracker_lock_filepath,
+            n_slots=len(TIME_SLOTS)
+        )
+    )
+
+_storage = _create_storage()
+
+# --- Restaurant Index ---
+# Availability matrices and bookings are keyed by restaurant_id (one row
+# per ID), so names are only resolved once, here, with dict lookups.
+
+_index_cache = {"version": None, "by_name": {}, "by_id": {}, "ids": np.empty(0, dtype=np.int64), "n_ids": 0}
+
+def _restaurant_index() -> dict:
+    """
+    Returns the restaurant lookup tables:
+      by_name: name -> tuple of restaurant_ids (one per branch, catalog order)
+      by_id:   restaurant_id -> catalog row
+      ids:     restaurant_id of every catalog row, as an array
+      n_ids:   rows needed in an availability matrix (highest ID + 1)
+    Rebuilt only when the catalog is reloaded.
+    """
+    df_restaurants = get_restaurant_data()
+    version = catalog.get_catalog_version()
+    if _index_cache["version"] != version:
+        by_name = {}
+        ids = df_restaurants[catalog.ID_COLUMN].to_numpy(dtype=np.int64) if not df_restaurants.empty else np.empty(0, dtype=np.int64)
+        for restaurant_id, name in zip(ids.tolist(), df_restaurants.get('name', [])):
+            name = sys.intern(str(name))
+            by_name[name] = by_name.get(name, ()) + (restaurant_id,)
+        _index_cache["by_name"] = by_name
+        _index_cache["by_id"] = {restaurant_id: row for row, restaurant_id in enumerate(ids.tolist())}
+        _index_cache["ids"] = ids
+        _index_cache["n_ids"] = int(ids.max()) + 1 if len(ids) else 0
+        _index_cache["version"] = version
+    return _index_cache
+
+def _resolve_restaurant(restaurant):
+    """
+    Returns the restaurant_id for an ID or a name (first branch), or None if unknown.
+    """
+    index = _restaurant_index()
+    if isinstance(restaurant, (int, np.integer)) and not isinstance(restaurant, bool):
+        return int(restaurant) if int(restaurant) in index["by_id"] else None
+    branches = index["by_name"].get(restaurant)
+    return branches[0] if branches else None
+
+def get_restaurant_id(restaurant_name: str, address: str = None):
+    """
+    Returns the restaurant_id for a name, or None if unknown.
+    When a name has several branches, `address` picks one; otherwise the first is used.
+    """
+    branches = _restaurant_index()["by_name"].get(restaurant_name, ())
+    if address:
+        for restaurant_id in branches:
+            if get_restaurant(restaurant_id)["address"] == address:
+                return restaurant_id
+        return None
+    return branches[0] if branches else None
+
+def get_restaurant(restaurant_id: int):
+    """Returns the catalog entry for a restaurant_id as a dict, or None if unknown."""
+    row = _restaurant_index()["by_id"].get(restaurant_id)
+    if row is None:
+        return None
+    return get_restaurant_data().iloc[row].to_dict()
+
+_projection_cache = {"version": None, "df": None}
+
+def _restaurant_projection() -> pd.DataFrame:
+    """
+    The catalog reduced to the fields availability searches return
+    (name, location, price, rating, reviews).
+    In catalog row order, so availability joins by position.
+    Rebuilt only when the catalog is reloaded.
+    """
+    df_restaurants = get_restaurant_data()
+    version = catalog.get_catalog_version()
+    if _projection_cache["version"] != version:
+        _projection_cache["df"] = pd.DataFrame({
+            'restaurant_id': df_restaurants[catalog.ID_COLUMN],
+            'name': df_restaurants['name'],
+            'location': df_restaurants['location'],
+            'price': pd.array(df_restaurants[catalog.PRICE_COLUMN].to_numpy(), dtype='Int64'),
+            'rating': df_restaurants[catalog.RATING_COLUMN],  # NaN: "NEW" has no rating yet
+            'reviews': df_restaurants[catalog.VOTES_COLUMN],
+        }).reset_index(drop=True)
+        _projection_cache["version"] = version
+    return _projection_cache["df"]
+
+def get_restaurant_names(restaurant_ids) -> list:
+    """Returns the name of each restaurant_id (None for unknown IDs), from the cached projection."""
+    by_id = _restaurant_index()["by_id"]
+    names = _restaurant_projection()["name"].to_numpy()
+    return [names[by_id[restaurant_id]] if restaurant_id in by_id else None for restaurant_id in restaurant_ids]
+
+_recommendation_cache = {"version": None, "index": None}
+
+def _recommendation_index() -> recommender.RecommendationIndex:
+    """The cuisine/location/type indexes over the catalog. Rebuilt only when the catalog is reloaded."""
+    df_restaurants = get_restaurant_data()
+    version = catalog.get_catalog_version()
+    if _recommendation_cache["version"] != version:
+        _recommendation_cache["index"] = recommender.RecommendationIndex(df_restaurants)
+        _recommendation_cache["version"] = version
+    return _recommendation_cache["index"]
+
+def get_recommendation_terms(field: str) -> list:
+    """Returns the known values for a recommendation filter ("cuisine", "location" or "rest_type")."""
+    return _recommendation_index().terms(field)
+
+_text_index_cache = {"version": None, "index": None}
+
+def build_text_index() -> Path:
+    """Rebuilds the on-disk BM25 index from the current catalog and returns its directory."""
+    df_restaurants = pd.concat([get_restaurant_data(), get_restaurant_text()], axis=1)
+    path = text_index.build_index(df_restaurants, TEXT_INDEX_DIR, catalog.get_catalog_signature())
+    _text_index_cache["version"] = None
+    return path
+
+def _text_index() -> text_index.TextIndex:
+    """
+    Returns the memory-mapped BM25 index. It is built on first use, and
+    rebuilt if it was made from a different version of the catalog file.
+    """
+    get_restaurant_data()
+    version = catalog.get_catalog_version()
+    if _text_index_cache["version"] != version:
+        index = None
+        if Path(TEXT_INDEX_DIR).exists():
+            index = text_index.TextIndex(TEXT_INDEX_DIR)
+        if index is None or index.source_signature != tuple(catalog.get_catalog_signature()):
+            log.info("Building text index in %s...", TEXT_INDEX_DIR)
+            index = text_index.TextIndex(build_text_index())
+        _text_index_cache["index"] = index
+        _text_index_cache["version"] = version
+    return _text_index_cache["index"]
+
+def _legacy_tracker_seed(date_str: str, df_restaurants: pd.DataFrame):
+    """
+    Returns starting values from an old CSV tracker for the date, if one exists,
+    so availability recorded before the change logs is carried over.
+    """
+    filepath = get_tracker_filepath(date_str)
+    if not filepath.exists():
+        return None
+
+    with telemetry.span("storage.io", op="read", file="tracker") as io:
+        legacy_df = pd.read_csv(filepath)
+        io.io(filepath.stat().st_size, len(legacy_df))
+    index = _restaurant_index()
+    seed = np.full((index["n_ids"], len(TIME_SLOTS)), BASE_TABLE_CAPACITY, dtype=np.int16)
+    if len(legacy_df) == len(df_restaurants):
+        for slot, i in SLOT_INDEX.items():
+            if slot in legacy_df.columns:
+                seed[index["ids"], i] = legacy_df[slot].to_numpy()
+        return seed
+
+    for _, legacy_row in legacy_df.iterrows():
+        row = _resolve_restaurant(legacy_row['Name'])
+        if row is None:
+            continue
+        for slot, i in SLOT_INDEX.items():
+            if slot in legacy_df.columns:
+                seed[row, i] = legacy_row[slot]
+    return seed
+
 # --- Creation Functions ---
 
 def create_new_tracker_file(date_str: str):
     """
-    Creates a new restaurant_booking_tracker file for a given date,
-    populating it from restaurantData.csv.
+    Sets up availability for a given date: BASE_TABLE_CAPACITY in every
+    slot of every restaurant, which writes nothing to disk. An existing
+    CSV tracker for the date is imported instead.
     """
-    print(f"Creating new tracker file for {date_str}...")
+    log.info("Setting up availability for %s...", date_str)
     try:
-        df_restaurants = pd.read_csv(RESTAURANT_DATA_FILE)
-        
-        # Select base columns
-        tracker_df = df_restaurants[['name', 'location', 'address', 'phone']].copy()
-        
-        # Add time slot columns with default capacity
-        for slot in TIME_SLOTS:
-            tracker_df[slot] = BASE_TABLE_CAPACITY
-            
-        # Rename columns to match tracker format
-        tracker_df = tracker_df.rename(columns={
-            'name': 'Name',
-            'location': 'Location',
-            'address': 'Address',
-            'phone': 'Phone'
-        })
-
-        tracker_df.to_csv(get_tracker_filepath(date_str), index=False)
-        print(f"Successfully created {get_tracker_filepath(date_str)}")
+        df_restaurants = catalog.load_catalog(RESTAURANT_DATA_FILE, RESTAURANT_ID_FILE, COMPILED_CATALOG_FILE)
+        seed = _legacy_tracker_seed(date_str, df_restaurants)
+        _storage.create_date(date_str, _restaurant_index()["n_ids"], seed)
+        log.info("Availability ready for %s", date_str)
         
     except FileNotFoundError:
-        print(f"ERROR: Cannot create tracker. {RESTAURANT_DATA_FILE} not found.")
-    except Exception as e:
-        print(f"ERROR creating tracker file: {e}")
+        log.error("Cannot create tracker. %s not found.", RESTAURANT_DATA_FILE)
+    except Exception:
+        log.exception("Could not create tracker file for %s", date_str)
+
+def export_tracker_csv(date_str: str) -> Path:
+    """
+    Writes the availability for a date in the original tracker CSV format
+    (restaurant_id, Name, Location, Address, Phone, one column per time slot).
+    """
+    filepath = get_tracker_filepath(date_str)
+    availability = get_availability(date_str)
+    with telemetry.span("storage.io", op="write", file="tracker") as io:
+        availability.to_csv(filepath, index=False)
+        io.io(filepath.stat().st_size, len(availability))
+    return filepath
 
 def create_new_bookings_file(date_str: str):
     """Creates a new, empty bookings file for a given date with correct headers."""
-    print(f"Creating new bookings file for {date_str}...")
-    headers = [
-        "booking_id", "customer_name", "customer_email", "customer_phone",
-        "restaurant_name", "restaurant_address", "party_size", "time_slot",
-        "tables_reserved", "status", "special_requests", "created_at", "updated_at"
-    ]
-    df = pd.DataFrame(columns=headers)
+    log.info("Creating new bookings file for %s...", date_str)
+    df = pd.DataFrame(columns=BOOKING_HEADERS)
     df.to_csv(get_bookings_filepath(date_str), index=False)
 
+def export_bookings_csv(date_str: str) -> Path:
+    """
+    Writes the up-to-date bookings for a date to bookings[date].csv
+    and returns its path.
+    """
+    return _storage.export_bookings_csv(date_str, get_bookings_filepath(date_str))
+
 # --- Data Reading Functions ---
 
 def get_restaurant_data():
-    """Loads the main restaurant data file."""
+    """
+    Loads the main restaurant data file.
+    Served from the in-process catalog cache, loaded from the compiled
+    catalog; the CSV is only re-parsed when it changes on disk. Branches
+    are deduped by (name, address) and carry a stable restaurant_id column.
+    Rating, price and votes are numeric. The menu and review text is left
+    out; see get_restaurant_text.
+    """
     try:
-        return pd.read_csv(RESTAURANT_DATA_FILE)
+        return catalog.load_catalog(RESTAURANT_DATA_FILE, RESTAURANT_ID_FILE, COMPILED_CATALOG_FILE)
     except FileNotFoundError:
-        print(f"ERROR: {RESTAURANT_DATA_FILE} not found.")
+        log.error("%s not found.", RESTAURANT_DATA_FILE)
         return pd.DataFrame() # Return empty df
 
+def get_restaurant_text():
+    """
+    Returns the menu and review text (catalog.TEXT_COLUMNS) by catalog row,
+    aligned with get_restaurant_data. Loaded on first use.
+    """
+    try:
+        return catalog.load_catalog_text(RESTAURANT_DATA_FILE, RESTAURANT_ID_FILE, COMPILED_CATALOG_FILE)
+    except FileNotFoundError:
+        log.error("%s not found.", RESTAURANT_DATA_FILE)
+        return pd.DataFrame()
+
+def build_catalog() -> Path:
+    """Compiles the restaurant CSV into COMPILED_CATALOG_FILE and returns its path."""
+    return catalog.compile_catalog(RESTAURANT_DATA_FILE, RESTAURANT_ID_FILE, COMPILED_CATALOG_FILE)
+
+def get_catalog_stats() -> dict:
+    """Returns hit/miss/reload counters for the restaurant catalog cache."""
+    return catalog.get_catalog_stats()
+
+def _prepare_date(date_str: str) -> int:
+    """
+    Makes sure the backend has availability for a date, creating it if needed.
+    Returns the number of matrix rows (highest restaurant_id + 1).
+    """
+    n_rows = _restaurant_index()["n_ids"]
+    if not _storage.has_date(date_str):
+        create_new_tracker_file(date_str)
+    return n_rows
+
+def _locate(restaurant, time_slot: str):
+    """
+    Returns (restaurant_id, slot_idx) for a restaurant (ID or name) and slot,
+    with None for unknown parts.
+    """
+    return _resolve_restaurant(restaurant), SLOT_INDEX.get(time_slot)
+
 def get_availability(date_str: str) -> pd.DataFrame:
     """
     Loads the availability tracker for a given date.
     Creates it if it doesn't exist.
     """
-    filepath = get_tracker_filepath(date_str)
-    if not filepath.exists():
-        create_new_tracker_file(date_str)
-        
+    df_restaurants = get_restaurant_data()
+    if df_restaurants.empty:
+        return pd.DataFrame()
+
     try:
-        return pd.read_csv(filepath)
+        n_rows = _prepare_date(date_str)
+        matrix = _storage.matrix(date_str, n_rows)
     except FileNotFoundError: # In case creation failed
         return pd.DataFrame()
 
+    tracker_df = df_restaurants[[catalog.ID_COLUMN, 'name', 'location', 'address', 'phone']].rename(columns={
+        'name': 'Name',
+        'location': 'Location',
+        'address': 'Address',
+        'phone': 'Phone'
+    })
+    slots_df = pd.DataFrame(matrix[_restaurant_index()["ids"]], columns=TIME_SLOTS, index=tracker_df.index)
+    return pd.concat([tracker_df, slots_df], axis=1)
+
+def get_tables_available(date_str: str, restaurant, time_slot: str):
+    """
+    Returns the tables left for one restaurant (ID or name) and slot,
+    or None if the restaurant or slot is unknown.
+    """
+    row, slot_idx = _locate(restaurant, time_slot)
+    if row is None or slot_idx is None:
+        return None
+    n_rows = _prepare_date(date_str)
+    return _storage.get_tables(date_str, n_rows, row, slot_idx)
+
+def find_available_rows(date_str: str, time_slot: str, tables_needed: int) -> np.ndarray:
+    """
+    Returns the restaurant_ids of restaurants with at least
+    `tables_needed` tables left in `time_slot` (a single vectorized scan).
+    """
+    slot_idx = SLOT_INDEX[time_slot]
+    n_rows = _prepare_date(date_str)
+    return _storage.rows_with_capacity(date_str, n_rows, slot_idx, tables_needed)
+
+# --- Availability Cache ---
+# Results of list_available_restaurants, keyed by (date, slot, tables_needed)
+# and tagged with the catalog version and the date's availability version.
+# Every availability write bumps the date's version (in any process), so a
+# tagged entry is served only while nothing on that date has changed.
+
+_availability_cache = {"entries": OrderedDict(), "hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+_availability_cache_lock = threading.Lock()
+
+def _availability_cache_get(key: tuple, version: tuple):
+    with _availability_cache_lock:
+        entry = _availability_cache["entries"].get(key)
+        if entry is not None and entry[0] == version:
+            _availability_cache["entries"].move_to_end(key)
+            _availability_cache["hits"] += 1
+            return entry[1]
+        _availability_cache["misses"] += 1
+        if entry is not None:
+            _availability_cache["stale"] += 1
+        return None
+
+def _availability_cache_put(key: tuple, version: tuple, value):
+    if AVAILABILITY_CACHE_SIZE <= 0:
+        return
+    with _availability_cache_lock:
+        entries = _availability_cache["entries"]
+        entries[key] = (version, value)
+        entries.move_to_end(key)
+        while len(entries) > AVAILABILITY_CACHE_SIZE:
+            entries.popitem(last=False)
+            _availability_cache["evictions"] += 1
+
+def get_availability_cache_stats() -> dict:
+    """Returns hit/miss counters and the hit rate of the availability search cache."""
+    with _availability_cache_lock:
+        stats = {key: value for key, value in _availability_cache.items() if key != "entries"}
+        stats["size"] = len(_availability_cache["entries"])
+    lookups = stats["hits"] + stats["misses"]
+    stats["capacity"] = AVAILABILITY_CACHE_SIZE
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+def clear_availability_cache():
+    with _availability_cache_lock:
+        _availability_cache["entries"].clear()
+
+def list_available_restaurants(date_str: str, time_slot: str, tables_needed: int) -> pd.DataFrame:
+    """
+    Returns the restaurants with at least `tables_needed` tables left in
+    `time_slot`: the precomputed projection rows picked by position, plus
+    a tables_available column.
+    Results are cached until the date's availability or the catalog changes.
+    """
+    projection = _restaurant_projection()
+    n_rows = _prepare_date(date_str)
+
+    # Read the version before the matrix: a write landing in between makes
+    # the entry look older than it is, never newer
+    key = (date_str, time_slot, int(tables_needed))
+    version = (catalog.get_catalog_version(), _storage.availability_version(date_str))
+    cached = _availability_cache_get(key, version)
+    if cached is not None:
+        return cached.copy()
+
+    tables = _storage.matrix(date_str, n_rows)[_restaurant_index()["ids"], SLOT_INDEX[time_slot]]
+    rows = np.flatnonzero(tables >= tables_needed)
+    available = projection.iloc[rows].copy()
+    available['tables_available'] = tables[rows]
+    _availability_cache_put(key, version, available)
+    return available.copy()
+
+def recommend_restaurants(date_str: str, time_slot: str, tables_needed: int, cuisine: str = None,
+                          location: str = None, rest_type: str = None, max_price: float = None,
+                          min_rating: float = None, k: int = 5) -> pd.DataFrame:
+    """
+    Returns the `k` best-rated restaurants matching the filters that have at
+    least `tables_needed` tables in `time_slot`, best first.
+
+    Filters are answered from the inverted indexes, then intersected with
+    the slot's live availability; only the survivors are ranked.
+    Raises recommender.UnknownTermError when a filter value matches nothing.
+    """
+    index = _recommendation_index()
+    rows = index.candidates(cuisine, location, rest_type, max_price, min_rating)
+
+    n_rows = _prepare_date(date_str)
+    ids = _restaurant_index()["ids"]
+    tables = _storage.matrix(date_str, n_rows)[ids[rows], SLOT_INDEX[time_slot]]
+    rows = rows[tables >= tables_needed]
+    tables = tables[tables >= tables_needed]
+
+    best = index.top_k(rows, k)
+    tables_by_row = dict(zip(rows.tolist(), tables.tolist()))
+    df_restaurants = get_restaurant_data()
+    recommended = _restaurant_projection().iloc[best].copy()
+    recommended['cuisines'] = df_restaurants['cuisines'].iloc[best].to_numpy()
+    recommended['rest_type'] = df_restaurants['rest_type'].iloc[best].to_numpy()
+    recommended['tables_available'] = [tables_by_row[row] for row in best]
+    return recommended
+
+def search_restaurant_text(query: str, k: int = 5) -> list:
+    """
+    Full-text search over dishes, menus and reviews, ranked by BM25.
+    Returns up to `k` dicts with restaurant_id, name, location, score and
+    short snippets showing where the query matched.
+    """
+    df_restaurants = get_restaurant_data()
+    df_text = get_restaurant_text()
+    results = []
+    for row, restaurant_id, score, terms in _text_index().search(query, k):
+        restaurant = df_restaurants.iloc[row]
+        texts = [
+            df_text[field].iat[row] if field in df_text.columns else restaurant[field]
+            for field in text_index.FIELD_WEIGHTS
+        ]
+        results.append({
+            "restaurant_id": restaurant_id,
+            "name": restaurant['name'],
+            "location": restaurant['location'],
+            "score": round(score, 2),
+            "snippets": text_index.snippets(texts, terms),
+        })
+    return results
+
+def dates_between(start_date: str, end_date: str) -> list:
+    """Returns every DD.MM.YYYY date from start_date to end_date inclusive."""
+    start = datetime.strptime(start_date, DATE_FORMAT)
+    end = datetime.strptime(end_date, DATE_FORMAT)
+    return [(start + timedelta(days=i)).strftime(DATE_FORMAT) for i in range((end - start).days + 1)]
+
+def search_availability(dates: list, time_slots: list, tables_needed: int) -> list:
+    """
+    Finds every (restaurant, date, slot) with at least `tables_needed` tables,
+    over all the given dates and slots in one vectorized pass.
+
+    The per-date matrices are stacked into a (dates x restaurants x slots)
+    array, so one comparison and one nonzero() cover all combinations.
+    Returns a list of (restaurant_id, date_str, time_slot, tables_left)
+    tuples, ordered by date, then slot, then catalog row.
+    """
+    if not dates or not time_slots:
+        return []
+
+    slot_columns = [SLOT_INDEX[slot] for slot in time_slots]
+    ids = _restaurant_index()["ids"]
+    matrices = []
+    for date_str in dates:
+        n_rows = _prepare_date(date_str)
+        matrices.append(_storage.matrix(date_str, n_rows)[ids][:, slot_columns])
+
+    stacked = np.stack(matrices)
+    date_idx, rows, slot_idx = np.nonzero(stacked >= tables_needed)
+
+    # nonzero() returns (date, row, slot) order; we want (date, slot, row)
+    order = np.lexsort((rows, slot_idx, date_idx))
+    tables = stacked[date_idx, rows, slot_idx]
+    return [
+        (int(ids[rows[k]]), dates[date_idx[k]], time_slots[slot_idx[k]], int(tables[k]))
+        for k in order
+    ]
+
 def get_bookings(date_str: str) -> pd.DataFrame:
+    """Loads the bookings for a given date."""
+    return pd.DataFrame(_storage.records(date_str), columns=BOOKING_HEADERS)
+
+def find_booking(booking_id: str):
     """
-    Loads the bookings for a given date.
-    Creates it if it doesn't exist.
+    Looks up a booking by ID on any date (an indexed lookup in either backend).
+    Returns the booking record with a `date` field added, or None.
     """
-    filepath = get_bookings_filepath(date_str)
-    if not filepath.exists():
-        create_new_bookings_file(date_str)
-        
-    try:
-        return pd.read_csv(filepath)
-    except FileNotFoundError: # In case creation failed
-        return pd.DataFrame()
+    hit = _storage.find(booking_id)
+    if hit is None:
+        return None
+    date_str, record = hit
+    record["date"] = date_str
+    return record
+
+def find_bookings_by_customer(name: str, email: str) -> list:
+    """
+    Returns every booking for a customer on any date, matched on
+    case- and whitespace-insensitive name and email.
+    Each record has a `date` field added.
+    """
+    records = []
+    for date_str, record in _storage.find_by_customer(name, email):
+        record["date"] = date_str
+        records.append(record)
+    return records
+
+# --- Locking ---
+
+def slot_lock(date_str: str, restaurant, time_slot: str):
+    """
+    Returns a context manager holding the lock for one (date, restaurant, slot).
+    `restaurant` is a restaurant_id or name.
+    Safe across threads and processes, and re-entrant for the holding thread.
+    Unknown restaurants or slots get a no-op context.
+    """
+    row, slot_idx = _locate(restaurant, time_slot)
+    if row is None or slot_idx is None:
+        return nullcontext()
+    return _storage.hold(date_str, row, slot_idx)
+
+def get_lock_stats() -> dict:
+    """Returns contention and wait-time counters for the backend's write locking."""
+    return _storage.lock_stats()
 
 # --- Data Writing Functions ---
 
@@ -115,21 +641,16 @@ def calculate_tables_needed(party_size: int) -> int:
     """Calculates tables needed based on party size."""
     return math.ceil(party_size / AVG_GUESTS_PER_TABLE)
 
-def add_booking(date_str: str, booking_details: dict) -> dict:
-    """
-    Adds a new booking to the bookings[date].csv file.
-    Returns the full booking record with booking_id.
-    """
-    filepath = get_bookings_filepath(date_str)
-    df = get_bookings(date_str) # Ensures file exists
-    
+def _new_booking_record(booking_details: dict) -> dict:
+    """Builds a confirmed booking record with a fresh booking_id."""
     now = datetime.now().isoformat()
     
-    new_booking = {
+    return {
         "booking_id": str(uuid.uuid4())[:8], # Short unique ID
         "customer_name": booking_details.get("customer_name"),
         "customer_email": booking_details.get("customer_email"),
         "customer_phone": booking_details.get("customer_phone"),
+        "restaurant_id": booking_details.get("restaurant_id"),
         "restaurant_name": booking_details.get("restaurant_name"),
         "restaurant_address": booking_details.get("restaurant_address", ""), # Get from details
         "party_size": booking_details.get("party_size"),
@@ -140,58 +661,103 @@ def add_booking(date_str: str, booking_details: dict) -> dict:
         "created_at": now,
         "updated_at": now
     }
-    
-    df = pd.concat([df, pd.DataFrame([new_booking])], ignore_index=True)
-    df.to_csv(filepath, index=False)
+
+def _booking_restaurant(booking: dict):
+    """
+    The restaurant a booking refers to: its restaurant_id, or its name for
+    bookings made before IDs were stored.
+    """
+    restaurant_id = booking.get("restaurant_id")
+    if restaurant_id is None or restaurant_id == "" or (isinstance(restaurant_id, float) and math.isnan(restaurant_id)):
+        return booking.get("restaurant_name")
+    return int(restaurant_id)
+
+def add_booking(date_str: str, booking_details: dict) -> dict:
+    """
+    Adds a new booking record for the date, without touching availability.
+    Returns the full booking record with booking_id.
+    """
+    row, slot_idx = _locate(_booking_restaurant(booking_details), booking_details.get("time_slot"))
+    new_booking = _new_booking_record({**booking_details, "restaurant_id": row})
+    _storage.insert_booking(date_str, new_booking, -1 if row is None else row, -1 if slot_idx is None else slot_idx)
     
     return new_booking
 
+def create_booking(date_str: str, booking_details: dict) -> tuple:
+    """
+    Takes the tables and records the booking as one atomic operation.
+    Returns (booking, tables_left). `booking` is None when there were not
+    enough tables; `tables_left` is None if the restaurant or slot is unknown.
+    """
+    row, slot_idx = _locate(_booking_restaurant(booking_details), booking_details.get("time_slot"))
+    if row is None or slot_idx is None:
+        return None, None
+
+    new_booking = _new_booking_record({**booking_details, "restaurant_id": row})
+    n_rows = _prepare_date(date_str)
+    created, tables_left = _storage.create_booking(date_str, n_rows, row, slot_idx, new_booking)
+    return (new_booking if created else None), tables_left
+
+def cancel_booking_record(date_str: str, booking_id: str) -> str:
+    """
+    Returns a booking's tables and marks it cancelled as one atomic operation.
+    Returns "cancelled", "already_cancelled" or "not_found".
+    """
+    booking = find_booking(booking_id)
+    if booking is None or booking["date"] != date_str:
+        return "not_found"
+
+    row, slot_idx = _locate(_booking_restaurant(booking), booking["time_slot"])
+    if row is None or slot_idx is None:
+        return "not_found"
+
+    n_rows = _prepare_date(date_str)
+    return _storage.cancel_booking(date_str, booking_id, n_rows, row, slot_idx, datetime.now().isoformat())
+
 def update_booking_status(date_str: str, booking_id: str, new_status: str) -> bool:
     """Updates the status of an existing booking."""
-    filepath = get_bookings_filepath(date_str)
-    df = get_bookings(date_str)
-    
-    if booking_id not in df['booking_id'].values:
-        return False # Booking not found
-        
-    booking_index = df[df['booking_id'] == booking_id].index
-    
-    df.loc[booking_index, 'status'] = new_status
-    df.loc[booking_index, 'updated_at'] = datetime.now().isoformat()
-    
-    df.to_csv(filepath, index=False)
-    return True
+    return _storage.set_status(date_str, booking_id, new_status, datetime.now().isoformat())
 
-def update_availability(date_str: str, restaurant_name: str, time_slot: str, tables_change: int) -> bool:
+def update_availability(date_str: str, restaurant, time_slot: str, tables_change: int) -> bool:
     """
     Updates the table availability in the tracker.
+    `restaurant` is a restaurant_id, or a name (its first branch).
     `tables_change` can be positive (adding tables back) or negative (booking).
     """
-    filepath = get_tracker_filepath(date_str)
-    df = get_availability(date_str) # Ensures file exists
+    row, slot_idx = _locate(restaurant, time_slot)
     
-    # Find the row for the restaurant
-    # Note: Assumes restaurant_name is a unique identifier. 
-    # A real-world app might use a unique restaurant_id.
-    row_index = df[df['Name'] == restaurant_name].index
-    
-    if row_index.empty:
-        print(f"ERROR: Restaurant '{restaurant_name}' not found in tracker.")
+    if row is None:
+        log.error("Restaurant '%s' not found in tracker.", restaurant)
         return False
         
-    if time_slot not in df.columns:
-        print(f"ERROR: Time slot '{time_slot}' not a valid column.")
+    if slot_idx is None:
+        log.error("Time slot '%s' not a valid column.", time_slot)
         return False
         
-    # Update the value
-    current_tables = df.loc[row_index, time_slot].iloc[0]
-    new_table_count = current_tables + tables_change
+    # Update the value in place, under the cell's lock
+    n_rows = _prepare_date(date_str) # Ensures the tracker exists
+    new_table_count = _storage.add_tables(date_str, n_rows, row, slot_idx, int(tables_change))
     
-    if new_table_count < 0:
-        print(f"ERROR: Cannot book. Not enough tables. Trying to set to {new_table_count}")
+    if new_table_count is None:
+        log.error("Cannot book. Not enough tables for '%s' at %s.", restaurant, time_slot)
         return False # Should be checked before calling, but as a safeguard
-        
-    df.loc[row_index, time_slot] = new_table_count
-    df.to_csv(filepath, index=False)
     
-    return True
\ No newline at end of file
+    return True
+
+def reserve_tables(date_str: str, restaurant, time_slot: str, tables_needed: int) -> tuple:
+    """
+    Atomically checks and takes `tables_needed` tables for one restaurant
+    (ID or name) and slot.
+    Returns (reserved, tables_left). `tables_left` is what remains after a
+    successful reservation, or what is available when there are too few.
+    It is None if the restaurant or slot is unknown.
+    """
+    row, slot_idx = _locate(restaurant, time_slot)
+    if row is None or slot_idx is None:
+        return False, None
+
+    n_rows = _prepare_date(date_str) # Ensures the tracker exists
+    tables_left = _storage.add_tables(date_str, n_rows, row, slot_idx, -int(tables_needed))
+    if tables_left is None:
+        return False, _storage.get_tables(date_str, n_rows, row, slot_idx)
+    return True, tables_left
@@ -0,0 +1,170 @@
+import json
+import os
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a characters/4 estimate
+    tiktoken = None
+
+# --- Configuration ---
+HISTORY_KEEP_TURNS = int(os.getenv("GOODFOODS_HISTORY_KEEP_TURNS", "4"))       # Recent turns sent verbatim
+HISTORY_TOKEN_BUDGET = int(os.getenv("GOODFOODS_HISTORY_TOKEN_BUDGET", "1500"))  # Older turns beyond this get summarized
+TOKENIZER_ENCODING = "o200k_base"
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators per message
+SNIPPET_CHARS = 120
+
+_encoding = None
+
+# --- Token Counting ---
+
+def _encoder():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+def count_text_tokens(text) -> int:
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(str(text)))
+    return (len(str(text)) + 3) // 4
+
+def count_tokens(messages: list) -> int:
+    """Approximate prompt tokens for a list of chat messages."""
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + count_text_tokens(message.get("content"))
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            total += count_text_tokens(function.get("name")) + count_text_tokens(function.get("arguments"))
+    return total
+
+# --- Summaries ---
+
+def _clip(text, limit: int = SNIPPET_CHARS) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _describe_booking(booking: dict) -> str:
+    details = ", ".join(
+        str(booking[field]) for field in ("restaurant_name", "date", "time_slot") if booking.get(field)
+    )
+    party = f", {booking['party_size']} guests" if booking.get("party_size") else ""
+    return f"booking {booking.get('booking_id')} {booking.get('status', '')} ({details}{party})".replace("  ", " ")
+
+def summarize_tool_result(tool_name: str, content) -> str:
+    """
+    Reduces a tool result to the facts later turns may need: booking IDs
+    and statuses, and which restaurants were offered.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return f"[{tool_name}] {_clip(content)}"
+    if not isinstance(data, dict):
+        return f"[{tool_name}] {_clip(content)}"
+
+    if data.get("booking_id"):
+        return f"[{tool_name}] {_describe_booking(data)}"
+    if isinstance(data.get("bookings"), list):
+        return f"[{tool_name}] " + "; ".join(_describe_booking(b) for b in data["bookings"])
+    if isinstance(data.get("restaurants"), list):
+        names = [r.get("name") for r in data["restaurants"] if isinstance(r, dict)]
+        when = " ".join(str(data[key]) for key in ("date", "used_time_slot") if data.get(key))
+        shown = ", ".join(names[:5]) + (f" and {len(names) - 5} more" if len(names) > 5 else "")
+        return f"[{tool_name}] {len(names)} restaurants {when}: {shown}".replace("  ", " ")
+    if isinstance(data.get("rows"), list):
+        names = list(dict.fromkeys(row[1] for row in data["rows"] if len(row) > 1))
+        return f"[{tool_name}] {data.get('total_matches', len(data['rows']))} open slots, e.g. {', '.join(names[:5])}"
+    return f"[{tool_name}] {_clip(content)}"
+
+def _summarize_dialogue(turns: list) -> str:
+    """One compact note standing in for several earlier turns."""
+    lines = []
+    for turn in turns:
+        tool_names = _tool_names(turn)
+        for message in turn:
+            role = message.get("role")
+            if role == "user":
+                lines.append(f"- User: {_clip(message.get('content'))}")
+            elif role == "tool":
+                name = tool_names.get(message.get("tool_call_id"), "tool")
+                lines.append(f"- {summarize_tool_result(name, message.get('content'))}")
+            elif role == "assistant" and message.get("content"):
+                lines.append(f"- Assistant: {_clip(message.get('content'))}")
+    return "Summary of the earlier conversation:\n" + "\n".join(lines)
+
+# --- Compaction ---
+
+def _tool_names(messages: list) -> dict:
+    """Maps tool_call_id -> function name from the assistant tool_calls messages."""
+    names = {}
+    for message in messages:
+        for tool_call in message.get("tool_calls") or []:
+            names[tool_call.get("id")] = tool_call.get("function", {}).get("name", "tool")
+    return names
+
+def _split_turns(messages: list) -> list:
+    """Groups messages into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def compact_history(messages: list, keep_turns: int = None, token_budget: int = None) -> tuple:
+    """
+    Returns (messages_for_the_model, report).
+
+    Leading system messages and the last `keep_turns` turns are kept
+    verbatim. In older turns, tool results are replaced by one-line
+    summaries (each still answers its tool_call_id, so tool calls stay
+    paired). If those older turns still exceed `token_budget` tokens, they
+    are replaced altogether by a single summary message.
+    The report gives tokens before/after/saved and turn counts.
+    """
+    keep_turns = HISTORY_KEEP_TURNS if keep_turns is None else keep_turns
+    token_budget = HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+
+    n_system = 0
+    while n_system < len(messages) and messages[n_system].get("role") == "system":
+        n_system += 1
+    system, rest = list(messages[:n_system]), messages[n_system:]
+
+    turns = _split_turns(rest)
+    split = max(0, len(turns) - keep_turns)
+    older, recent = turns[:split], turns[split:]
+
+    compacted_older = []
+    for turn in older:
+        tool_names = _tool_names(turn)
+        for message in turn:
+            if message.get("role") == "tool":
+                name = tool_names.get(message.get("tool_call_id"), "tool")
+                message = dict(message, content=summarize_tool_result(name, message.get("content")))
+            compacted_older.append(message)
+
+    summarized = False
+    if count_tokens(compacted_older) > token_budget:
+        compacted_older = [{"role": "system", "content": _summarize_dialogue(older)}]
+        summarized = True
+
+    result = system + compacted_older + [message for turn in recent for message in turn]
+    tokens_before = count_tokens(messages)
+    tokens_after = count_tokens(result)
+    report = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "turns_verbatim": len(recent),
+        "turns_compacted": len(older),
+        "dialogue_summarized": summarized,
+        "tokenizer": "tiktoken" if _encoder() is not None else "chars/4",
+    }
+    return result, report
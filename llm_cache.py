@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from openai.types.chat import ChatCompletionMessage
+from system_prompt import DYNAMIC_CONTEXT_HEADER
+
+# --- Configuration ---
+# GOODFOODS_LLM_CACHE selects the mode:
+#   off     no caching (default)
+#   cache   serve repeated requests from disk, within LLM_CACHE_TTL
+#   record  call the model for every request and keep every response
+#   replay  answer only from recorded responses, never calling the model
+LLM_CACHE_MODE = os.getenv("GOODFOODS_LLM_CACHE", "off").lower()
+LLM_CACHE_DB = os.getenv("GOODFOODS_LLM_CACHE_DB", "llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("GOODFOODS_LLM_CACHE_TTL", "3600"))              # Seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("GOODFOODS_LLM_CACHE_MAX_ENTRIES", "1000"))  # Unpinned entries kept
+
+# Tools whose results change bookings; in "cache" mode a request carrying
+# one of their results always goes to the model.
+DEFAULT_MUTATING_TOOLS = "book_table,cancel_booking"
+MUTATING_TOOLS = {
+    name.strip()
+    for name in os.getenv("GOODFOODS_LLM_CACHE_MUTATING_TOOLS", DEFAULT_MUTATING_TOOLS).split(",")
+    if name.strip()
+}
+
+MODES = ("off", "cache", "record", "replay")
+REPLAY_MISS_MESSAGE = "Sorry, there is no recorded response for this conversation."
+
+# The time of day in the system prompt's dynamic suffix. "cache" keys round
+# it down to CACHE_TIME_BUCKET_MINUTES, so a repeated question hits within
+# the bucket instead of only within the same minute. Slots are on the hour,
+# so the 30-minute advance-booking rule gives the same answer for every
+# minute of a bucket aligned to :00 and :30.
+TIME_OF_DAY_PATTERN = re.compile(r"\bthe time is (\d{1,2}):(\d{2})")
+CACHE_TIME_BUCKET_MINUTES = 30
+
+# --- Schema ---
+# Recorded entries are pinned: TTL expiry and LRU eviction skip them.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT    PRIMARY KEY,
+    message    TEXT    NOT NULL,
+    created_at REAL    NOT NULL,
+    last_used  REAL    NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0,
+    pinned     INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses (pinned, last_used);
+"""
+
+SQL_GET = "SELECT message, created_at, pinned FROM responses WHERE key = ?"
+SQL_TOUCH = "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?"
+SQL_DELETE = "DELETE FROM responses WHERE key = ?"
+SQL_PUT = (
+    "INSERT INTO responses (key, message, created_at, last_used, pinned) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET message = excluded.message, created_at = excluded.created_at, "
+    "last_used = excluded.last_used, pinned = MAX(pinned, excluded.pinned)"
+)
+SQL_COUNT_UNPINNED = "SELECT COUNT(*) FROM responses WHERE pinned = 0"
+SQL_EVICT = (
+    "DELETE FROM responses WHERE key IN "
+    "(SELECT key FROM responses WHERE pinned = 0 ORDER BY last_used LIMIT ?)"
+)
+
+# --- Key Normalization ---
+
+def _as_dict(message) -> dict:
+    return message if isinstance(message, dict) else message.to_dict()
+
+def _normalize_arguments(arguments):
+    try:
+        return json.loads(arguments)
+    except (TypeError, ValueError):
+        return arguments
+
+def _time_bucket(match) -> str:
+    minutes = int(match.group(2)) // CACHE_TIME_BUCKET_MINUTES * CACHE_TIME_BUCKET_MINUTES
+    return f"the time is {int(match.group(1)):02d}:{minutes:02d}"
+
+def _normalize(messages: list, tools: list, model: str, portable: bool) -> list:
+    """
+    Reduces a request to what decides the answer. Whitespace is collapsed,
+    tool-call arguments are parsed (so key order doesn't matter) and the
+    random tool_call IDs are renumbered in order of appearance. The time
+    of day in the system prompt is rounded down to CACHE_TIME_BUCKET_MINUTES.
+    With `portable`, the date, time and deployment name are dropped, so
+    recordings replay at any time and without Azure settings.
+    """
+    call_ids = {}
+
+    def call_id(value):
+        return call_ids.setdefault(value, f"call_{len(call_ids)}")
+
+    normalized = []
+    for message in messages:
+        message = _as_dict(message)
+        content = message.get("content")
+        if isinstance(content, str):
+            if message.get("role") == "system":
+                if portable:
+                    content = content.split(DYNAMIC_CONTEXT_HEADER)[0]
+                else:
+                    content = TIME_OF_DAY_PATTERN.sub(_time_bucket, content)
+            content = " ".join(content.split())
+        entry = {"role": message.get("role"), "content": content}
+        if message.get("tool_calls"):
+            entry["tool_calls"] = [
+                [call_id(tool_call.get("id")), tool_call["function"]["name"],
+                 _normalize_arguments(tool_call["function"].get("arguments"))]
+                for tool_call in message["tool_calls"]
+            ]
+        if message.get("tool_call_id"):
+            entry["tool_call_id"] = call_id(message["tool_call_id"])
+        normalized.append(entry)
+    return [None if portable else model, normalized, tools or []]
+
+def _has_mutating_result(messages: list) -> bool:
+    """True if any tool result in `messages` answers a call to a MUTATING_TOOLS tool."""
+    names = {}
+    for message in messages:
+        message = _as_dict(message)
+        for tool_call in message.get("tool_calls") or []:
+            names[tool_call.get("id")] = tool_call["function"]["name"]
+        if message.get("role") == "tool" and names.get(message.get("tool_call_id")) in MUTATING_TOOLS:
+            return True
+    return False
+
+# --- Store ---
+
+class ResponseCache:
+    """
+    LLM responses on disk, in a small SQLite database keyed by a hash of
+    the normalized request. Entries expire after `ttl` seconds and the
+    least recently used are evicted past `max_entries`; pinned (recorded)
+    entries are kept until overwritten. Each thread keeps its own connection.
+    """
+
+    def __init__(self, db_path, ttl: float, max_entries: int):
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[stat] += n
+
+    def get(self, key: str, honor_ttl: bool = True):
+        """Returns the cached ChatCompletionMessage for `key`, or None."""
+        conn = self._conn()
+        row = conn.execute(SQL_GET, (key,)).fetchone()
+        now = time.time()
+        if row is not None and honor_ttl and not row[2] and now - row[1] > self.ttl:
+            conn.execute(SQL_DELETE, (key,))
+            self._count("expired")
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        conn.execute(SQL_TOUCH, (now, key))
+        self._count("hits")
+        return ChatCompletionMessage.model_validate(json.loads(row[0]))
+
+    def put(self, key: str, message, pinned: bool = False):
+        """Stores a response, then evicts the least recently used unpinned entries past max_entries."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(SQL_PUT, (key, json.dumps(_as_dict(message)), now, now, int(pinned)))
+        self._count("stores")
+        excess = conn.execute(SQL_COUNT_UNPINNED).fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._count("evictions", conn.execute(SQL_EVICT, (excess,)).rowcount)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+# --- Public API ---
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _get_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(LLM_CACHE_DB, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES)
+        return _cache
+
+def set_mode(mode: str):
+    """Switches the cache mode at runtime (e.g. for a benchmark run)."""
+    global LLM_CACHE_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown LLM cache mode '{mode}'. Use one of: {', '.join(MODES)}.")
+    LLM_CACHE_MODE = mode
+
+def replaying() -> bool:
+    return LLM_CACHE_MODE == "replay"
+
+def request_key(messages: list, tools: list, model: str):
+    """
+    Returns the cache key for a request, or None when the cache is off or
+    (in "cache" mode) the request carries the result of a mutating tool.
+    """
+    if LLM_CACHE_MODE not in MODES:
+        raise ValueError(f"Unknown GOODFOODS_LLM_CACHE '{LLM_CACHE_MODE}'. Use one of: {', '.join(MODES)}.")
+    if LLM_CACHE_MODE == "off":
+        return None
+    if LLM_CACHE_MODE == "cache" and _has_mutating_result(messages):
+        _get_cache()._count("bypassed")
+        return None
+    portable = LLM_CACHE_MODE in ("record", "replay")
+    payload = json.dumps(_normalize(messages, tools, model, portable), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def lookup(key: str):
+    """Returns the stored response for a key, or None. Always None in "record" mode."""
+    if key is None or LLM_CACHE_MODE == "record":
+        return None
+    return _get_cache().get(key, honor_ttl=LLM_CACHE_MODE == "cache")
+
+def store(key: str, message):
+    """Keeps a model response (not error dicts). Recorded responses are pinned."""
+    if key is None or not isinstance(message, ChatCompletionMessage):
+        return
+    _get_cache().put(key, message, pinned=LLM_CACHE_MODE == "record")
+
+def get_llm_cache_stats() -> dict:
+    """Returns the mode and hit/miss/bypass/eviction counters of the response cache."""
+    stats = _get_cache().stats() if LLM_CACHE_MODE != "off" else {}
+    return dict(stats, mode=LLM_CACHE_MODE)
@@ -1,14 +1,50 @@
 # In llm_client.py
 
+import asyncio
+import email.utils
+import logging
 import os
-from openai import AzureOpenAI
+import random
+import threading
+import time
+from contextlib import contextmanager
+import openai
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from openai.types.chat import ChatCompletionMessage
 from dotenv import load_dotenv
+import llm_cache
+import telemetry
+from history import count_tokens, count_text_tokens
 
 load_dotenv()
 
-def get_llm_client():
-    """Initializes and returns the AzureOpenAI client."""
-    
+log = logging.getLogger(__name__)
+
+# --- Configuration ---
+LLM_TIMEOUT = float(os.getenv("GOODFOODS_LLM_TIMEOUT", "60"))            # Seconds per request
+LLM_CONNECT_TIMEOUT = 10.0
+LLM_MAX_CONNECTIONS = 20         # Connection pool size per client
+LLM_MAX_KEEPALIVE = 10           # Idle connections kept open for reuse
+LLM_KEEPALIVE_EXPIRY = 60.0      # Seconds an idle connection stays open
+LLM_MAX_IN_FLIGHT = int(os.getenv("GOODFOODS_LLM_MAX_IN_FLIGHT", "8"))  # Concurrent requests per process
+LLM_QUEUE_TIMEOUT = 30.0         # Longest a request waits for an in-flight slot
+LLM_MAX_ATTEMPTS = 4             # First try plus retries on 429/5xx/connection errors
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 20.0
+
+RETRYABLE_STATUS = {408, 409, 429}  # Plus every 5xx
+
+BUSY_MESSAGE = "Sorry, I'm handling a lot of requests right now. Please try again in a moment."
+
+# --- Client Registry ---
+# Clients are built once and reused, so their HTTP connection pools (and
+# TLS sessions) survive across calls. The SDK's own retries are disabled;
+# retries happen here, with backoff, inside the in-flight limit.
+
+_registry_lock = threading.Lock()
+_clients = {}
+
+def _settings() -> tuple:
     endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
     api_key = os.getenv("AZURE_OPENAI_KEY")
     deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
@@ -16,32 +52,402 @@ def get_llm_client():
 
     if not all([endpoint, api_key, deployment, api_version]):
         raise ValueError("Please set AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_KEY, AZURE_OPENAI_DEPLOYMENT_NAME, and AZURE_OPENAI_API_VERSION in your .env file.")
+    return endpoint, api_key, api_version
+
+def _pool_options() -> dict:
+    import httpx  # Installed with openai
+    return {
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    }
+
+def get_llm_client():
+    """Returns the process-wide AzureOpenAI client, creating it on first use."""
+    endpoint, api_key, api_version = _settings()
+    key = ("sync", endpoint, api_key, api_version)
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = AzureOpenAI(
+                azure_endpoint=endpoint,
+                api_key=api_key,
+                api_version=api_version,
+                http_client=openai.DefaultHttpxClient(**_pool_options()),
+                max_retries=0  # Retried by _create, which honors retry-after
+            )
+            _clients[key] = client
+        return client
+
+def get_async_llm_client():
+    """
+    Returns the AsyncAzureOpenAI client for the running event loop,
+    creating it on first use (async connection pools are tied to one loop).
+    """
+    endpoint, api_key, api_version = _settings()
+    key = ("async", endpoint, api_key, api_version, id(asyncio.get_running_loop()))
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = AsyncAzureOpenAI(
+                azure_endpoint=endpoint,
+                api_key=api_key,
+                api_version=api_version,
+                http_client=openai.DefaultAsyncHttpxClient(**_pool_options()),
+                max_retries=0
+            )
+            _clients[key] = client
+        return client
+
+# --- Admission Control ---
+# At most LLM_MAX_IN_FLIGHT requests run at once per process (sync and
+# async combined). Extra requests wait their turn, up to LLM_QUEUE_TIMEOUT.
+
+class _Admission:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._stats = {
+            "in_flight": 0,
+            "queued": 0,
+            "max_queued": 0,
+            "admitted": 0,
+            "rejected": 0,
+            "queue_wait_seconds_total": 0.0,
+            "retries": 0,
+        }
+
+    def try_acquire(self) -> bool:
+        """Takes a slot only if one is free right now."""
+        with self._cond:
+            if self._stats["in_flight"] >= self.limit:
+                return False
+            self._stats["in_flight"] += 1
+            self._stats["admitted"] += 1
+            return True
+
+    def acquire(self, timeout: float) -> bool:
+        start = time.perf_counter()
+        with self._cond:
+            if self._stats["in_flight"] >= self.limit:
+                self._stats["queued"] += 1
+                self._stats["max_queued"] = max(self._stats["max_queued"], self._stats["queued"])
+                admitted = self._cond.wait_for(lambda: self._stats["in_flight"] < self.limit, timeout)
+                self._stats["queued"] -= 1
+                if not admitted:
+                    self._stats["rejected"] += 1
+                    return False
+            self._stats["in_flight"] += 1
+            self._stats["admitted"] += 1
+            self._stats["queue_wait_seconds_total"] += time.perf_counter() - start
+            return True
+
+    def release(self):
+        with self._cond:
+            self._stats["in_flight"] -= 1
+            self._cond.notify()
+
+    def count_retry(self):
+        with self._cond:
+            self._stats["retries"] += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._stats, limit=self.limit)
+
+_admission = _Admission(LLM_MAX_IN_FLIGHT)
+
+class LLMBusyError(Exception):
+    """Raised when no in-flight slot frees up within LLM_QUEUE_TIMEOUT."""
+
+@contextmanager
+def _in_flight_slot():
+    if not _admission.acquire(LLM_QUEUE_TIMEOUT):
+        raise LLMBusyError(BUSY_MESSAGE)
+    try:
+        yield
+    finally:
+        _admission.release()
+
+def get_llm_stats() -> dict:
+    """Returns in-flight, queue and retry counters for LLM requests."""
+    return _admission.stats()
+
+# --- Retries ---
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+def _retry_after(error: Exception):
+    """Seconds the server asked us to wait (retry-after-ms / retry-after), or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value)  # HTTP-date form
+            return retry_at.timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Server-requested delay if given, else full-jitter exponential backoff."""
+    requested = _retry_after(error)
+    if requested is not None and requested >= 0:
+        return min(requested, LLM_BACKOFF_MAX)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+def _record_retry(retries: int, error: Exception):
+    telemetry.count("llm_retries", error=error.__class__.__name__)
+    call = telemetry.current_span()
+    if call is not None:
+        call.set("retries", retries)
 
-    return AzureOpenAI(
-        azure_endpoint=endpoint,
-        api_key=api_key,
-        api_version=api_version,
-        # --- UPDATED SECTION ---
-        timeout=60.0,      # Set a 30-second timeout (default is often 10s)
-        max_retries=1      # Allow one retry on transient errors like timeouts
-        # --- END OF UPDATE ---
-    )
-
-def chat_completion(messages: list[dict], tools: list[dict] = None) -> dict:
-    # ... (This function remains unchanged)
-    client = get_llm_client()
+def _create(client, **kwargs):
+    """
+    Calls chat.completions.create, retrying 429/5xx/connection errors.
+    The caller holds an in-flight slot for the whole exchange, so backing
+    off also keeps this process from adding load while the service recovers.
+    """
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(e):
+                raise
+            delay = _retry_delay(attempt, e)
+            log.warning("LLM request failed (%s); retrying in %.2fs", e.__class__.__name__, delay)
+            _admission.count_retry()
+            _record_retry(attempt + 1, e)
+            time.sleep(delay)
+
+async def _acreate(client, **kwargs):
+    """Async version of _create."""
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(e):
+                raise
+            delay = _retry_delay(attempt, e)
+            log.warning("LLM request failed (%s); retrying in %.2fs", e.__class__.__name__, delay)
+            _admission.count_retry()
+            _record_retry(attempt + 1, e)
+            await asyncio.sleep(delay)
+
+# --- Completions ---
+# Every call runs in an "llm.call" span with the token counts, whether it
+# was served from the cache, and the number of retries.
+
+def _record_tokens(call, prompt_tokens: int, completion_tokens: int, estimated: bool = False):
+    telemetry.count("llm_tokens", prompt_tokens, kind="prompt")
+    telemetry.count("llm_tokens", completion_tokens, kind="completion")
+    call.set("prompt_tokens", prompt_tokens)
+    call.set("completion_tokens", completion_tokens)
+    if estimated:
+        call.set("tokens_estimated", True)
+
+def _record_usage(call, response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        _record_tokens(call, usage.prompt_tokens, usage.completion_tokens)
+
+def _record_result(call, result):
+    """Marks the span failed when the call returned an error dict."""
+    if isinstance(result, dict):
+        call.fail(result.get("content"))
+
+def _cached_response(cache_key):
+    """
+    The stored response for a request (see llm_cache), or None to call the
+    model. In replay mode a miss returns an error dict instead of calling out.
+    """
+    if cache_key is None:
+        return None
+    cached = llm_cache.lookup(cache_key)
+    if cached is None and llm_cache.replaying():
+        return {"role": "assistant", "content": llm_cache.REPLAY_MISS_MESSAGE}
+    return cached
+
+def chat_completion(messages: list[dict], tools: list[dict] = None, stream: bool = False) -> dict:
+    """
+    Calls the model and returns its message, or an assistant error dict.
+    With stream=True, returns a generator instead (see _stream_completion).
+    """
     deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-    
+    cache_key = llm_cache.request_key(messages, tools, deployment)
+
+    if stream:
+        return _stream_completion(messages, tools, cache_key)
+
+    with telemetry.span("llm.call", mode="sync") as call:
+        result = _complete(messages, tools, deployment, cache_key, call)
+        _record_result(call, result)
+    return result
+
+def _complete(messages: list[dict], tools: list[dict], deployment: str, cache_key, call):
+    cached = _cached_response(cache_key)
+    call.set("cached", cached is not None)
+    if cached is not None:
+        return cached
+
     try:
-        response = client.chat.completions.create(
-            model=deployment,
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"
-        )
-        return response.choices[0].message
-    
+        client = get_llm_client()
+        with _in_flight_slot():
+            response = _create(
+                client,
+                model=deployment,
+                messages=messages,
+                tools=tools,
+                tool_choice="auto"
+            )
+        _record_usage(call, response)
+        message = response.choices[0].message
+        llm_cache.store(cache_key, message)
+        return message
+
+    except LLMBusyError:
+        return {"role": "assistant", "content": BUSY_MESSAGE}
     except Exception as e:
-        print(f"Error calling Azure OpenAI: {e}")
+        log.exception("Error calling Azure OpenAI")
         # This error message will now be handled gracefully by agent.py
         return {"role": "assistant", "content": f"Sorry, I encountered an error with the AI model: {e}"}
+
+async def achat_completion(messages: list[dict], tools: list[dict] = None) -> dict:
+    """Async version of chat_completion, sharing the same in-flight limit and cache."""
+    deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+    cache_key = llm_cache.request_key(messages, tools, deployment)
+    with telemetry.span("llm.call", mode="async") as call:
+        result = await _acomplete(messages, tools, deployment, cache_key, call)
+        _record_result(call, result)
+    return result
+
+async def _acomplete(messages: list[dict], tools: list[dict], deployment: str, cache_key, call):
+    cached = _cached_response(cache_key)
+    call.set("cached", cached is not None)
+    if cached is not None:
+        return cached
+
+    try:
+        client = get_async_llm_client()
+        if not _admission.try_acquire() and not await asyncio.to_thread(_admission.acquire, LLM_QUEUE_TIMEOUT):
+            return {"role": "assistant", "content": BUSY_MESSAGE}
+        try:
+            response = await _acreate(
+                client,
+                model=deployment,
+                messages=messages,
+                tools=tools,
+                tool_choice="auto"
+            )
+        finally:
+            _admission.release()
+        _record_usage(call, response)
+        message = response.choices[0].message
+        llm_cache.store(cache_key, message)
+        return message
+
+    except Exception as e:
+        log.exception("Error calling Azure OpenAI")
+        return {"role": "assistant", "content": f"Sorry, I encountered an error with the AI model: {e}"}
+
+def _stream_completion(messages: list[dict], tools: list[dict] = None, cache_key: str = None):
+    """
+    Streams a completion. Yields the text deltas (str) as they arrive, and
+    finally the whole message: a ChatCompletionMessage with the content and
+    any tool calls (their arguments reassembled from the streamed fragments),
+    or an assistant error dict, like chat_completion returns.
+    The in-flight slot is held until the stream is fully read.
+    A cached response is yielded as one delta.
+    """
+    with telemetry.span("llm.call", mode="stream") as call:
+        final = None
+        for event in _stream_events(messages, tools, cache_key, call):
+            if not isinstance(event, str):
+                final = event
+            yield event
+        _record_result(call, final)
+
+def _stream_events(messages: list[dict], tools: list[dict], cache_key, call):
+    cached = _cached_response(cache_key)
+    call.set("cached", cached is not None)
+    if cached is not None:
+        content = cached.get("content") if isinstance(cached, dict) else cached.content
+        if content:
+            yield content
+        yield cached
+        return
+
+    deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+    content = []
+    tool_calls = {}  # index -> {"id", "type", "function": {"name", "arguments"}}
+    first_token = None
+
+    try:
+        client = get_llm_client()
+        with _in_flight_slot():
+            response = _create(
+                client,
+                model=deployment,
+                messages=messages,
+                tools=tools,
+                tool_choice="auto",
+                stream=True
+            )
+            for chunk in response:
+                if not chunk.choices:
+                    continue  # e.g. Azure's content-filter preamble
+                delta = chunk.choices[0].delta
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    call.set("first_token_ms", round((first_token - call.start) * 1000, 3))
+                if delta.content:
+                    content.append(delta.content)
+                    yield delta.content
+                for tool_delta in delta.tool_calls or []:
+                    entry = tool_calls.setdefault(tool_delta.index, {
+                        "id": None, "type": "function", "function": {"name": "", "arguments": ""}
+                    })
+                    if tool_delta.id:
+                        entry["id"] = tool_delta.id
+                    if tool_delta.function and tool_delta.function.name:
+                        entry["function"]["name"] += tool_delta.function.name
+                    if tool_delta.function and tool_delta.function.arguments:
+                        entry["function"]["arguments"] += tool_delta.function.arguments
+
+    except LLMBusyError:
+        yield BUSY_MESSAGE
+        yield {"role": "assistant", "content": BUSY_MESSAGE}
+        return
+    except Exception as e:
+        log.exception("Error calling Azure OpenAI")
+        error = f"Sorry, I encountered an error with the AI model: {e}"
+        yield error
+        yield {"role": "assistant", "content": error}
+        return
+
+    message = ChatCompletionMessage.model_validate({
+        "role": "assistant",
+        "content": "".join(content) or None,
+        "tool_calls": [tool_calls[i] for i in sorted(tool_calls)] or None
+    })
+    # Streamed responses carry no usage, so the counts are estimated locally
+    _record_tokens(call, count_tokens(messages), count_text_tokens(message.content or "")
+                   + sum(count_text_tokens(c["function"]["arguments"]) for c in tool_calls.values()), estimated=True)
+    llm_cache.store(cache_key, message)
+    yield message
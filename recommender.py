@@ -0,0 +1,107 @@
+import heapq
+import numpy as np
+import pandas as pd
+from catalog import PRICE_COLUMN, RATING_COLUMN, VOTES_COLUMN
+
+# --- Configuration ---
+RATING_PRIOR_VOTES = 50  # Votes needed before a restaurant's own rating outweighs the average
+
+# Catalog columns that get an inverted index, and how their values are split
+INDEXED_FIELDS = {
+    "cuisine": ("cuisines", ","),
+    "location": ("location", None),
+    "rest_type": ("rest_type", ","),
+}
+
+# --- Helpers ---
+
+def _normalize(term) -> str:
+    return " ".join(str(term).lower().split())
+
+class UnknownTermError(Exception):
+    """Raised when a filter value matches no term of an indexed field."""
+
+    def __init__(self, field: str, value: str):
+        super().__init__(f"No {field} matches '{value}'")
+        self.field = field
+        self.value = value
+
+class RecommendationIndex:
+    """
+    Prebuilt lookup structures for recommending restaurants.
+
+    Each indexed field maps a normalized term (e.g. "north indian") to a
+    sorted array of catalog rows, so filters are set intersections rather
+    than string scans. Price, rating and votes (numeric in the catalog) are kept as arrays.
+    Ranking uses a vote-weighted rating (so a 4.9 from 3 votes doesn't beat
+    a 4.5 from 2,000) and keeps the best `k` with a heap.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self.postings = {}
+        for field, (column, separator) in INDEXED_FIELDS.items():
+            terms = {}
+            for row, value in enumerate(df[column].fillna("")):
+                parts = str(value).split(separator) if separator else [value]
+                for part in parts:
+                    term = _normalize(part)
+                    if term:
+                        terms.setdefault(term, []).append(row)
+            self.postings[field] = {term: np.array(rows, dtype=np.int64) for term, rows in terms.items()}
+
+        self.price = df[PRICE_COLUMN].to_numpy(dtype=float)
+        self.rating = df[RATING_COLUMN].to_numpy(dtype=float)
+        self.votes = df[VOTES_COLUMN].to_numpy(dtype=float)
+
+        # Vote-weighted rating: pulls ratings with few votes toward the mean
+        mean_rating = np.nanmean(self.rating) if np.isfinite(self.rating).any() else 0.0
+        rating = np.nan_to_num(self.rating, nan=mean_rating)
+        self.score = (self.votes * rating + RATING_PRIOR_VOTES * mean_rating) / (self.votes + RATING_PRIOR_VOTES)
+
+    def terms(self, field: str) -> list:
+        """Returns every known term for a field, sorted."""
+        return sorted(self.postings[field])
+
+    def lookup(self, field: str, query: str):
+        """
+        Returns the sorted rows matching `query` for a field, or None if no
+        term matches. An exact term wins; otherwise every term containing
+        the query is used (so "koramangala" matches "koramangala 5th block").
+        """
+        postings = self.postings[field]
+        query = _normalize(query)
+        if query in postings:
+            return postings[query]
+        matches = [rows for term, rows in postings.items() if query in term]
+        if not matches:
+            return None
+        return np.unique(np.concatenate(matches))
+
+    def candidates(self, cuisine: str = None, location: str = None, rest_type: str = None,
+                   max_price: float = None, min_rating: float = None) -> np.ndarray:
+        """
+        Returns the rows matching every given filter, in ascending order.
+        Raises UnknownTermError for a term that matches nothing.
+        """
+        rows = None
+        for field, query in (("cuisine", cuisine), ("location", location), ("rest_type", rest_type)):
+            if not query:
+                continue
+            matched = self.lookup(field, query)
+            if matched is None:
+                raise UnknownTermError(field, query)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+
+        if rows is None:
+            rows = np.arange(self.n_rows)
+        if max_price is not None:
+            rows = rows[self.price[rows] <= max_price]  # NaN prices never pass
+        if min_rating is not None:
+            rows = rows[self.rating[rows] >= min_rating]
+        return rows
+
+    def top_k(self, rows: np.ndarray, k: int) -> list:
+        """Returns the `k` best rows by score, best first (ties go to the earlier row)."""
+        ranked = zip(self.score[rows].tolist(), (-row for row in rows.tolist()))
+        return [-neg_row for _, neg_row in heapq.nlargest(k, ranked)]
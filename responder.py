@@ -0,0 +1,166 @@
+import json
+import os
+from datetime import datetime
+
+# --- Configuration ---
+# Tools whose results may be answered from a template instead of a second
+# LLM call. Override with a comma-separated list (empty turns it off).
+DEFAULT_FAST_PATH_TOOLS = "book_table,cancel_booking,get_available_restaurants,search_availability,recommend_restaurants"
+CLOSING = "Is there anything else I can help with?"
+FAST_PATH_TOOLS = {
+    name.strip()
+    for name in os.getenv("GOODFOODS_FAST_PATH_TOOLS", DEFAULT_FAST_PATH_TOOLS).split(",")
+    if name.strip()
+}
+
+# --- Helpers ---
+
+def _friendly_date(date_str: str) -> str:
+    """"30.10.2025" -> "Thursday, 30 October 2025" (unchanged if it isn't DD.MM.YYYY)."""
+    try:
+        date = datetime.strptime(date_str, "%d.%m.%Y")
+    except (TypeError, ValueError):
+        return str(date_str)
+    return f"{date.strftime('%A')}, {date.day} {date.strftime('%B %Y')}"
+
+def _as_json(result: str):
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+def _customer(record: dict):
+    """Normalized (name, email) of a booking or book_table arguments, or None if either is missing."""
+    name, email = record.get("customer_name"), record.get("customer_email")
+    if not name or not email:
+        return None
+    return (str(name).strip().lower(), str(email).strip().lower())
+
+def _active_bookings(history: list) -> dict:
+    """
+    Returns {booking_id: customer or None} for the bookings that earlier
+    tool results in `history` show as confirmed and not since cancelled.
+    """
+    calls = {}  # tool_call_id -> (tool name, arguments)
+    active = {}
+    for message in history:
+        message = message if isinstance(message, dict) else message.to_dict()
+        for tool_call in message.get("tool_calls") or []:
+            calls[tool_call.get("id")] = (tool_call["function"]["name"], _as_json(tool_call["function"].get("arguments")) or {})
+        if message.get("role") != "tool":
+            continue
+        name, args = calls.get(message.get("tool_call_id"), (None, {}))
+        result = _as_json(message.get("content"))
+        if not result:
+            continue
+        if name == "book_table" and result.get("status") == "confirmed":
+            active[result["booking_id"]] = _customer(args)
+        elif name == "get_booking_details":
+            for record in result.get("bookings", [result]):
+                if record.get("booking_id") and record.get("status") == "confirmed":
+                    active[record["booking_id"]] = _customer(record)
+        elif name == "cancel_booking" and result.get("status") == "cancelled":
+            active.pop(result.get("booking_id"), None)
+    return active
+
+def _is_modification(tool_calls, tool_results: list, history: list) -> bool:
+    """
+    True when the batch books a table for a customer who already has an
+    active booking in the conversation and doesn't cancel anything: the
+    first half of a modification, whose cancellation the LLM still has to make.
+    """
+    names = [tool_call.function.name for tool_call in tool_calls]
+    if "book_table" not in names or "cancel_booking" in names:
+        return False
+    active = _active_bookings(history)
+    for tool_call, tool_result in zip(tool_calls, tool_results):
+        booking = _as_json(tool_result["content"]) if tool_call.function.name == "book_table" else None
+        if not booking or booking.get("status") != "confirmed":
+            continue
+        customer = _customer(_as_json(tool_call.function.arguments) or {})
+        if any(booking_id != booking["booking_id"] and (owner is None or customer is None or owner == customer)
+               for booking_id, owner in active.items()):
+            return True
+    return False
+
+# --- Templates ---
+# Each takes the tool's arguments and result string and returns the reply,
+# or None when the result isn't one of the shapes it knows.
+
+def _book_table(args: dict, result: str):
+    booking = _as_json(result)
+    if not booking or booking.get("status") != "confirmed":
+        return None  # Failures need the LLM to suggest alternatives
+
+    lines = [
+        "Your table is booked! ✅",
+        "",
+        f"- **Booking ID:** {booking['booking_id']}",
+        f"- **Restaurant:** {booking['restaurant_name']}",
+        f"- **Date:** {_friendly_date(booking['date'])}",
+        f"- **Time:** {booking['time_slot']}",
+        f"- **Guests:** {booking['party_size']}",
+    ]
+    if booking.get("requested_time_slot"):
+        lines.append("")
+        lines.append(f"{booking['time_slot']} is the closest available slot to the {booking['requested_time_slot']} you asked for.")
+    lines.append("")
+    lines.append(f"Please keep your booking ID handy in case you need to change or cancel it. {CLOSING}")
+    return "\n".join(lines)
+
+def _cancel_booking(args: dict, result: str):
+    cancellation = _as_json(result)
+    if cancellation and cancellation.get("status") == "cancelled":
+        return (f"Your booking **{cancellation['booking_id']}** at {cancellation['restaurant_name']} "
+                f"on {_friendly_date(cancellation['date'])} has been cancelled. {CLOSING}")
+    if isinstance(result, str) and result.startswith("Booking ") and result.endswith(" is already cancelled."):
+        return f"{result} {CLOSING}"
+    return None
+
+def _no_availability(args: dict, result: str):
+    """Handles the "No restaurants have N table(s) available ..." results."""
+    if not isinstance(result, str) or not result.startswith("No restaurants ") or " table(s) available " not in result:
+        return None
+    return f"Sorry, {result[0].lower()}{result[1:]} Would you like me to check a different time or date?"
+
+TEMPLATES = {
+    "book_table": _book_table,
+    "cancel_booking": _cancel_booking,
+    "get_available_restaurants": _no_availability,
+    "search_availability": _no_availability,
+    "recommend_restaurants": _no_availability,
+}
+
+# --- Public API ---
+
+def respond(tool_calls, tool_results: list, history: list = ()):
+    """
+    Returns a ready-made reply for a batch of tool results, or None if the
+    LLM should write it. A reply is only produced when every call in the
+    batch is enabled in FAST_PATH_TOOLS and its template recognizes the result.
+    A new booking while `history` (the conversation before the batch) holds
+    another active one for the customer is left to the LLM, which still
+    has to cancel the old booking.
+    """
+    if _is_modification(tool_calls, tool_results, history):
+        return None
+    replies = []
+    for tool_call, tool_result in zip(tool_calls, tool_results):
+        name = tool_call.function.name
+        template = TEMPLATES.get(name)
+        if template is None or name not in FAST_PATH_TOOLS:
+            return None
+        try:
+            args = json.loads(tool_call.function.arguments)
+        except (TypeError, ValueError):
+            return None
+        reply = template(args, tool_result["content"])
+        if reply is None:
+            return None
+        replies.append(reply)
+    if not replies:
+        return None
+    # Several results (e.g. a rebooking and a cancellation) close only once
+    replies = [reply.removesuffix(f" {CLOSING}") for reply in replies[:-1]] + replies[-1:]
+    return "\n\n".join(replies)
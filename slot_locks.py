@@ -0,0 +1,126 @@
+import errno
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# --- Configuration ---
+DEADLOCK_RETRY_DELAY = 0.001  # Seconds before retrying a lock the kernel refused with EDEADLK
+
+class SlotLockManager:
+    """
+    Per-(date, restaurant row, slot) locks that work across threads and processes.
+
+    Within a process each cell gets its own re-entrant lock. Across processes
+    the cell is locked with a one-byte POSIX record lock on a per-date lock
+    file, at offset `row * n_slots + slot_idx`, so bookings for different
+    restaurants or slots never wait on each other.
+    Contention and wait times are counted so the locking can be sized.
+
+    POSIX record locks belong to the process, not the thread, so with many
+    threads per process the kernel can report a deadlock that isn't one
+    (thread A1 waits on B, while thread B1 waits on a cell held by A2).
+    A thread only ever holds one cell, so EDEADLK is retried after a pause.
+    """
+
+    def __init__(self, lock_path_fn, n_slots: int):
+        self.lock_path_fn = lock_path_fn
+        self.n_slots = n_slots
+        self._guard = threading.Lock()
+        self._locks = {}   # (date_str, row, slot_idx) -> threading.RLock
+        self._depth = {}   # (date_str, row, slot_idx) -> re-entry count of the holder
+        self._fds = {}     # date_str -> lock file descriptor
+        self._stats = {
+            "acquisitions": 0,
+            "contended": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "deadlock_retries": 0,
+        }
+
+    def _thread_lock(self, key) -> threading.RLock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = threading.RLock()
+                self._locks[key] = lock
+            return lock
+
+    def _lock_fd(self, date_str: str) -> int:
+        with self._guard:
+            fd = self._fds.get(date_str)
+            if fd is None:
+                fd = os.open(self.lock_path_fn(date_str), os.O_RDWR | os.O_CREAT, 0o644)
+                self._fds[date_str] = fd
+            return fd
+
+    def _record_wait(self, contended: bool, waited: float):
+        with self._guard:
+            self._stats["acquisitions"] += 1
+            if contended:
+                self._stats["contended"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+    def _lock_blocking(self, fd: int, offset: int):
+        while True:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX, 1, offset)
+                return
+            except OSError as e:
+                if e.errno != errno.EDEADLK:
+                    raise
+                with self._guard:
+                    self._stats["deadlock_retries"] += 1
+                time.sleep(DEADLOCK_RETRY_DELAY)
+
+    @contextmanager
+    def hold(self, date_str: str, row: int, slot_idx: int):
+        """Holds the lock for one cell. Re-entrant for the owning thread."""
+        key = (date_str, row, slot_idx)
+        lock = self._thread_lock(key)
+        start = time.perf_counter()
+        contended = False
+
+        if not lock.acquire(blocking=False):
+            contended = True
+            lock.acquire()
+
+        try:
+            depth = self._depth.get(key, 0)
+            if depth == 0 and fcntl is not None:
+                fd = self._lock_fd(date_str)
+                offset = row * self.n_slots + slot_idx
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+                except OSError:
+                    contended = True
+                    self._lock_blocking(fd, offset)
+            self._depth[key] = depth + 1
+            if depth == 0:
+                self._record_wait(contended, time.perf_counter() - start)
+
+            try:
+                yield
+            finally:
+                self._depth[key] -= 1
+                if self._depth[key] == 0:
+                    del self._depth[key]
+                    if fcntl is not None:
+                        fcntl.lockf(self._lock_fd(date_str), fcntl.LOCK_UN, 1, row * self.n_slots + slot_idx)
+        finally:
+            lock.release()
+
+    def stats(self) -> dict:
+        """Returns lock acquisition, contention and wait-time counters."""
+        with self._guard:
+            stats = dict(self._stats)
+        acquisitions = stats["acquisitions"]
+        stats["contention_rate"] = stats["contended"] / acquisitions if acquisitions else 0.0
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / acquisitions if acquisitions else 0.0
+        return stats
@@ -0,0 +1,129 @@
+import bisect
+import re
+from functools import lru_cache
+from data_manager import TIME_SLOTS
+
+# --- Configuration ---
+MAX_SNAP_MINUTES = 30     # How far the tools may move an off-grid time to a slot
+PARSE_CACHE_SIZE = 1024
+
+# --- Slot Table ---
+# Built once at import: every slot as minutes after midnight, in ascending
+# order, so nearest-slot queries are a binary search.
+
+def _slot_to_minutes(slot: str) -> int:
+    hours, rest = slot.split(":")
+    minutes, meridiem = rest.split()
+    return (int(hours) % 12 + (12 if meridiem.upper() == "PM" else 0)) * 60 + int(minutes)
+
+_ordered = sorted(TIME_SLOTS, key=_slot_to_minutes)
+SLOT_MINUTES = [_slot_to_minutes(slot) for slot in _ordered]
+_SLOT_BY_MINUTES = dict(zip(SLOT_MINUTES, _ordered))
+
+# Accepts "07:00 PM", "7pm", "7 p.m.", "19:00", "19.30", "1900", "7"
+_TIME_PATTERN = re.compile(
+    r"^(\d{1,2})(?:[:.h]?(\d{2}))?\s*(a\.?m\.?|p\.?m\.?|a|p)?$",
+    re.IGNORECASE
+)
+_NAMED_TIMES = {"noon": 12 * 60, "midday": 12 * 60, "midnight": 0}
+
+# --- Parsing ---
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_minutes(text: str):
+    """
+    Parses a user/LLM time string into minutes after midnight.
+    Bare hours 1-9 without AM/PM (e.g. "7" or "9:00") are read as PM, as
+    nobody books a table for 9 in the morning; "09:00" stays 24-hour time.
+    Returns None if unparseable.
+    """
+    cleaned = str(text).strip().lower()
+    if cleaned in _NAMED_TIMES:
+        return _NAMED_TIMES[cleaned]
+
+    match = _TIME_PATTERN.match(cleaned)
+    if not match:
+        return None
+
+    hours = int(match.group(1))
+    minutes = int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").replace(".", "")
+    if minutes > 59:
+        return None
+
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem.startswith("p") else 0)
+        return hours * 60 + minutes
+
+    if hours > 23:
+        return None
+    if 1 <= hours <= 9 and not match.group(1).startswith("0"):
+        hours += 12
+    return hours * 60 + minutes
+
+# --- Queries ---
+
+def canonical_slot(text: str):
+    """Returns the TIME_SLOTS entry the text names exactly (e.g. "19:00" -> "07:00 PM"), or None."""
+    value = parse_minutes(text)
+    return _SLOT_BY_MINUTES.get(value) if value is not None else None
+
+def nearest_slot(text: str):
+    """
+    Returns (slot, distance_in_minutes) for the slot closest to the given time,
+    or None if the time can't be parsed. Ties go to the earlier slot.
+    """
+    value = parse_minutes(text)
+    if value is None:
+        return None
+    i = bisect.bisect_left(SLOT_MINUTES, value)
+    candidates = [j for j in (i - 1, i) if 0 <= j < len(SLOT_MINUTES)]
+    best = min(candidates, key=lambda j: abs(SLOT_MINUTES[j] - value))
+    return _SLOT_BY_MINUTES[SLOT_MINUTES[best]], abs(SLOT_MINUTES[best] - value)
+
+def k_nearest_slots(text: str, k: int = 3) -> list:
+    """Returns up to `k` slots ordered by distance from the given time."""
+    value = parse_minutes(text)
+    if value is None:
+        return []
+    right = bisect.bisect_left(SLOT_MINUTES, value)
+    left = right - 1
+    found = []
+    while len(found) < k and (left >= 0 or right < len(SLOT_MINUTES)):
+        take_left = right >= len(SLOT_MINUTES) or (
+            left >= 0 and value - SLOT_MINUTES[left] <= SLOT_MINUTES[right] - value
+        )
+        if take_left:
+            found.append(_SLOT_BY_MINUTES[SLOT_MINUTES[left]])
+            left -= 1
+        else:
+            found.append(_SLOT_BY_MINUTES[SLOT_MINUTES[right]])
+            right += 1
+    return found
+
+def slots_between(start: str = None, end: str = None) -> list:
+    """
+    Returns the slots from `start` to `end` inclusive, in time order.
+    Either bound may be omitted; an unparseable bound is treated as omitted.
+    """
+    lo = parse_minutes(start) if start else None
+    hi = parse_minutes(end) if end else None
+    i = bisect.bisect_left(SLOT_MINUTES, lo) if lo is not None else 0
+    j = bisect.bisect_right(SLOT_MINUTES, hi) if hi is not None else len(SLOT_MINUTES)
+    return [_SLOT_BY_MINUTES[m] for m in SLOT_MINUTES[i:j]]
+
+def resolve_slot(text: str, max_distance: int = None):
+    """
+    Maps a requested time to a slot.
+    Returns the slot, or None if the time can't be parsed or is more than
+    `max_distance` minutes from every slot.
+    """
+    found = nearest_slot(text)
+    if found is None:
+        return None
+    slot, distance = found
+    if max_distance is not None and distance > max_distance:
+        return None
+    return slot
@@ -0,0 +1,303 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from booking_store import customer_key
+
+# --- Schema ---
+# `restaurant` columns hold the restaurant_id.
+# Availability is stored sparsely: a missing (date, restaurant, slot) row
+# means the restaurant still has its base capacity for that slot.
+# availability_versions counts the writes to each date, in the same
+# transaction as the write, so readers can tell when cached results are stale.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS availability (
+    date        TEXT    NOT NULL,
+    restaurant  INTEGER NOT NULL,
+    slot        INTEGER NOT NULL,
+    tables_left INTEGER NOT NULL,
+    PRIMARY KEY (date, restaurant, slot)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS availability_versions (
+    date    TEXT    PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id         TEXT PRIMARY KEY,
+    date               TEXT NOT NULL,
+    restaurant         INTEGER NOT NULL,
+    slot               INTEGER NOT NULL,
+    customer_name      TEXT,
+    customer_email     TEXT,
+    customer_phone     TEXT,
+    restaurant_name    TEXT,
+    restaurant_address TEXT,
+    party_size         INTEGER,
+    time_slot          TEXT,
+    tables_reserved    INTEGER,
+    status             TEXT,
+    special_requests   TEXT,
+    created_at         TEXT,
+    updated_at         TEXT,
+    name_key           TEXT,
+    email_key          TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_date_restaurant_slot ON bookings (date, restaurant, slot);
+CREATE INDEX IF NOT EXISTS idx_bookings_email ON bookings (email_key);
+"""
+
+# --- Statements ---
+# Fixed SQL strings with ? placeholders, so sqlite3 prepares each one once
+# per connection and reuses it from its statement cache.
+
+SQL_GET_TABLES = "SELECT tables_left FROM availability WHERE date = ? AND restaurant = ? AND slot = ?"
+SQL_DATE_OVERRIDES = "SELECT restaurant, slot, tables_left FROM availability WHERE date = ?"
+SQL_SET_TABLES = (
+    "INSERT INTO availability (date, restaurant, slot, tables_left) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (date, restaurant, slot) DO UPDATE SET tables_left = excluded.tables_left"
+)
+SQL_GET_VERSION = "SELECT version FROM availability_versions WHERE date = ?"
+SQL_BUMP_VERSION = (
+    "INSERT INTO availability_versions (date, version) VALUES (?, 1) "
+    "ON CONFLICT (date) DO UPDATE SET version = version + 1"
+)
+SQL_INSERT_BOOKING = (
+    "INSERT INTO bookings (booking_id, date, restaurant, slot, customer_name, customer_email, "
+    "customer_phone, restaurant_name, restaurant_address, party_size, time_slot, tables_reserved, "
+    "status, special_requests, created_at, updated_at, name_key, email_key) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_SET_STATUS = "UPDATE bookings SET status = ?, updated_at = ? WHERE date = ? AND booking_id = ?"
+SQL_BOOKINGS_FOR_DATE = "SELECT * FROM bookings WHERE date = ? ORDER BY rowid"
+SQL_BOOKING_BY_ID = "SELECT * FROM bookings WHERE booking_id = ?"
+SQL_BOOKING_IN_DATE = "SELECT * FROM bookings WHERE date = ? AND booking_id = ?"
+SQL_BOOKINGS_BY_CUSTOMER = "SELECT * FROM bookings WHERE email_key = ? AND name_key = ? ORDER BY rowid"
+
+INTERNAL_COLUMNS = ("date", "restaurant", "slot", "name_key", "email_key")
+
+class SqliteStorage:
+    """
+    Storage backend on a single SQLite database in WAL mode.
+
+    WAL lets any number of readers run alongside the one writer, and each
+    booking or cancellation (availability change plus booking row) commits
+    as one transaction, so no manual rollback is needed. Each thread keeps
+    its own connection.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path, headers: list, n_slots: int, base_capacity: int, busy_timeout: float = 30.0):
+        self.db_path = str(db_path)
+        self.headers = headers
+        self.n_slots = n_slots
+        self.base_capacity = base_capacity
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "acquisitions": 0,
+            "contended": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    # --- Connections ---
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout,
+                isolation_level=None,  # Transactions are managed explicitly
+                cached_statements=64
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Runs the block in a BEGIN IMMEDIATE transaction, which takes the
+        database's single write lock up front. The wait for it is recorded.
+        """
+        conn = self._conn()
+        start = time.perf_counter()
+        contended = False
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            # Only raised once busy_timeout has expired
+            contended = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self._stats["acquisitions"] += 1
+                if contended or waited > 0.001:
+                    self._stats["contended"] += 1
+                self._stats["wait_seconds_total"] += waited
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _row_to_record(self, row: sqlite3.Row) -> dict:
+        record = {key: row[key] for key in row.keys() if key not in INTERNAL_COLUMNS}
+        if row["restaurant"] >= 0:
+            record["restaurant_id"] = row["restaurant"]  # The restaurant column holds the ID
+        return {header: record.get(header) for header in self.headers}
+
+    def _get_tables(self, conn, date_str: str, row: int, slot_idx: int) -> int:
+        found = conn.execute(SQL_GET_TABLES, (date_str, row, slot_idx)).fetchone()
+        return found[0] if found is not None else self.base_capacity
+
+    # --- Availability ---
+
+    def has_date(self, date_str: str) -> bool:
+        return True  # Dates need no setup; untouched cells read as base capacity
+
+    def create_date(self, date_str: str, n_rows: int, seed: np.ndarray = None) -> bool:
+        """Imports seed values for a date (only cells that differ from base capacity)."""
+        if seed is None:
+            return False
+        rows, slots = np.nonzero(seed != self.base_capacity)
+        with self._write_transaction() as conn:
+            conn.executemany(SQL_SET_TABLES, [
+                (date_str, int(r), int(s), int(seed[r, s])) for r, s in zip(rows, slots)
+            ])
+            conn.execute(SQL_BUMP_VERSION, (date_str,))
+        return True
+
+    def availability_version(self, date_str: str) -> int:
+        """A counter that changes whenever the date's availability does, in any process."""
+        found = self._conn().execute(SQL_GET_VERSION, (date_str,)).fetchone()
+        return found[0] if found is not None else 0
+
+    def matrix(self, date_str: str, n_rows: int) -> np.ndarray:
+        """Returns the date's availability (n_rows x slots): base capacity plus stored cells."""
+        matrix = np.full((n_rows, self.n_slots), self.base_capacity, dtype=np.int16)
+        for restaurant, slot, tables_left in self._conn().execute(SQL_DATE_OVERRIDES, (date_str,)):
+            if restaurant < n_rows:
+                matrix[restaurant, slot] = tables_left
+        return matrix
+
+    def get_tables(self, date_str: str, n_rows: int, row: int, slot_idx: int) -> int:
+        return self._get_tables(self._conn(), date_str, row, slot_idx)
+
+    def rows_with_capacity(self, date_str: str, n_rows: int, slot_idx: int, tables_needed: int) -> np.ndarray:
+        return np.flatnonzero(self.matrix(date_str, n_rows)[:, slot_idx] >= tables_needed)
+
+    def add_tables(self, date_str: str, n_rows: int, row: int, slot_idx: int, change: int):
+        """Applies `change` to one cell. Returns the new value, or None if it would go negative."""
+        with self._write_transaction() as conn:
+            new_value = self._get_tables(conn, date_str, row, slot_idx) + change
+            if new_value < 0:
+                return None
+            conn.execute(SQL_SET_TABLES, (date_str, row, slot_idx, new_value))
+            conn.execute(SQL_BUMP_VERSION, (date_str,))
+            return new_value
+
+    def hold(self, date_str: str, row: int, slot_idx: int):
+        # Every write is its own transaction, so there is nothing to hold
+        return nullcontext()
+
+    def lock_stats(self) -> dict:
+        """Returns wait-time counters for acquiring the database write lock."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        acquisitions = stats["acquisitions"]
+        stats["contention_rate"] = stats["contended"] / acquisitions if acquisitions else 0.0
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / acquisitions if acquisitions else 0.0
+        return stats
+
+    # --- Bookings ---
+
+    def _insert(self, conn, date_str: str, row: int, slot_idx: int, record: dict):
+        name_key, email_key = customer_key(record.get("customer_name"), record.get("customer_email"))
+        conn.execute(SQL_INSERT_BOOKING, (
+            record["booking_id"], date_str, row, slot_idx,
+            record.get("customer_name"), record.get("customer_email"), record.get("customer_phone"),
+            record.get("restaurant_name"), record.get("restaurant_address"),
+            record.get("party_size"), record.get("time_slot"), record.get("tables_reserved"),
+            record.get("status"), record.get("special_requests"),
+            record.get("created_at"), record.get("updated_at"),
+            name_key, email_key
+        ))
+
+    def records(self, date_str: str) -> list:
+        return [self._row_to_record(row) for row in self._conn().execute(SQL_BOOKINGS_FOR_DATE, (date_str,))]
+
+    def insert_booking(self, date_str: str, record: dict, row: int = -1, slot_idx: int = -1):
+        with self._write_transaction() as conn:
+            self._insert(conn, date_str, row, slot_idx, record)
+
+    def set_status(self, date_str: str, booking_id: str, status: str, updated_at: str) -> bool:
+        with self._write_transaction() as conn:
+            return conn.execute(SQL_SET_STATUS, (status, updated_at, date_str, booking_id)).rowcount > 0
+
+    def find(self, booking_id: str):
+        row = self._conn().execute(SQL_BOOKING_BY_ID, (booking_id,)).fetchone()
+        if row is None:
+            return None
+        return row["date"], self._row_to_record(row)
+
+    def find_by_customer(self, name: str, email: str) -> list:
+        name_key, email_key = customer_key(name, email)
+        rows = self._conn().execute(SQL_BOOKINGS_BY_CUSTOMER, (email_key, name_key))
+        return [(row["date"], self._row_to_record(row)) for row in rows]
+
+    def export_bookings_csv(self, date_str: str, filepath: Path) -> Path:
+        pd.DataFrame(self.records(date_str), columns=self.headers).to_csv(filepath, index=False)
+        return filepath
+
+    # --- Combined Operations ---
+
+    def create_booking(self, date_str: str, n_rows: int, row: int, slot_idx: int, record: dict) -> tuple:
+        """
+        Takes the tables and inserts the booking in one transaction.
+        Returns (created, tables_left).
+        """
+        tables = int(record["tables_reserved"])
+        with self._write_transaction() as conn:
+            tables_left = self._get_tables(conn, date_str, row, slot_idx) - tables
+            if tables_left < 0:
+                return False, tables_left + tables
+            conn.execute(SQL_SET_TABLES, (date_str, row, slot_idx, tables_left))
+            conn.execute(SQL_BUMP_VERSION, (date_str,))
+            self._insert(conn, date_str, row, slot_idx, record)
+            return True, tables_left
+
+    def cancel_booking(self, date_str: str, booking_id: str, n_rows: int, row: int, slot_idx: int, updated_at: str) -> str:
+        """
+        Returns a booking's tables and marks it cancelled in one transaction.
+        Returns "cancelled", "already_cancelled" or "not_found".
+        """
+        with self._write_transaction() as conn:
+            booking = conn.execute(SQL_BOOKING_IN_DATE, (date_str, booking_id)).fetchone()
+            if booking is None:
+                return "not_found"
+            if str(booking["status"]).lower().startswith("cancelled"):
+                return "already_cancelled"
+
+            tables_left = self._get_tables(conn, date_str, row, slot_idx) + int(booking["tables_reserved"])
+            conn.execute(SQL_SET_TABLES, (date_str, row, slot_idx, tables_left))
+            conn.execute(SQL_BUMP_VERSION, (date_str,))
+            conn.execute(SQL_SET_STATUS, ("cancelled", updated_at, date_str, booking_id))
+            return "cancelled"
@@ -1,29 +1,24 @@
-import json
 from datetime import datetime, timedelta
-from tools import tool_definitions, tool_functions # Import the schema
+from history import count_text_tokens
 
-def get_system_prompt():
-    """
-    Returns the main system prompt for the agent.
-    """
-    
-    # Get today's date and the date 3 days from now
-    today = datetime.now()
-    today_str = today.strftime("%d.%m.%Y")
-    max_book_date = (today + timedelta(days=3)).strftime("%d.%m.%Y")
+# --- Configuration ---
+BOOKING_WINDOW_DAYS = 3
+DYNAMIC_CONTEXT_HEADER = "**Current Date and Time:**"  # Starts the per-request suffix
 
-    return f"""
+# --- Static Prefix ---
+# Everything here is byte-for-byte identical on every request, so the
+# provider can cache it. Anything that changes (the date and time) belongs
+# in the dynamic suffix below, never in here. Tool schemas are sent through
+# the `tools` parameter and are not repeated here.
+STATIC_PROMPT = """
 You are a friendly and highly efficient restaurant reservation assistant for *GoodFoods*.
 Your goal is to help users find restaurants, book tables, and manage their reservations.
-    * If the user tries to book for a time slot that is less than 30 minutes from the current time {today}, the user should be prompted that you cannotand not allowed to make any reservations if desired timeslot is less than 30 minutes.
-
-**Current Date:**
-Today's date is {today_str}.
+The current date and time are given at the end of these instructions.
 
 **Key Rules (Very Important!):**
-1.  **Date Format:** You MUST use the **DD.MM.YYYY** format for all dates in the backend. But when asking the user, ask notmally. Not in a specific format.
+1.  **Date Format:** You MUST use the **DD.MM.YYYY** format for all dates in the backend. But when asking the user, ask normally. Not in a specific format.
 2.  **Booking Window (72 Hours):**
-    * Users can **only** interact with dates from **today ({today_str})** up to **3 days in the future ({max_book_date})**.
+    * Users can **only** interact with dates from **today** up to **3 days in the future** (the exact dates are given at the end).
     * If a user asks for a date *outside* this window (e.g., next week, yesterday), you must inform them that bookings are only allowed within 72 hours from now. Do not call any tools.
 3.  **Booking Window (30 Minutes):**
     * A booking must be made at least **30 minutes in advance** of the chosen time slot.
@@ -37,7 +32,14 @@ Today's date is {today_str}.
     3.  If the new booking fails, inform the user and their original booking remains active.
     4.  While calling any tools, don't mention the things that you are doing in the backend.
 
-Also use {tool_functions} and {tool_definitions} to get_available_restaurants, get_restaurant_details, book_table, find_bookings, cancel_booking.
+**Tool Guidance:**
+* `get_available_restaurants`: restaurants with free tables for one date and time slot.
+* `search_availability`: open slots across a range of dates and times, when the user is flexible.
+* `recommend_restaurants`: the best-rated matches for a cuisine, area, type, budget or rating.
+* `search_restaurants_by_text`: find restaurants by dishes, menu items or what reviews mention.
+* `book_table`: make a booking; prefer the `restaurant_id` returned by the search tools.
+* `get_booking_details`: look up a booking by its ID, or by the customer's name and email together; the date is optional.
+* `cancel_booking`: cancel a booking by its booking ID.
 
 *All your responses must be based on the datasets. So use the datasets effectively.*
 You MUST update the datasets after each confirmation.
@@ -46,3 +48,33 @@ Use 12 hour time. Not 24 hour time. like 10:00 AM, 10:00 PM
 
 Start by greeting the user and asking for their intent and the date of their plan.
 """
+
+# --- Dynamic Suffix ---
+
+def get_dynamic_context(now: datetime = None) -> str:
+    """The date and time part of the prompt, at minute resolution."""
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    today_str = now.strftime("%d.%m.%Y")
+    max_book_date = (now + timedelta(days=BOOKING_WINDOW_DAYS)).strftime("%d.%m.%Y")
+    return f"""
+{DYNAMIC_CONTEXT_HEADER}
+Today is {now.strftime('%A')}, {today_str}, and the time is {now.strftime('%H:%M')}.
+Bookings are open from today ({today_str}) up to {max_book_date}.
+"""
+
+def get_system_prompt(now: datetime = None) -> str:
+    """
+    Returns the main system prompt for the agent: the static prefix
+    followed by the current date and time.
+    """
+    return STATIC_PROMPT + get_dynamic_context(now)
+
+def get_prompt_stats(now: datetime = None) -> dict:
+    """Token counts for the cacheable prefix and the per-request suffix."""
+    static_tokens = count_text_tokens(STATIC_PROMPT)
+    dynamic_tokens = count_text_tokens(get_dynamic_context(now))
+    return {
+        "static_tokens": static_tokens,
+        "dynamic_tokens": dynamic_tokens,
+        "total_tokens": static_tokens + dynamic_tokens,
+    }
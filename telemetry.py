@@ -0,0 +1,233 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# --- Configuration ---
+TRACE_SAMPLE_RATE = float(os.getenv("GOODFOODS_TRACE_SAMPLE_RATE", "0"))  # Share of turns traced (0..1)
+TRACE_FILE = os.getenv("GOODFOODS_TRACE_FILE", "traces.jsonl")
+METRICS_FILE = os.getenv("GOODFOODS_METRICS_FILE", "")  # Rewritten after each turn when set
+METRICS_PORT = int(os.getenv("GOODFOODS_METRICS_PORT", "0"))  # Serve /metrics on this port (0 = off)
+LOG_LEVEL = os.getenv("GOODFOODS_LOG_LEVEL", "WARNING")
+METRIC_PREFIX = "goodfoods"
+
+# Histogram buckets in seconds, from a cached tool call to a slow LLM reply
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# --- Logging ---
+# Modules log through logging.getLogger(__name__). Progress messages are
+# INFO, so at the default WARNING level they cost one level check.
+
+_logging_configured = False
+
+def configure_logging(level: str = None):
+    """Sets up the root logger once (GOODFOODS_LOG_LEVEL, default WARNING)."""
+    global _logging_configured
+    if _logging_configured:
+        return
+    logging.basicConfig(
+        level=(level or LOG_LEVEL).upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    _logging_configured = True
+
+# --- Metrics ---
+# Counters and duration histograms, kept in memory and rendered in the
+# Prometheus text format. Every span updates them, sampled or not.
+
+_metrics_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+def count(name: str, value: float = 1, **labels):
+    """Adds `value` to a counter."""
+    key = (name, _labels(labels))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, seconds: float, **labels):
+    """Records one duration in a histogram."""
+    key = (name, _labels(labels))
+    with _metrics_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(DURATION_BUCKETS) + 2)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def render_metrics() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    with _metrics_lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, list(value)) for key, value in _histograms.items())
+
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        metric = f"{METRIC_PREFIX}_{name}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+    for (name, labels), histogram in histograms:
+        metric = f"{METRIC_PREFIX}_{name}_seconds"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            lines.append(f"{metric}_bucket{_format_labels(labels, (('le', str(bound)),))} {histogram[i]}")
+        lines.append(f"{metric}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram[-1]}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {histogram[-2]:.6f}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {histogram[-1]}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path=None):
+    """
+    Writes the metrics to a file (for node_exporter's textfile collector),
+    atomically. Defaults to GOODFOODS_METRICS_FILE; returns None if unset.
+    """
+    path = path or METRICS_FILE
+    if not path:
+        return None
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(render_metrics(), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return path
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise log to stderr
+
+_metrics_server = None
+
+def start_metrics_server(port: int = None):
+    """Serves /metrics on a daemon thread (once per process). Returns the server, or None if disabled."""
+    global _metrics_server
+    port = METRICS_PORT if port is None else port
+    if _metrics_server is None and port:
+        _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+    return _metrics_server
+
+# --- Traces ---
+# A trace starts at a root span (an agent turn) and is sampled there;
+# nested spans follow that decision. Finished spans of sampled traces are
+# appended to TRACE_FILE as JSON lines.
+
+_current_span = contextvars.ContextVar("goodfoods_span", default=None)
+_trace_lock = threading.Lock()
+_trace_file = None
+
+class Span:
+    __slots__ = ("name", "labels", "attrs", "status", "trace_id", "span_id", "parent_id", "sampled", "start", "wall_start")
+
+    def __init__(self, name: str, labels: dict, parent):
+        self.name = name
+        self.labels = labels
+        self.attrs = {}
+        self.status = "ok"
+        self.parent_id = parent.span_id if parent else None
+        self.sampled = parent.sampled if parent else TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+        self.trace_id = parent.trace_id if parent else (uuid.uuid4().hex if self.sampled else None)
+        self.span_id = uuid.uuid4().hex[:16] if self.sampled else None
+        self.wall_start = time.time() if self.sampled else None
+        self.start = time.perf_counter()
+
+    def set(self, key: str, value):
+        """Attaches a trace attribute (dropped when the trace isn't sampled)."""
+        if self.sampled:
+            self.attrs[key] = value
+
+    def fail(self, message: str = None):
+        """Marks the span as failed without an exception (e.g. a tool that returned an error)."""
+        self.status = "error"
+        self.set("error", message)
+
+    def io(self, nbytes: int, rows: int):
+        """Records the bytes and rows a storage span read or wrote."""
+        count("storage_bytes", nbytes, **self.labels)
+        count("storage_rows", rows, **self.labels)
+        self.set("bytes", nbytes)
+        self.set("rows", rows)
+
+def current_span():
+    """The innermost open span in this context, or None."""
+    return _current_span.get()
+
+def _export(record: dict):
+    global _trace_file
+    line = json.dumps(record, default=str) + "\n"
+    with _trace_lock:
+        if _trace_file is None:
+            _trace_file = open(TRACE_FILE, "a", encoding="utf-8")
+        _trace_file.write(line)
+        if record["parent_id"] is None:
+            _trace_file.flush()  # One flush per trace
+
+@contextmanager
+def span(name: str, **labels):
+    """
+    Times a block as a span. `labels` must be low-cardinality (a tool
+    name, an operation); they label the duration histogram and the trace.
+    Per-call details go through span.set(). Errors are recorded and re-raised.
+    """
+    parent = _current_span.get()
+    current = Span(name, labels, parent)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(repr(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        seconds = time.perf_counter() - current.start
+        observe(name.replace(".", "_"), seconds, **labels)
+        if current.status == "error":
+            count("errors", span=name, **labels)
+        if current.sampled:
+            _export({
+                "trace_id": current.trace_id,
+                "span_id": current.span_id,
+                "parent_id": current.parent_id,
+                "name": name,
+                "start": current.wall_start,
+                "duration_ms": round(seconds * 1000, 3),
+                "status": current.status,
+                "labels": labels,
+                "attrs": current.attrs,
+            })
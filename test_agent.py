@@ -0,0 +1,47 @@
+import json
+from openai.types.chat import ChatCompletionMessage
+import agent
+import llm_client
+
+LOOKUP = ChatCompletionMessage.model_validate({
+    "role": "assistant", "content": None,
+    "tool_calls": [{"id": "call_1", "type": "function",
+                    "function": {"name": "get_booking_details", "arguments": json.dumps({"booking_id": "NOPE"})}}],
+})
+BUSY = {"role": "assistant", "content": llm_client.BUSY_MESSAGE}
+
+def _scripted(monkeypatch, responses: list):
+    calls = []
+
+    def chat_completion(messages, tools=None, stream=False):
+        calls.append(messages)
+        response = responses[len(calls) - 1]
+        if not stream:
+            return response
+
+        def events():
+            if isinstance(response, dict):
+                yield response["content"]
+            yield response
+        return events()
+    monkeypatch.setattr(llm_client, "chat_completion", chat_completion)
+    return calls
+
+def test_busy_synthesis_is_shown(monkeypatch):
+    calls = _scripted(monkeypatch, [LOOKUP, BUSY])
+    history = [{"role": "user", "content": "What's booking NOPE?"}]
+
+    new_messages = agent.ReservationAgent().run(history)
+
+    assert len(calls) == 2
+    assert [m["role"] for m in new_messages] == ["assistant", "tool", "assistant"]
+    assert new_messages[-1] == BUSY
+
+def test_busy_synthesis_is_shown_when_streaming(monkeypatch):
+    _scripted(monkeypatch, [LOOKUP, BUSY])
+    history = [{"role": "user", "content": "What's booking NOPE?"}]
+
+    events = list(agent.ReservationAgent().run_stream(history))
+
+    assert llm_client.BUSY_MESSAGE in events
+    assert events[-1] == BUSY
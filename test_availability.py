@@ -0,0 +1,43 @@
+import numpy as np
+from availability import AvailabilityEngine
+
+N_ROWS = 5
+N_SLOTS = 3
+
+def _engine(path, **kwargs) -> AvailabilityEngine:
+    return AvailabilityEngine(lambda d: path / f"tracker[{d}].delta", n_slots=N_SLOTS, base_capacity=4, **kwargs)
+
+def test_changes_are_shared_through_the_log(tmp_path):
+    writer, reader = _engine(tmp_path), _engine(tmp_path)
+    writer.create("30.10.2025", N_ROWS)
+
+    assert writer.add("30.10.2025", N_ROWS, 2, 1, -3) == 1
+    assert writer.add("30.10.2025", N_ROWS, 2, 1, -2) is None  # Would go negative
+    assert reader.get("30.10.2025", N_ROWS, 2, 1) == 1
+    assert reader.rows_with_capacity("30.10.2025", N_ROWS, 1, 2).tolist() == [0, 1, 3, 4]
+    assert reader.version("30.10.2025") == writer.version("30.10.2025") > 0
+
+def test_seed_is_imported_as_changes(tmp_path):
+    seed = np.full((N_ROWS, N_SLOTS), 4, dtype=np.int16)
+    seed[0, 0] = 1
+    engine = _engine(tmp_path)
+
+    assert engine.create("31.10.2025", N_ROWS, seed)
+    assert not engine.create("31.10.2025", N_ROWS, seed)
+    assert (_engine(tmp_path).snapshot("31.10.2025", N_ROWS) == seed).all()
+
+def test_idle_log_descriptors_are_closed(tmp_path):
+    engine = _engine(tmp_path, max_open_logs=2)
+    dates = [f"{day:02d}.11.2025" for day in range(1, 6)]
+    for date_str in dates:
+        engine.add(date_str, N_ROWS, 0, 0, -1)
+
+    assert list(engine._open_logs) == dates[-2:]
+    assert engine._dates[dates[0]].fd is None
+    # A closed date reopens its log on the next write
+    assert engine.add(dates[0], N_ROWS, 0, 0, -1) == 2
+    assert list(engine._open_logs) == [dates[-1], dates[0]]
+
+    engine.close()
+    assert not engine._open_logs
+    assert all(state.fd is None for state in engine._dates.values())
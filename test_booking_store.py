@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import pytest
+from booking_store import BookingJournal
+
+HEADERS = ["booking_id", "customer_name", "customer_email", "status", "updated_at"]
+DATE = "30.10.2025"
+
+def _journal(path, **kwargs) -> BookingJournal:
+    return BookingJournal(
+        snapshot_path_fn=lambda d: path / f"bookings[{d}].csv",
+        journal_path_fn=lambda d: path / f"bookings[{d}].journal",
+        headers=HEADERS,
+        dates_fn=lambda: [DATE],
+        **kwargs
+    )
+
+def _record(booking_id: str) -> dict:
+    return {"booking_id": booking_id, "customer_name": "Asha", "customer_email": "asha@example.com",
+            "status": "confirmed", "updated_at": ""}
+
+def test_replay_skips_truncated_trailing_line(tmp_path):
+    journal = _journal(tmp_path)
+    journal.insert(DATE, _record("B1"))
+    journal.insert(DATE, _record("B2"))
+    journal.flush()
+    # A writer that died halfway through its line
+    with open(tmp_path / f"bookings[{DATE}].journal", "ab") as f:
+        f.write(b'{"op": "insert", "record": {"booking_id": "B3", "cust')
+
+    replayed = _journal(tmp_path)
+    assert [r["booking_id"] for r in replayed.records(DATE)] == ["B1", "B2"]
+
+    # The next append must not be glued onto the torn line
+    replayed.insert(DATE, _record("B4"))
+    assert [r["booking_id"] for r in _journal(tmp_path).records(DATE)] == ["B1", "B2", "B4"]
+    assert [r["booking_id"] for r in journal.records(DATE)] == ["B1", "B2", "B4"]
+
+def _insert_many(path, prefix: str, n: int, start):
+    journal = _journal(path, compact_every=3)
+    start.wait()
+    for i in range(n):
+        journal.insert(DATE, _record(f"{prefix}{i}"))
+        if i % 7 == 0:
+            journal.set_status(DATE, f"{prefix}{i}", "cancelled", "now")
+    journal.flush()
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_compaction_racing_appends_loses_nothing(tmp_path):
+    # Every third record compacts, so each process keeps swapping the
+    # journal out from under the other's appends.
+    ctx = multiprocessing.get_context("fork")
+    start = ctx.Barrier(2)
+    workers = [ctx.Process(target=_insert_many, args=(tmp_path, prefix, 60, start)) for prefix in ("A", "B")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    records = {r["booking_id"]: r for r in _journal(tmp_path).records(DATE)}
+    expected = {f"{prefix}{i}" for prefix in ("A", "B") for i in range(60)}
+    assert set(records) == expected
+    assert {b for b, r in records.items() if r["status"] == "cancelled"} == {
+        f"{prefix}{i}" for prefix in ("A", "B") for i in range(0, 60, 7)
+    }
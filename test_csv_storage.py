@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+import pytest
+from availability import AvailabilityEngine
+from booking_store import BookingJournal
+from csv_storage import CsvStorage
+from slot_locks import SlotLockManager
+
+HEADERS = ["booking_id", "restaurant_id", "time_slot", "tables_reserved", "status", "updated_at"]
+DATE = "30.10.2025"
+N_ROWS = 20
+N_SLOTS = 4
+
+def _storage(path) -> CsvStorage:
+    return CsvStorage(
+        availability=AvailabilityEngine(lambda d: path / f"tracker[{d}].delta", n_slots=N_SLOTS, base_capacity=1),
+        bookings=BookingJournal(lambda d: path / f"bookings[{d}].csv", lambda d: path / f"bookings[{d}].journal",
+                                headers=HEADERS),
+        locks=SlotLockManager(lambda d: path / f"tracker[{d}].lock", n_slots=N_SLOTS)
+    )
+
+def _book_every_cell(path, name: str, start, results):
+    storage = _storage(path)
+    start.wait()
+    won = []
+    for row in range(N_ROWS):
+        record = {"booking_id": f"{name}-{row}", "restaurant_id": row, "time_slot": "07:00 PM",
+                  "tables_reserved": 1, "status": "confirmed", "updated_at": ""}
+        created, _ = storage.create_booking(DATE, N_ROWS, row, 2, record)
+        if created:
+            won.append(row)
+    storage.bookings.flush()
+    results.put((name, won))
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_two_processes_race_for_the_last_table(tmp_path):
+    # Every cell has one table; both processes try to book all of them at once
+    _storage(tmp_path).create_date(DATE, N_ROWS)
+    ctx = multiprocessing.get_context("fork")
+    start, results = ctx.Barrier(2), ctx.Queue()
+    workers = [ctx.Process(target=_book_every_cell, args=(tmp_path, name, start, results)) for name in ("A", "B")]
+    for worker in workers:
+        worker.start()
+    won = dict(results.get(timeout=60) for _ in workers)
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    assert sorted(won["A"] + won["B"]) == list(range(N_ROWS))  # Exactly one winner per cell
+    storage = _storage(tmp_path)
+    assert not storage.matrix(DATE, N_ROWS)[:, 2].any()
+    assert sorted(int(r["restaurant_id"]) for r in storage.records(DATE)) == list(range(N_ROWS))
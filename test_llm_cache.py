@@ -0,0 +1,27 @@
+from datetime import datetime
+from openai.types.chat import ChatCompletionMessage
+import llm_cache
+from system_prompt import get_system_prompt
+
+def _key(now: datetime) -> str:
+    messages = [{"role": "system", "content": get_system_prompt(now)}, {"role": "user", "content": "Any sushi tonight?"}]
+    return llm_cache.request_key(messages, [], "test-deployment")
+
+def test_cache_key_keeps_a_half_hour_bucket(monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_MODE", "cache")
+    assert _key(datetime(2026, 10, 17, 18, 0)) == _key(datetime(2026, 10, 17, 18, 29))
+    assert _key(datetime(2026, 10, 17, 18, 10)) != _key(datetime(2026, 10, 17, 18, 40))
+    assert _key(datetime(2026, 10, 17, 9, 5)) != _key(datetime(2026, 10, 18, 9, 5))
+
+def test_same_question_later_in_the_day_misses(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_MODE", "cache")
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.ResponseCache(tmp_path / "llm_cache.db", ttl=3600, max_entries=10))
+    answer = ChatCompletionMessage(role="assistant", content="Yes, 7 PM is still bookable.")
+    llm_cache.store(_key(datetime(2026, 10, 17, 18, 10)), answer)
+
+    assert llm_cache.lookup(_key(datetime(2026, 10, 17, 18, 20))) == answer
+    assert llm_cache.lookup(_key(datetime(2026, 10, 17, 19, 5))) is None
+
+def test_portable_key_ignores_date(monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_MODE", "replay")
+    assert _key(datetime(2026, 10, 17, 9, 5)) == _key(datetime(2026, 10, 18, 21, 59))
@@ -0,0 +1,69 @@
+import json
+from types import SimpleNamespace
+import pytest
+from openai.types.chat import ChatCompletionChunk
+import llm_cache
+import llm_client
+import telemetry
+
+def _chunk(delta: dict) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate({
+        "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": "test",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+    })
+
+class _FakeCompletions:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return iter(self.chunks)
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    def install(chunks):
+        completions = _FakeCompletions(chunks)
+        monkeypatch.setattr(llm_client, "get_llm_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        return completions
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "test-deployment")
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_MODE", "off")
+    return install
+
+def test_stream_reassembles_tool_calls(fake_client, monkeypatch, tmp_path):
+    # Sampled, so the span attributes are actually set
+    monkeypatch.setattr(telemetry, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(telemetry, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(telemetry, "_trace_file", None)
+    fake_client([
+        _chunk({"role": "assistant", "tool_calls": [
+            {"index": 0, "id": "call_1", "type": "function", "function": {"name": "book_", "arguments": '{"party'}}
+        ]}),
+        _chunk({"tool_calls": [{"index": 0, "function": {"name": "table", "arguments": '_size": 4}'}}]}),
+        _chunk({"tool_calls": [
+            {"index": 1, "id": "call_2", "type": "function", "function": {"name": "cancel_booking", "arguments": "{}"}}
+        ]}),
+    ])
+
+    events = list(llm_client.chat_completion([{"role": "user", "content": "Book it"}], tools=[], stream=True))
+
+    assert not any(isinstance(event, str) for event in events)
+    message = events[-1]
+    assert [(c.id, c.function.name, json.loads(c.function.arguments)) for c in message.tool_calls] == [
+        ("call_1", "book_table", {"party_size": 4}),
+        ("call_2", "cancel_booking", {}),
+    ]
+    telemetry._trace_file.flush()
+    spans = [json.loads(line) for line in open(tmp_path / "traces.jsonl")]
+    assert spans[-1]["name"] == "llm.call" and spans[-1]["status"] == "ok"
+    assert spans[-1]["attrs"]["completion_tokens"] > 0
+
+def test_stream_yields_text_deltas(fake_client):
+    fake_client([_chunk({"role": "assistant", "content": "Hello "}), _chunk({"content": "there"})])
+
+    events = list(llm_client.chat_completion([{"role": "user", "content": "Hi"}], stream=True))
+
+    assert events[:2] == ["Hello ", "there"]
+    assert events[-1].content == "Hello there"
+    assert events[-1].tool_calls is None
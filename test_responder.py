@@ -0,0 +1,86 @@
+import json
+from types import SimpleNamespace
+import responder
+
+BOOKING_ARGS = {"customer_name": "Asha Rao", "customer_email": "asha@example.com", "restaurant_name": "Toit",
+                "party_size": 4, "date": "30.10.2025", "time_slot": "08:00 PM"}
+
+def _call(name: str, args: dict, call_id: str = "call_new"):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(args)))
+
+def _result(content, call_id: str = "call_new") -> dict:
+    return {"role": "tool", "tool_call_id": call_id, "content": content if isinstance(content, str) else json.dumps(content)}
+
+def _booked(booking_id: str, time_slot: str = "08:00 PM") -> dict:
+    return {"status": "confirmed", "booking_id": booking_id, "restaurant_id": 7, "restaurant_name": "Toit",
+            "party_size": 4, "date": "30.10.2025", "time_slot": time_slot, "tables_reserved": 1}
+
+def _earlier_booking(booking_id: str, args: dict = BOOKING_ARGS) -> list:
+    """History in which `booking_id` was booked through book_table."""
+    return [
+        {"role": "user", "content": "Book Toit for 4 at 7pm"},
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": "call_old", "type": "function", "function": {"name": "book_table", "arguments": json.dumps(args)}}
+        ]},
+        _result(_booked(booking_id, "07:00 PM"), "call_old"),
+        {"role": "assistant", "content": "Your table is booked!"},
+    ]
+
+def test_confirmed_booking_uses_the_template():
+    reply = responder.respond([_call("book_table", BOOKING_ARGS)], [_result(_booked("BK1"))])
+
+    assert reply.startswith("Your table is booked!")
+    assert "**Booking ID:** BK1" in reply and "Thursday, 30 October 2025" in reply
+    assert reply.endswith(responder.CLOSING)
+
+def test_failed_booking_goes_to_the_llm():
+    result = _result("Booking failed: Not enough tables available at 'Toit' for 4 guests at 08:00 PM. Only 0 table(s) left.")
+    assert responder.respond([_call("book_table", BOOKING_ARGS)], [result]) is None
+
+def test_rebooking_with_an_active_booking_goes_to_the_llm():
+    # The first half of a modification: the old booking still has to be cancelled
+    history = _earlier_booking("BK1") + [{"role": "user", "content": "Move it to 8pm"}]
+    assert responder.respond([_call("book_table", BOOKING_ARGS)], [_result(_booked("BK2"))], history) is None
+
+def test_rebooking_found_through_booking_details_goes_to_the_llm():
+    details = {"booking_id": "BK1", "customer_name": "Asha Rao", "customer_email": "ASHA@example.com", "status": "confirmed"}
+    history = [
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": "call_find", "type": "function", "function": {"name": "get_booking_details", "arguments": '{"booking_id": "BK1"}'}}
+        ]},
+        _result(details, "call_find"),
+    ]
+    assert responder.respond([_call("book_table", BOOKING_ARGS)], [_result(_booked("BK2"))], history) is None
+
+def test_booking_after_a_cancelled_or_other_customers_booking_uses_the_template():
+    cancelled = _earlier_booking("BK1") + [
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": "call_cancel", "type": "function", "function": {"name": "cancel_booking", "arguments": '{"booking_id": "BK1"}'}}
+        ]},
+        _result({"status": "cancelled", "booking_id": "BK1", "restaurant_name": "Toit", "date": "30.10.2025"}, "call_cancel"),
+    ]
+    someone_else = _earlier_booking("BK1", dict(BOOKING_ARGS, customer_name="Ravi", customer_email="ravi@example.com"))
+
+    for history in (cancelled, someone_else):
+        assert responder.respond([_call("book_table", BOOKING_ARGS)], [_result(_booked("BK2"))], history) is not None
+
+def test_rebook_and_cancel_in_one_batch_closes_once():
+    cancellation = {"status": "cancelled", "booking_id": "BK1", "restaurant_name": "Toit", "date": "30.10.2025"}
+    reply = responder.respond(
+        [_call("book_table", BOOKING_ARGS), _call("cancel_booking", {"booking_id": "BK1"}, "call_cancel")],
+        [_result(_booked("BK2")), _result(cancellation, "call_cancel")],
+        _earlier_booking("BK1"),
+    )
+
+    assert "**Booking ID:** BK2" in reply and "**BK1** at Toit" in reply
+    assert reply.count(responder.CLOSING) == 1
+
+def test_unknown_tool_or_result_goes_to_the_llm():
+    assert responder.respond([_call("get_booking_details", {"booking_id": "BK1"})], [_result(_booked("BK1"))]) is None
+    assert responder.respond([_call("get_available_restaurants", {})], [_result('{"restaurants": []}')]) is None
+    assert responder.respond([], []) is None
+
+def test_no_availability_is_templated():
+    result = _result("No restaurants have 2 table(s) available for 8 guests at 08:00 PM on 30.10.2025.")
+    reply = responder.respond([_call("get_available_restaurants", {})], [result])
+    assert reply.startswith("Sorry, no restaurants have 2 table(s)")
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import threading
+import time
+import pytest
+from slot_locks import SlotLockManager
+
+DATE = "30.10.2025"
+HOLD_SECONDS = 0.3
+
+def _cross_wait(path, held_row: int, wanted_row: int, start, results):
+    """Holds one cell in a thread while a second thread waits for the cell the other process holds."""
+    locks = SlotLockManager(lambda d: path / f"tracker[{d}].lock", n_slots=1)
+    errors = []
+
+    def hold():
+        with locks.hold(DATE, held_row, 0):
+            start.wait()
+            time.sleep(HOLD_SECONDS)
+
+    def wait():
+        start.wait()
+        time.sleep(0.05)
+        try:
+            with locks.hold(DATE, wanted_row, 0):
+                pass
+        except OSError as e:
+            errors.append(e.errno)
+
+    threads = [threading.Thread(target=hold), threading.Thread(target=wait)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((errors, locks.stats().get("deadlock_retries", 0)))
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_cross_process_waits_are_not_deadlocks(tmp_path):
+    # Each process holds one cell while its other thread waits for the other
+    # process's cell. Record locks belong to processes, so the kernel sees a
+    # cycle and fails one wait with EDEADLK, although both holders let go.
+    ctx = multiprocessing.get_context("fork")
+    start, results = ctx.Barrier(4), ctx.Queue()
+    workers = [ctx.Process(target=_cross_wait, args=(tmp_path, held, wanted, start, results))
+               for held, wanted in ((0, 1), (1, 0))]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(30)
+
+    assert [errors for errors, _ in outcomes] == [[], []]
+    assert sum(retries for _, retries in outcomes) >= 1
+
+def test_hold_is_reentrant_and_counts_contention(tmp_path):
+    locks = SlotLockManager(lambda d: tmp_path / f"tracker[{d}].lock", n_slots=4)
+    with locks.hold(DATE, 2, 3):
+        with locks.hold(DATE, 2, 3):
+            pass
+        waited = threading.Event()
+
+        def other():
+            with locks.hold(DATE, 2, 3):
+                waited.set()
+        thread = threading.Thread(target=other)
+        thread.start()
+        time.sleep(0.05)
+        assert not waited.is_set()
+    thread.join(5)
+
+    assert waited.is_set()
+    stats = locks.stats()
+    assert stats["acquisitions"] == 2 and stats["contended"] == 1
@@ -0,0 +1,44 @@
+import pytest
+import slots
+
+@pytest.mark.parametrize("text, minutes", [
+    ("07:00 PM", 19 * 60), ("7pm", 19 * 60), ("7 p.m.", 19 * 60), ("7:30 am", 7 * 60 + 30),
+    ("19:00", 19 * 60), ("19.30", 19 * 60 + 30), ("1900", 19 * 60), ("12 am", 0), ("noon", 12 * 60),
+    # Bare hours 1-9 are dinner, not breakfast
+    ("7", 19 * 60), ("8", 20 * 60), ("9", 21 * 60), ("9:00", 21 * 60), ("1", 13 * 60),
+    # 10-12 and zero-padded times are taken as written
+    ("10", 10 * 60), ("11:30", 11 * 60 + 30), ("12", 12 * 60), ("09:00", 9 * 60), ("0930", 9 * 60 + 30),
+])
+def test_parse_minutes(text, minutes):
+    assert slots.parse_minutes(text) == minutes
+
+@pytest.mark.parametrize("text", ["", "soon", "25:00", "7:75", "13pm", "0 am"])
+def test_parse_minutes_rejects(text):
+    assert slots.parse_minutes(text) is None
+
+def test_canonical_slot_only_matches_exact_slots():
+    assert slots.canonical_slot("19:00") == "07:00 PM"
+    assert slots.canonical_slot("9") == "09:00 PM"
+    assert slots.canonical_slot("7:30 pm") is None
+
+def test_nearest_slot_prefers_the_earlier_slot_on_ties():
+    assert slots.nearest_slot("7:30 pm") == ("07:00 PM", 30)
+    assert slots.nearest_slot("7:40 pm") == ("08:00 PM", 20)
+    assert slots.nearest_slot("soon") is None
+
+def test_resolve_slot_applies_max_distance():
+    assert slots.resolve_slot("23:00") == "10:00 PM"
+    assert slots.resolve_slot("23:00", max_distance=slots.MAX_SNAP_MINUTES) is None
+    assert slots.resolve_slot("midnight", max_distance=slots.MAX_SNAP_MINUTES) is None
+    assert slots.resolve_slot("10:20 pm", max_distance=slots.MAX_SNAP_MINUTES) == "10:00 PM"
+
+def test_k_nearest_slots():
+    assert slots.k_nearest_slots("7:30 pm", 3) == ["07:00 PM", "08:00 PM", "06:00 PM"]
+    assert slots.k_nearest_slots("midnight", 2) == ["10:00 AM", "11:00 AM"]
+    assert slots.k_nearest_slots("soon") == []
+
+def test_slots_between():
+    assert slots.slots_between("7", "9") == ["07:00 PM", "08:00 PM", "09:00 PM"]
+    assert slots.slots_between(end="11am") == ["10:00 AM", "11:00 AM"]
+    assert slots.slots_between("9:30 pm") == ["10:00 PM"]
+    assert slots.slots_between("10 pm", "10 am") == []
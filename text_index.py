@@ -0,0 +1,178 @@
+import json
+import math
+import os
+import re
+import shutil
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# Columns searched, with the weight a match in each carries. dish_liked is
+# a short curated list, so one mention there says more than one in a review.
+FIELD_WEIGHTS = {"dish_liked": 3.0, "menu_item": 1.0, "reviews_list": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_RADIUS = 60  # Characters kept on each side of a match
+FORMAT_VERSION = 1
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have i in is it its my of on or our so
+that the their there this to too very was we were with you your rated
+""".split())
+
+# --- Tokenizing ---
+
+def _stem(token: str) -> str:
+    """Strips a plural "s" so "biryanis" and "biryani" match."""
+    if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text) -> list:
+    """Lowercases and splits text into index terms, dropping stopwords."""
+    if not isinstance(text, str):
+        return []
+    return [_stem(token) for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+# --- Build ---
+
+def build_index(df: pd.DataFrame, index_dir, source_signature=None) -> Path:
+    """
+    Tokenizes the searchable columns of `df` and writes a BM25 index to `index_dir`:
+      meta.json          term -> [offset, length] of its postings, corpus stats, source signature
+      doc_ids.npy        restaurant_id of each document (one per catalog row)
+      doc_len.npy        weighted document lengths
+      postings_doc.npy   document numbers, grouped by term
+      postings_tf.npy    weighted term frequencies, aligned with postings_doc
+    The files are written to a temp directory and swapped in, so readers
+    never see a half-built index.
+    """
+    index_dir = Path(index_dir)
+    term_docs = {}  # term -> {doc: weighted tf}
+    doc_len = np.zeros(len(df), dtype=np.float32)
+
+    for field, weight in FIELD_WEIGHTS.items():
+        for doc, text in enumerate(df[field]):
+            tokens = tokenize(text)
+            doc_len[doc] += weight * len(tokens)
+            for token in tokens:
+                postings = term_docs.setdefault(token, {})
+                postings[doc] = postings.get(doc, 0.0) + weight
+
+    vocab = {}
+    docs, tfs = [], []
+    offset = 0
+    for term in sorted(term_docs):
+        postings = term_docs[term]
+        vocab[term] = [offset, len(postings)]
+        docs.extend(postings.keys())
+        tfs.extend(postings.values())
+        offset += len(postings)
+
+    tmp_dir = index_dir.with_name(f"{index_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir / "doc_ids.npy", df["restaurant_id"].to_numpy(dtype=np.int64))
+    np.save(tmp_dir / "doc_len.npy", doc_len)
+    np.save(tmp_dir / "postings_doc.npy", np.array(docs, dtype=np.int32))
+    np.save(tmp_dir / "postings_tf.npy", np.array(tfs, dtype=np.float32))
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "format": FORMAT_VERSION,
+            "source_signature": list(source_signature) if source_signature else None,
+            "n_docs": len(df),
+            "avg_doc_len": float(doc_len.mean()) if len(df) else 0.0,
+            "vocab": vocab,
+        }, f)
+
+    old_dir = index_dir.with_name(f"{index_dir.name}.{os.getpid()}.old")
+    if index_dir.exists():
+        index_dir.rename(old_dir)
+    tmp_dir.rename(index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return index_dir
+
+# --- Search ---
+
+class TextIndex:
+    """
+    A BM25 index built by build_index, with the postings memory-mapped.
+    Only the vocabulary is read into memory; each query touches just the
+    postings of its own terms.
+    """
+
+    def __init__(self, index_dir):
+        index_dir = Path(index_dir)
+        with open(index_dir / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported text index format in {index_dir}; rebuild it.")
+        self.source_signature = tuple(meta["source_signature"]) if meta["source_signature"] else None
+        self.n_docs = meta["n_docs"]
+        self.avg_doc_len = meta["avg_doc_len"] or 1.0
+        self.vocab = meta["vocab"]
+        self.doc_ids = np.load(index_dir / "doc_ids.npy", mmap_mode="r")
+        self.doc_len = np.load(index_dir / "doc_len.npy", mmap_mode="r")
+        self.postings_doc = np.load(index_dir / "postings_doc.npy", mmap_mode="r")
+        self.postings_tf = np.load(index_dir / "postings_tf.npy", mmap_mode="r")
+
+    def search(self, query: str, k: int = 5) -> list:
+        """
+        Returns up to `k` (doc, restaurant_id, score, matched_terms) tuples,
+        best first. `doc` is the catalog row the document was built from.
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self.vocab]
+        if not terms or self.n_docs == 0:
+            return []
+        # Rarest terms first, so each document's matched_terms lead with the most telling one
+        terms.sort(key=lambda term: self.vocab[term][1])
+
+        scores = np.zeros(self.n_docs, dtype=np.float64)
+        matched = {}
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(self.doc_len) / self.avg_doc_len)
+        for term in terms:
+            offset, length = self.vocab[term]  # One posting per document, so length is the doc freq
+            docs = np.asarray(self.postings_doc[offset:offset + length])
+            tf = np.asarray(self.postings_tf[offset:offset + length])
+            idf = math.log(1 + (self.n_docs - length + 0.5) / (length + 0.5))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+            for doc in docs.tolist():
+                matched.setdefault(doc, []).append(term)
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = sorted(candidates.tolist(), key=lambda doc: (-scores[doc], doc))
+        return [(doc, int(self.doc_ids[doc]), float(scores[doc]), matched[doc]) for doc in ranked]
+
+def snippets(texts: list, terms: list, limit: int = 2) -> list:
+    """
+    Returns up to `limit` short excerpts from `texts` around the first
+    matches of `terms`, with whitespace and review markers cleaned up.
+    """
+    found = []
+    for term in terms:
+        pattern = re.compile(rf"\b{re.escape(term)}\w*", re.IGNORECASE)
+        for text in texts:
+            if not isinstance(text, str):
+                continue
+            match = pattern.search(text)
+            if match is None:
+                continue
+            start = max(0, match.start() - SNIPPET_RADIUS)
+            end = min(len(text), match.end() + SNIPPET_RADIUS)
+            excerpt = text[start:end].replace("\\n", " ").replace("\\", " ").replace("RATED", " ")
+            excerpt = " ".join(re.sub(r"[\[\]()']", " ", excerpt).split())
+            found.append(("..." if start > 0 else "") + excerpt + ("..." if end < len(text) else ""))
+            break
+        if len(found) >= limit:
+            break
+    return found
+
+if __name__ == "__main__":
+    # Build step: python text_index.py
+    import data_manager
+    path = data_manager.build_text_index()
+    print(f"Text index written to {path}")
@@ -1,185 +1,233 @@
 import data_manager
-from datetime import datetime
+import slots
+from recommender import UnknownTermError
 import json
+import logging
 import pandas as pd
 
+log = logging.getLogger(__name__)
+
 # --- Tool Functions ---
 
 def get_available_restaurants(date: str, time_slot: str, party_size: int) -> str:
     """
     Gets all available restaurants for a given date, time slot, and party size.
-    If the requested time slot is not available, finds and uses the nearest available time slot.
-
-    Combines availability data with restaurant details (name, address, price, location, rating, and reviews).
+    The requested time is matched to the nearest time slot.
 
-    Returns a JSON string of a list of available restaurants.
+    Returns each restaurant's name, location, price, rating, review count
+    and tables available, as a JSON string.
     """
 
-    print(f"Searching availability: Date: {date}, Slot: {time_slot}, Size: {party_size}")
+    log.info("Searching availability: Date: %s, Slot: %s, Size: %s", date, time_slot, party_size)
 
     try:
-        # Load availability data
-        availability_df = data_manager.get_availability(date)
-        if availability_df.empty:
-            return f"No availability data found for {date}."
-
-        # Normalize column names (make consistent and lowercase)
-        availability_df.columns = [col.strip().lower() for col in availability_df.columns]
-
-        # Check for time slot existence
-        time_slot_lower = time_slot.lower()
-        if time_slot_lower not in availability_df.columns:
-            print(f"Requested time slot '{time_slot}' not found. Searching nearest available slot...")
-
-            try:
-                slot_times = []
-                for slot in availability_df.columns:
-                    try:
-                        slot_times.append(datetime.strptime(slot, "%H:%M"))
-                    except ValueError:
-                        try:
-                            slot_times.append(datetime.strptime(slot, "%I:%M %p"))
-                        except ValueError:
-                            continue
-
-                # Parse requested time
-                try:
-                    requested_time = datetime.strptime(time_slot, "%H:%M")
-                except ValueError:
-                    requested_time = datetime.strptime(time_slot, "%I:%M %p")
-
-                # Find nearest available slot
-                nearest_slot = min(slot_times, key=lambda t: abs(t - requested_time))
-                time_slot = nearest_slot.strftime("%H:%M")
-                time_slot_lower = time_slot.lower()
-                print(f"Nearest available slot found: {time_slot}")
-            except Exception as e:
-                return f"Error: '{time_slot}' is not a valid or comparable time slot. ({e})"
-
-        # Load restaurant metadata
-        restaurant_df = data_manager.get_restaurant_data()
-        if restaurant_df.empty:
+        # Map the requested time onto the nearest slot (e.g. "19:00" or "7:30 pm"),
+        # if one is within MAX_SNAP_MINUTES
+        requested_time_slot = time_slot
+        time_slot = slots.resolve_slot(requested_time_slot, max_distance=slots.MAX_SNAP_MINUTES)
+        if time_slot is None:
+            suggestions = slots.k_nearest_slots(requested_time_slot, 3) or data_manager.TIME_SLOTS
+            return f"Error: '{requested_time_slot}' is not a valid time. Nearest available slots: {', '.join(suggestions)}."
+        if time_slot != requested_time_slot:
+            log.info("Requested time slot '%s' resolved to '%s'.", requested_time_slot, time_slot)
+
+        if data_manager.get_restaurant_data().empty:
             return "Error: Restaurant data file is empty or missing."
 
-        # Normalize restaurant_df columns too
-        restaurant_df.columns = [col.strip().lower() for col in restaurant_df.columns]
-
-        # Identify matching column names for merging
-        if "name" in availability_df.columns:
-            avail_name_col = "name"
-        elif "restaurant" in availability_df.columns:
-            avail_name_col = "restaurant"
-        else:
-            return f"Error: No restaurant name column found in availability data. Columns: {availability_df.columns.tolist()}"
-
-        if "name" in restaurant_df.columns:
-            rest_name_col = "name"
-        elif "restaurant" in restaurant_df.columns:
-            rest_name_col = "restaurant"
-        else:
-            return f"Error: No restaurant name column found in restaurant data. Columns: {restaurant_df.columns.tolist()}"
-
         # Calculate tables needed
         tables_needed = data_manager.calculate_tables_needed(party_size)
 
-        # Filter restaurants with enough tables
-        available = availability_df[availability_df[time_slot_lower] >= tables_needed]
+        # Restaurants with enough tables, joined with their details by catalog row
+        available = data_manager.list_available_restaurants(date, time_slot, tables_needed)
         if available.empty:
             return (
                 f"No restaurants have {tables_needed} table(s) available for "
                 f"{party_size} guests at {time_slot} on {date}."
             )
 
-        # Merge availability and restaurant data
-        merged = available.merge(
-            restaurant_df,
-            left_on=avail_name_col,
-            right_on=rest_name_col,
-            how="inner"
-        )
-
-        # Debug: print columns found after merge
-        print(f"Merged columns: {merged.columns.tolist()}")
-
-        # Select relevant columns for output (only keep what exists)
-        cols_to_show = [
-            avail_name_col,
-            "location",
-            "price",
-            "rating",
-            "reviews"
-        ]
-        cols_to_show = [col for col in cols_to_show if col in merged.columns]
-
-        available_restaurants = merged[cols_to_show].copy()
-
-        # Rename columns for clarity
-        available_restaurants.rename(columns={time_slot_lower: "tables_available"}, inplace=True)
-        available_restaurants.rename(columns={avail_name_col: "name"}, inplace=True)
-
         # Build output object
         output = {
             "date": date,
             "used_time_slot": time_slot,
-            "restaurants": json.loads(available_restaurants.to_json(orient="records"))
+            "restaurants": json.loads(available.to_json(orient="records"))
         }
 
         # Return as formatted JSON string
         return json.dumps(output, indent=2)
 
     except Exception as e:
-        print(f"ERROR in get_available_restaurants: {e}")
+        log.exception("get_available_restaurants failed")
+        return f"An unexpected error occurred: {e}"
+
+def search_availability(start_date: str, end_date: str, party_size: int,
+                        earliest_time: str = None, latest_time: str = None,
+                        max_results: int = 50) -> str:
+    """
+    Finds open tables across a range of dates and a window of time slots
+    in one call, e.g. "Friday or Saturday evening for 6".
+
+    Every (restaurant, date, slot) combination is checked in a single
+    batched lookup. Returns a compact JSON table of
+    [restaurant, date, time_slot, tables_available] rows.
+    """
+    log.info("Searching availability: %s to %s, %s to %s, Size: %s",
+             start_date, end_date, earliest_time or 'open', latest_time or 'close', party_size)
+
+    try:
+        # --- Step 1: Resolve the date range ---
+        try:
+            dates = data_manager.dates_between(start_date, end_date)
+        except ValueError:
+            return f"Error: Dates must be in DD.MM.YYYY format, got '{start_date}' and '{end_date}'."
+        if not dates:
+            return f"Error: End date {end_date} is before start date {start_date}."
+        if len(dates) > data_manager.MAX_SEARCH_DAYS:
+            return f"Error: Please search at most {data_manager.MAX_SEARCH_DAYS} days at a time."
+
+        # --- Step 2: Resolve the slot window ---
+        time_slots = slots.slots_between(earliest_time, latest_time)
+        if not time_slots:
+            return (f"Error: No time slots between '{earliest_time}' and '{latest_time}'. "
+                    f"Available slots: {', '.join(data_manager.TIME_SLOTS)}.")
+
+        # --- Step 3: Search ---
+        tables_needed = data_manager.calculate_tables_needed(party_size)
+        matches = data_manager.search_availability(dates, time_slots, tables_needed)
+        if not matches:
+            return (f"No restaurants have {tables_needed} table(s) available for {party_size} guests "
+                    f"between {time_slots[0]} and {time_slots[-1]} from {dates[0]} to {dates[-1]}.")
+
+        # --- Step 4: Compact output ---
+        shown = matches[:max_results]
+        names = data_manager.get_restaurant_names([restaurant_id for restaurant_id, _, _, _ in shown])
+        output = {
+            "dates": dates,
+            "time_slots": time_slots,
+            "total_matches": len(matches),
+            "truncated": len(matches) > max_results,
+            "columns": ["restaurant_id", "restaurant", "date", "time_slot", "tables_available"],
+            "rows": [
+                [restaurant_id, name, date, slot, tables]
+                for (restaurant_id, date, slot, tables), name in zip(shown, names)
+            ]
+        }
+        return json.dumps(output)
+
+    except Exception as e:
+        log.exception("search_availability failed")
         return f"An unexpected error occurred: {e}"
 
+def recommend_restaurants(date: str, time_slot: str, party_size: int, cuisine: str = None,
+                          location: str = None, restaurant_type: str = None,
+                          max_price: float = None, min_rating: float = None,
+                          max_results: int = 5) -> str:
+    """
+    Recommends the best-rated restaurants that match the user's preferences
+    (cuisine, location, restaurant type, budget, minimum rating) and have
+    tables free for the party at the requested date and time.
+
+    Returns a JSON string with the ranked restaurants.
+    """
+    log.info("Recommending: Date: %s, Slot: %s, Size: %s, Cuisine: %s, Location: %s, Type: %s, Max price: %s, Min rating: %s",
+             date, time_slot, party_size, cuisine, location, restaurant_type, max_price, min_rating)
+
+    try:
+        requested_time_slot = time_slot
+        time_slot = slots.resolve_slot(requested_time_slot, max_distance=slots.MAX_SNAP_MINUTES)
+        if time_slot is None:
+            suggestions = slots.k_nearest_slots(requested_time_slot, 3) or data_manager.TIME_SLOTS
+            return f"Error: '{requested_time_slot}' is not a valid time. Nearest available slots: {', '.join(suggestions)}."
+
+        tables_needed = data_manager.calculate_tables_needed(party_size)
+        try:
+            recommended = data_manager.recommend_restaurants(
+                date, time_slot, tables_needed,
+                cuisine=cuisine, location=location, rest_type=restaurant_type,
+                max_price=max_price, min_rating=min_rating, k=max_results
+            )
+        except UnknownTermError as e:
+            known = data_manager.get_recommendation_terms(e.field)
+            return f"No restaurants match {e.field.replace('_', ' ')} '{e.value}'. Known values include: {', '.join(known[:25])}."
+
+        if recommended.empty:
+            return (f"No restaurants matching those preferences have {tables_needed} table(s) "
+                    f"available for {party_size} guests at {time_slot} on {date}.")
+
+        output = {
+            "date": date,
+            "used_time_slot": time_slot,
+            "restaurants": json.loads(recommended.to_json(orient="records"))
+        }
+        return json.dumps(output, indent=2)
+
+    except Exception as e:
+        log.exception("recommend_restaurants failed")
+        return f"An unexpected error occurred: {e}"
+
+def search_restaurants_by_text(query: str, max_results: int = 5) -> str:
+    """
+    Searches dishes, menus and reviews for free-text requests such as
+    "good biryani and a quiet ambience".
+
+    Returns a JSON string with the best-matching restaurants (IDs, names,
+    locations) and short snippets of the matching text.
+    """
+    log.info("Text search: '%s'", query)
+
+    try:
+        results = data_manager.search_restaurant_text(query, max_results)
+        if not results:
+            return f"No restaurants mention '{query}' in their dishes, menus or reviews."
+        return json.dumps({"query": query, "restaurants": results}, indent=2)
+
+    except Exception as e:
+        log.exception("search_restaurants_by_text failed")
+        return f"An unexpected error occurred: {e}"
 
 
 def book_table(customer_name: str, customer_email: str, customer_phone: str, 
                restaurant_name: str, party_size: int, date: str, time_slot: str, 
-               special_requests: str = "") -> str:
+               special_requests: str = "", restaurant_id: int = None) -> str:
     """
     Books a table for a given restaurant, date, time, and party size.
+    `restaurant_id` picks a specific branch; otherwise the name's first branch is used.
     This involves checking availability, creating a booking record, 
     and updating the availability tracker.
     """
-    print(f"Attempting to book table: {restaurant_name}, Date: {date}, Slot: {time_slot}, Size: {party_size}")
+    log.info("Attempting to book table: %s, Date: %s, Slot: %s, Size: %s", restaurant_name, date, time_slot, party_size)
     
     try:
         # --- Step 1: Check restaurant and get address ---
-        restaurants_df = data_manager.get_restaurant_data()
-        restaurant_row = restaurants_df[restaurants_df['name'] == restaurant_name]
+        if restaurant_id is None:
+            restaurant_id = data_manager.get_restaurant_id(restaurant_name)
+        restaurant = data_manager.get_restaurant(int(restaurant_id)) if restaurant_id is not None else None
         
-        if restaurant_row.empty:
+        if restaurant is None:
             return f"Error: Restaurant '{restaurant_name}' not found."
         
-        address = restaurant_row.iloc[0]['address']
-
-        # --- Step 2: Check Availability *BEFORE* booking ---
+        restaurant_id = int(restaurant['restaurant_id'])
+        restaurant_name = restaurant['name']
+        address = restaurant['address']
+
+        # --- Step 2: Resolve the time slot ---
+        # Accept any common time format; off-grid times snap to the nearest
+        # slot if it is within MAX_SNAP_MINUTES.
+        requested_time_slot = time_slot
+        time_slot = slots.resolve_slot(requested_time_slot, max_distance=slots.MAX_SNAP_MINUTES)
+        if time_slot is None:
+            suggestions = slots.k_nearest_slots(requested_time_slot, 3) or data_manager.TIME_SLOTS
+            return f"Error: Time slot '{requested_time_slot}' is invalid. Nearest available slots: {', '.join(suggestions)}."
+
+        # --- Step 3: Book ---
+        # Taking the tables and writing the booking is one atomic operation
+        # in the storage backend, so there is nothing to roll back by hand.
         tables_needed = data_manager.calculate_tables_needed(party_size)
-        
-        availability_df = data_manager.get_availability(date)
-        if availability_df.empty:
-            return f"Error: Could not load availability data for {date}."
-        
-        resto_avail = availability_df[availability_df['Name'] == restaurant_name]
-        
-        if resto_avail.empty:
-            return f"Error: Restaurant '{restaurant_name}' not found in availability tracker for {date}."
 
-        if time_slot not in resto_avail.columns:
-            return f"Error: Time slot '{time_slot}' is invalid."
-            
-        current_tables = resto_avail.iloc[0][time_slot]
-        
-        if current_tables < tables_needed:
-            return (f"Booking failed: Not enough tables available at '{restaurant_name}' "
-                    f"for {party_size} guests at {time_slot}. "
-                    f"Only {current_tables} table(s) left.")
-
-        # --- Step 3: Availability is confirmed, proceed with booking ---
         booking_details = {
             "customer_name": customer_name,
             "customer_email": customer_email,
             "customer_phone": customer_phone,
+            "restaurant_id": restaurant_id,
             "restaurant_name": restaurant_name,
             "restaurant_address": address,
             "party_size": party_size,
@@ -187,42 +235,35 @@ def book_table(customer_name: str, customer_email: str, customer_phone: str,
             "special_requests": special_requests
         }
         
-        # This function adds the booking and returns the full record
-        new_booking = data_manager.add_booking(date, booking_details)
-        
-        # --- Step 4: Update the Availability Tracker (The Fix) ---
-        
-        # We *subtract* tables, so the change is negative
-        tables_change = -tables_needed # Using tables_needed from our pre-check
-        
-        success = data_manager.update_availability(
-            date_str=date,
-            restaurant_name=restaurant_name,
-            time_slot=time_slot,
-            tables_change=tables_change
-        )
+        new_booking, tables_left = data_manager.create_booking(date, booking_details)
+
+        if tables_left is None:
+            return f"Error: Restaurant '{restaurant_name}' not found in availability tracker for {date}."
         
-        if not success:
-            # Critical Error: Booking was made, but tracker update failed!
-            # This is called a "rollback"
-            data_manager.update_booking_status(date, new_booking['booking_id'], 'CANCELLED (Tracker Error)')
-            print(f"CRITICAL: Booking {new_booking['booking_id']} created but tracker update failed. Rolling back.")
-            return "Error: Booking created but failed to update availability. Booking has been automatically cancelled. Please try again."
-
-        # --- Step 5: Success ---
+        if new_booking is None:
+            return (f"Booking failed: Not enough tables available at '{restaurant_name}' "
+                    f"for {party_size} guests at {time_slot}. "
+                    f"Only {tables_left} table(s) left.")
+
+        # --- Step 4: Success ---
         # Return a clean JSON string for the agent
-        return json.dumps({
+        result = {
             "status": "confirmed",
             "booking_id": new_booking['booking_id'],
+            "restaurant_id": restaurant_id,
             "restaurant_name": restaurant_name,
             "party_size": party_size,
             "date": date,
             "time_slot": time_slot,
             "tables_reserved": tables_needed
-        })
+        }
+        if slots.canonical_slot(requested_time_slot) != time_slot:
+            # Only when the time actually moved, not just its format
+            result["requested_time_slot"] = requested_time_slot
+        return json.dumps(result)
 
     except Exception as e:
-        print(f"ERROR in book_table: {e}")
+        log.exception("book_table failed")
         return f"An unexpected error occurred: {e}"
 
 
@@ -230,135 +271,99 @@ def get_booking_details(booking_id: str = None, date: str = None, name: str = No
     """
     Retrieves the details for a specific booking.
     You can fetch details using either:
-      - booking_id and date
-      - or name + email (+ date is optional but preferred)
+      - booking_id
+      - or name + email
+    The date is optional; if given, only bookings on that date are returned.
     
     Returns:
         A JSON string with booking details or an error message.
     """
-    print(f"Getting booking details | ID: {booking_id}, Name: {name}, Email: {email}, Date: {date}")
+    log.info("Getting booking details | ID: %s, Name: %s, Email: %s, Date: %s", booking_id, name, email, date)
 
     try:
         # --- Validate input ---
         if not booking_id and not (name and email):
             return "Error: Please provide either a booking ID or both name and email."
 
-        if not date:
-            return "Error: Please provide a booking date."
-
-        # --- Load bookings for the date ---
-        bookings_df = data_manager.get_bookings(date)
-        if bookings_df.empty:
-            return f"No booking data found for {date}."
-
-        # --- Normalize column names (in case of case mismatches) ---
-        bookings_df.columns = [col.strip().lower() for col in bookings_df.columns]
-
         # --- Search by booking ID ---
         if booking_id:
-            booking_row = bookings_df[bookings_df["booking_id"].astype(str) == str(booking_id)]
-            if booking_row.empty:
-                return f"Error: Booking ID '{booking_id}' not found for date {date}."
+            booking = data_manager.find_booking(str(booking_id).strip())
+            if booking is None or (date and booking["date"] != date):
+                suffix = f" for date {date}" if date else ""
+                return f"Error: Booking ID '{booking_id}' not found{suffix}."
+            matches = [booking]
         
         # --- Or search by name and email ---
         else:
-            if "name" not in bookings_df.columns or "email" not in bookings_df.columns:
-                return "Booking data does not contain 'name' or 'email' columns."
-
-            name_lower = name.strip().lower()
-            email_lower = email.strip().lower()
+            matches = data_manager.find_bookings_by_customer(name, email)
+            if date:
+                matches = [b for b in matches if b["date"] == date]
 
-            # Normalize in dataframe
-            bookings_df["name"] = bookings_df["name"].astype(str).str.strip().str.lower()
-            bookings_df["email"] = bookings_df["email"].astype(str).str.strip().str.lower()
+            if not matches:
+                suffix = f" on {date}" if date else ""
+                return f"Error: No booking found for {name} ({email}){suffix}."
 
-            booking_row = bookings_df[
-                (bookings_df["name"] == name_lower) &
-                (bookings_df["email"] == email_lower)
-            ]
-
-            if booking_row.empty:
-                return f"Error: No booking found for {name} ({email}) on {date}."
-
-        # --- Return single booking (if multiple, show first match) ---
-        booking_data = booking_row.iloc[0].to_dict()
-
-        # Convert to formatted JSON
-        return json.dumps(booking_data, indent=2)
+        # --- Return single booking, or all of the customer's bookings ---
+        if len(matches) == 1:
+            return json.dumps(matches[0], indent=2)
+        return json.dumps({"bookings": matches}, indent=2)
 
     except Exception as e:
-        print(f"ERROR in get_booking_details: {e}")
+        log.exception("get_booking_details failed")
         return f"An unexpected error occurred: {e}"
 
 
-def cancel_booking(booking_id: str, date: str) -> str:
+def cancel_booking(booking_id: str, date: str = None) -> str:
     """
-    Cancels a booking by its ID and the date.
+    Cancels a booking by its ID (the date is optional).
     This updates the booking status and returns the tables
     to the availability tracker.
     """
-    print(f"Attempting to cancel booking: {booking_id} for date: {date}")
+    log.info("Attempting to cancel booking: %s for date: %s", booking_id, date)
     
     try:
         # --- Step 1: Find the booking ---
-        bookings_df = data_manager.get_bookings(date)
-        booking_row = bookings_df[bookings_df['booking_id'] == booking_id]
+        booking = data_manager.find_booking(booking_id)
         
-        if booking_row.empty:
-            return f"Error: Booking ID '{booking_id}' not found for date {date}."
+        if booking is None or (date and booking['date'] != date):
+            suffix = f" for date {date}" if date else ""
+            return f"Error: Booking ID '{booking_id}' not found{suffix}."
             
-        booking = booking_row.iloc[0]
+        date = booking['date']
+        restaurant_name = booking['restaurant_name']
         
         # --- Step 2: Check if already cancelled ---
-        if booking['status'].lower() in ['cancelled', 'cancelled (tracker error)']:
+        if str(booking['status']).lower() in ['cancelled', 'cancelled (tracker error)']:
             return f"Booking {booking_id} is already cancelled."
             
-        # --- Step 3: Update Availability (ADD tables back) ---
-        tables_to_return = booking['tables_reserved']
-        restaurant_name = booking['restaurant_name']
-        time_slot = booking['time_slot']
-        
-        # We *add* tables back, so the change is positive
-        tables_change = tables_to_return
+        # --- Step 3: Return the tables and mark the booking cancelled ---
+        # Done atomically by the storage backend, so a concurrent cancellation
+        # can't return the tables twice.
+        tables_to_return = int(booking['tables_reserved'])
+        outcome = data_manager.cancel_booking_record(date, booking_id)
         
-        success = data_manager.update_availability(
-            date_str=date,
-            restaurant_name=restaurant_name,
-            time_slot=time_slot,
-            tables_change=tables_change
-        )
+        if outcome == "already_cancelled":
+            return f"Booking {booking_id} is already cancelled."
         
-        if not success:
-            # If this fails, we should NOT cancel the booking, as it would
-            # create an inconsistency (cancelled booking but tables not returned).
-            print(f"ERROR: Failed to update availability for cancellation of {booking_id}.")
+        if outcome != "cancelled":
+            log.error("Failed to cancel %s: %s.", booking_id, outcome)
             return "Error: Could not return tables to tracker. Cancellation failed. Please contact support."
 
-        # --- Step 4: Update booking status ---
-        status_updated = data_manager.update_booking_status(date, booking_id, "cancelled")
-        
-        if not status_updated:
-            # This is another critical error. We returned tables but failed to
-            # update the booking status. We must try to "roll back" the availability.
-            print(f"CRITICAL: Tracker updated but booking status update failed for {booking_id}. Attempting to roll back tracker.")
-            data_manager.update_availability(date, restaurant_name, time_slot, -tables_to_return) # Subtract tables again
-            return "Error: A critical error occurred. Availability was updated but booking status failed. All changes have been rolled back. Please try again."
-
-        # --- Step 5: Success ---
+        # --- Step 4: Success ---
         return json.dumps({
             "status": "cancelled",
             "booking_id": booking_id,
             "restaurant_name": restaurant_name,
-            "tables_returned": int(tables_to_return) # Ensure it's an int
+            "date": date,
+            "tables_returned": tables_to_return
         })
         
     except Exception as e:
-        print(f"ERROR in cancel_booking: {e}")
+        log.exception("cancel_booking failed")
         return f"An unexpected error occurred: {e}"
 
 
 # --- Tool Definitions (for the LLM) ---
-# (This section is unchanged from your original file)
 
 tool_definitions = [
     {
@@ -375,7 +380,7 @@ tool_definitions = [
                     },
                     "time_slot": {
                         "type": "string",
-                        "description": "The desired time slot, e.g., '07:00 PM'."
+                        "description": "The desired time, e.g., '07:00 PM' or '19:00'. It is matched to the nearest hourly slot."
                     },
                     "party_size": {
                         "type": "integer",
@@ -386,6 +391,62 @@ tool_definitions = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_availability",
+            "description": "Search open tables across several dates and a range of times in one call (e.g. 'Friday or Saturday evening'). Prefer this over repeated get_available_restaurants calls.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_date": {"type": "string", "description": "First date to search, e.g., '30.10.2025'."},
+                    "end_date": {"type": "string", "description": "Last date to search (inclusive), e.g., '31.10.2025'. Use the start date for a single day."},
+                    "party_size": {"type": "integer", "description": "The number of guests in the party."},
+                    "earliest_time": {"type": "string", "description": "Optional. Earliest acceptable time, e.g., '06:00 PM' or '18:00'."},
+                    "latest_time": {"type": "string", "description": "Optional. Latest acceptable time, e.g., '09:00 PM' or '21:00'."},
+                    "max_results": {"type": "integer", "description": "Optional. Maximum number of rows to return (default 50)."}
+                },
+                "required": ["start_date", "end_date", "party_size"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "recommend_restaurants",
+            "description": "Recommend the best-rated restaurants matching the user's preferences (cuisine, area, type/ambiance, budget, rating) that have tables free at the requested date and time.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string", "description": "The date for the reservation, e.g., '30.10.2025'."},
+                    "time_slot": {"type": "string", "description": "The desired time, e.g., '07:00 PM' or '19:00'. It is matched to the nearest hourly slot."},
+                    "party_size": {"type": "integer", "description": "The number of guests in the party."},
+                    "cuisine": {"type": "string", "description": "Optional. A cuisine, e.g., 'North Indian', 'Chinese', 'Italian'."},
+                    "location": {"type": "string", "description": "Optional. The area, e.g., 'Koramangala', 'Indiranagar'."},
+                    "restaurant_type": {"type": "string", "description": "Optional. The kind of place, e.g., 'Casual Dining', 'Cafe', 'Fine Dining', 'Quick Bites'."},
+                    "max_price": {"type": "number", "description": "Optional. Maximum approximate cost for two people, in INR."},
+                    "min_rating": {"type": "number", "description": "Optional. Minimum rating out of 5."},
+                    "max_results": {"type": "integer", "description": "Optional. How many restaurants to return (default 5)."}
+                },
+                "required": ["date", "time_slot", "party_size"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_restaurants_by_text",
+            "description": "Search restaurants' popular dishes, menus and customer reviews by free text (e.g. 'good biryani', 'quiet ambience', 'rooftop'). Returns restaurant IDs with matching snippets; check availability separately.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "What the user is looking for, in their own words."},
+                    "max_results": {"type": "integer", "description": "Optional. How many restaurants to return (default 5)."}
+                },
+                "required": ["query"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -398,9 +459,10 @@ tool_definitions = [
                     "customer_email": {"type": "string", "description": "Email address of the customer."},
                     "customer_phone": {"type": "string", "description": "Phone number of the customer."},
                     "restaurant_name": {"type": "string", "description": "The name of the restaurant."},
+                    "restaurant_id": {"type": "integer", "description": "Optional. The restaurant_id from an availability result; identifies the branch when a name has several."},
                     "party_size": {"type": "integer", "description": "The number of guests."},
                     "date": {"type": "string", "description": "The date for the reservation, e.g., '30.10.2025'."},
-                    "time_slot": {"type": "string", "description": "The desired time slot, e.g., '07:00 PM'."},
+                    "time_slot": {"type": "string", "description": "The desired time, e.g., '07:00 PM' or '19:00'. It is matched to the nearest hourly slot."},
                     "special_requests": {"type": "string", "description": "Any special requests for the booking."}
                 },
                 "required": ["customer_name", "customer_email", "customer_phone", "restaurant_name", "party_size", "date", "time_slot"]
@@ -411,14 +473,16 @@ tool_definitions = [
         "type": "function",
         "function": {
             "name": "get_booking_details",
-            "description": "Retrieve the details of an existing booking using a booking ID.",
+            "description": "Retrieve the details of an existing booking using a booking ID, or the customer's name and email.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "booking_id": {"type": "string", "description": "The unique ID of the booking."},
-                    "date": {"type": "string", "description": "The date of the booking, e.g., '30.10.2025'."}
+                    "name": {"type": "string", "description": "Full name of the customer (use together with email)."},
+                    "email": {"type": "string", "description": "Email address of the customer (use together with name)."},
+                    "date": {"type": "string", "description": "Optional. The date of the booking, e.g., '30.10.2025'."}
                 },
-                "required": ["booking_id", "date"]
+                "required": []
             }
         }
     },
@@ -431,19 +495,47 @@ tool_definitions = [
                 "type": "object",
                 "properties": {
                     "booking_id": {"type": "string", "description": "The unique ID of the booking to cancel."},
-                    "date": {"type": "string", "description": "The date of the booking, e.g., '30.10.2025'."}
+                    "date": {"type": "string", "description": "Optional. The date of the booking, e.g., '30.10.2025'."}
                 },
-                "required": ["booking_id", "date"]
+                "required": ["booking_id"]
             }
         }
     }
 ]
 
+# --- Mutation Keys ---
+# Tools that change availability, mapped to a function giving the
+# (date, restaurant, slot) their arguments touch. The agent runs calls
+# that share a key one after another, in the order the LLM asked for them;
+# everything else may run in parallel.
+
+def _book_table_key(args: dict):
+    restaurant = args.get("restaurant_id")
+    if restaurant is None:
+        restaurant = data_manager.get_restaurant_id(args.get("restaurant_name"))
+    time_slot = slots.resolve_slot(str(args.get("time_slot")), max_distance=slots.MAX_SNAP_MINUTES)
+    return (args.get("date"), restaurant, time_slot)
+
+def _cancel_booking_key(args: dict):
+    booking = data_manager.find_booking(str(args.get("booking_id")))
+    if booking is None:
+        return None
+    restaurant_id = booking.get("restaurant_id")
+    restaurant = booking.get("restaurant_name") if restaurant_id in (None, "") else int(restaurant_id)
+    return (booking["date"], restaurant, booking["time_slot"])
+
+tool_mutation_keys = {
+    "book_table": _book_table_key,
+    "cancel_booking": _cancel_booking_key
+}
+
 # --- Tool Dispatcher ---
-# (This section is unchanged from your original file)
 
 tool_functions = {
     "get_available_restaurants": get_available_restaurants,
+    "search_availability": search_availability,
+    "recommend_restaurants": recommend_restaurants,
+    "search_restaurants_by_text": search_restaurants_by_text,
     "book_table": book_table,
     "get_booking_details": get_booking_details,
     "cancel_booking": cancel_booking